@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Asynchronous Send Benchmark
+An agent loop alternates "inference" (sleep) with actuation. Blocking
+execute_command adds the full round trip to every step; with wait=False
+the round trip overlaps the next inference. Runs each transport against
+the local fake VM and checks that the watchers saw every mouse command,
+and every keyboard command, in submission order.
+
+Usage: python3 benchmarks/bench_async_send.py [-n 60] [--think-ms 30]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from connection_pool import ConnectionPool  # noqa: E402
+from fake_watchers import LegacyWatcher, SpoolWatcher  # noqa: E402
+from fake_windows_server import FakeWindowsServer  # noqa: E402
+from windows_actuation_control import VMController  # noqa: E402
+
+
+def agent_steps(count: int, seed: int = 11):
+    """Mostly pointer moves with some typing, all distinct so order can be checked"""
+    rng = random.Random(seed)
+    steps = []
+    for i in range(count):
+        if rng.random() < 0.8:
+            steps.append(f"{100 + i} {200 + rng.randrange(500)} move")
+        else:
+            steps.append(f"type step{i}")
+    return steps
+
+
+def run(transport: str, protocol: str, steps, think: float, wait: bool, spawn: float):
+    with tempfile.TemporaryDirectory() as root:
+        server = FakeWindowsServer(root, spawn_delay=spawn)
+        port = server.start()
+        watcher = SpoolWatcher if protocol == 'queue' else LegacyWatcher
+        watchers = {device: watcher(root, device, poll_interval=0.01) for device in ('mouse', 'keyboard')}
+        for w in watchers.values():
+            w.start()
+        controller = VMController('127.0.0.1', 'agent', port, transport=transport, protocol=protocol,
+                                  pool=ConnectionPool(keepalive_interval=0))
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                controller.connect('agent')
+                futures = []
+                start = time.perf_counter()
+                for command in steps:
+                    time.sleep(think)  # model inference
+                    if wait:
+                        controller.execute_command(command)
+                    else:
+                        futures.append(controller.execute_command(command, wait=False))
+                controller.flush()
+                elapsed = time.perf_counter() - start
+                failed = sum(1 for f in futures if f.exception() or not f.result())
+                controller.drain()
+                controller.disconnect()
+            time.sleep(0.2)
+        finally:
+            for w in watchers.values():
+                w.stop()
+            server.stop()
+
+    for device, w in watchers.items():
+        expected = [c for c in steps if controller.detect_command_type(c)[0] == device]
+        # The legacy file protocol may lose overwritten commands, but never reorders
+        seen = iter(expected)
+        if not all(any(c == e for e in seen) for c in w.executed):
+            raise SystemExit(f"[✗] {transport}/{protocol}: {device} commands out of order")
+    executed = sum(len(w.executed) for w in watchers.values())
+    return elapsed, failed, executed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark blocking vs fire-and-forget execution')
+    parser.add_argument('-n', '--count', type=int, default=60, help='Agent steps (default: 60)')
+    parser.add_argument('--think-ms', type=float, default=30.0,
+                        help='Emulated inference time per step (default: 30)')
+    parser.add_argument('--spawn-ms', type=float, default=20.0,
+                        help='Emulated cmd.exe startup per exec request (default: 20)')
+    args = parser.parse_args()
+
+    steps = agent_steps(args.count)
+    think = args.think_ms / 1000
+    print(f"{'transport/protocol':<20} {'mode':<10} {'wall (s)':>9} {'per step (ms)':>14} "
+          f"{'failed':>7} {'executed':>9}")
+    for transport, protocol in (('exec', 'file'), ('exec', 'queue'), ('session', 'queue')):
+        for wait in (True, False):
+            elapsed, failed, executed = run(transport, protocol, steps, think, wait, args.spawn_ms / 1000)
+            print(f"{transport + '/' + protocol:<20} {'blocking' if wait else 'wait=False':<10} "
+                  f"{elapsed:>9.2f} {elapsed / len(steps) * 1000:>14.1f} {failed:>7} {executed:>9}")
+    print(f"[✓] Per-device order preserved (inference floor: {think * len(steps):.2f}s)")
+
+
+if __name__ == '__main__':
+    main()
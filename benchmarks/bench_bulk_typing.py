@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Bulk Typing Benchmark
+Types a source file full of cmd.exe metacharacters on the local fake VM
+two ways: one `type <line>` + `{Enter}` command per line (the only option
+before bulk typing), and a single type_bulk upload. Reports round trips,
+wall time, chars/sec, the time the real AHK watcher would add (500ms
+stabilization per command, 100ms per key in Send mode), and whether the
+text arrived intact.
+
+Usage: python3 benchmarks/bench_bulk_typing.py [--lines 200] [--mb 5]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from connection_pool import ConnectionPool  # noqa: E402
+from fake_watchers import SpoolWatcher, ahk_action_time  # noqa: E402
+from fake_windows_server import FakeWindowsServer  # noqa: E402
+from windows_actuation_control import VMController  # noqa: E402
+
+
+def source_code(lines: int, seed: int = 8) -> str:
+    """Shell- and C-like lines: &, |, >, %, ^, quotes and non-ASCII text"""
+    rng = random.Random(seed)
+    templates = [
+        'if (a > {n} && b < {m}) {{ total |= mask ^ 0x{n:x}; }}',
+        'echo "%PATH%" | findstr /i "{word}" >> log_{n}.txt',
+        'printf("%d%% done: %s\\n", {n}, "{word}");',
+        '    return a & b | (c ^ {m});  // café {word}',
+        'set /a x=({n} * {m}) %% 7 & echo !x!',
+    ]
+    words = ['alpha', 'naïve', 'größe', 'résumé', 'plain']
+    return '\n'.join(rng.choice(templates).format(n=rng.randrange(1000), m=rng.randrange(1000),
+                                                   word=rng.choice(words))
+                     for _ in range(lines)) + '\n'
+
+
+def run(text: str, bulk: bool):
+    with tempfile.TemporaryDirectory() as root:
+        server = FakeWindowsServer(root)
+        port = server.start()
+        watcher = SpoolWatcher(root, 'keyboard', poll_interval=0.01)
+        watcher.start()
+        controller = VMController('127.0.0.1', 'agent', port, transport='session', protocol='queue',
+                                  pool=ConnectionPool(keepalive_interval=0))
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                controller.connect('agent')
+                before = server.exec_count
+                start = time.perf_counter()
+                if bulk:
+                    controller.type_bulk(text)
+                else:
+                    commands = []
+                    for line in text.splitlines():
+                        commands += [f"type {line}", "{Enter}"]
+                    controller.batch_mode(commands)
+                elapsed = time.perf_counter() - start
+                controller.disconnect()
+            time.sleep(0.1)
+        finally:
+            watcher.stop()
+            server.stop()
+
+    if bulk:
+        received = ''.join(watcher.typed)
+    else:
+        received = ''.join(line[5:] if line.startswith('type ') else '\n' for line in watcher.executed)
+    ahk = sum(ahk_action_time('keyboard', line) for line in watcher.executed)
+    return elapsed, len(watcher.executed), ahk, received == text
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark bulk typing against per-line type commands')
+    parser.add_argument('--lines', type=int, default=200, help='Lines of source to type (default: 200)')
+    parser.add_argument('--mb', type=float, default=5.0, help='Size of the large bulk payload (default: 5)')
+    args = parser.parse_args()
+
+    text = source_code(args.lines)
+    print(f"{'method':<22} {'chars':>9} {'commands':>9} {'wall (s)':>9} {'chars/sec':>11} "
+          f"{'AHK overhead (s)':>17} {'intact':>7}")
+    for name, bulk in (('type per line', False), ('type_bulk', True)):
+        elapsed, commands, ahk, intact = run(text, bulk)
+        print(f"{name:<22} {len(text):>9} {commands:>9} {elapsed:>9.2f} {len(text) / elapsed:>11.0f} "
+              f"{ahk:>17.1f} {'yes' if intact else 'NO':>7}")
+
+    big = source_code(int(args.mb * 1024 * 1024 / 45), seed=9)
+    elapsed, commands, ahk, intact = run(big, True)
+    print(f"{f'type_bulk {args.mb:g} MB':<22} {len(big):>9} {commands:>9} {elapsed:>9.2f} "
+          f"{len(big) / elapsed:>11.0f} {ahk:>17.1f} {'yes' if intact else 'NO':>7}")
+    print("\n(chars/sec excludes the watcher's own typing speed, which SendInput bounds on a real VM)")
+
+
+if __name__ == '__main__':
+    main()
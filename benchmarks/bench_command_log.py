@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Command Log Benchmark
+Time a high-rate batch spends on per-command output, on the actuation
+thread. Before, each command was a synchronous print() to the console.
+Now it is a CommandLog event: a ring buffer entry plus a hand-off to the
+writer thread. Measured against a slow terminal (every write call blocks,
+as a busy or remote console does) and a fast one, for text, JSONL and
+quiet output. Also checks that nothing is lost in between.
+
+Usage: python3 benchmarks/bench_command_log.py [-n 100000] [--stall-us 50]
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from command_log import CommandLog  # noqa: E402
+
+
+class Console(io.TextIOBase):
+    """Line-buffered terminal stand-in: each flush is a write call that blocks for `stall` seconds"""
+
+    def __init__(self, stall: float):
+        self.stall = stall
+        self.chunks = []
+
+    def write(self, text: str) -> int:
+        self.chunks.append(text)
+        return len(text)
+
+    def flush(self):
+        if self.stall:
+            time.sleep(self.stall)
+
+    def text(self) -> str:
+        return ''.join(self.chunks)
+
+
+def commands(count: int) -> list:
+    return [f"{100 + i % 800} {100 + i % 600} move" if i % 3 else f"type item {i}" for i in range(count)]
+
+
+def old_output(console: Console, lines: list) -> float:
+    """The previous per-command print, line-buffered like a terminal"""
+    start = time.perf_counter()
+    for line in lines:
+        prefix = "[KEYBOARD]" if line.startswith('type') else "[MOUSE]"
+        print(f"{prefix} Executed: {line}", file=console, flush=True)
+    return time.perf_counter() - start
+
+
+def new_output(log: CommandLog, lines: list) -> tuple:
+    """(seconds on the caller's thread, seconds until everything is written)"""
+    start = time.perf_counter()
+    for line in lines:
+        log.command('keyboard' if line.startswith('type') else 'mouse', line, 'ok', 0.001)
+    caller = time.perf_counter() - start
+    log.flush()
+    return caller, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark per-command output overhead')
+    parser.add_argument('-n', '--count', type=int, default=100000, help='Commands (default: 100000)')
+    parser.add_argument('--stall-us', type=float, default=50.0,
+                        help='Microseconds each write call to the slow console blocks (default: 50)')
+    args = parser.parse_args()
+
+    lines = commands(args.count)
+    problems = []
+    print(f"{'output':<28} {'console':<8} {'hot path ms':>12} {'us/cmd':>8} {'written ms':>11}")
+    for console_name, stall in (('slow', args.stall_us / 1e6), ('fast', 0.0)):
+        console = Console(stall)
+        seconds = old_output(console, lines)
+        expected = console.text()
+        print(f"{'print() per command (old)':<28} {console_name:<8} {seconds * 1000:>12.1f} "
+              f"{seconds / args.count * 1e6:>8.2f} {seconds * 1000:>11.1f}")
+
+        for label, level, fmt in (('log, text', 'info', 'text'), ('log, jsonl', 'info', 'jsonl'),
+                                  ('log, quiet', 'warning', 'text')):
+            console = Console(stall)
+            log = CommandLog(level, fmt, stream=console, capacity=1000)
+            caller, written = new_output(log, lines)
+            log.close()
+            print(f"{label:<28} {console_name:<8} {caller * 1000:>12.1f} "
+                  f"{caller / args.count * 1e6:>8.2f} {written * 1000:>11.1f}")
+            output = console.text()
+            if fmt == 'text' and level == 'info' and output != expected:
+                problems.append(f"{label} ({console_name}) output differs from print()")
+            if fmt == 'jsonl' and sum(1 for row in output.splitlines() if json.loads(row)) != args.count:
+                problems.append(f"{label} ({console_name}) lost events")
+            if level == 'warning' and output:
+                problems.append(f"{label} ({console_name}) printed successful commands")
+            if len(log.history) != min(args.count, 1000) or log.history[-1]['command'] != lines[-1]:
+                problems.append(f"{label} ({console_name}) history is incomplete")
+            if log.dropped:
+                problems.append(f"{label} ({console_name}) dropped {log.dropped} lines")
+
+    if problems:
+        print("\n[✗] " + "\n[✗] ".join(problems))
+        sys.exit(1)
+    print("\n[✓] Same output, written off the actuation thread; history keeps the last 1000 commands")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Command Parser Benchmark
+Checks that command_parser classifies every line exactly like the
+original detect_command_type (a golden corpus of edge cases plus
+randomly generated lines), then times both on a recorded-trajectory
+sized script.
+
+Usage: python3 benchmarks/bench_command_parser.py [-n 200000] [--fuzz 200000]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from command_parser import CommandParser, parse  # noqa: E402
+
+
+# ------------------------------------------------------------------
+# Reference: detect_command_type as shipped in v1.0.1, verbatim
+# ------------------------------------------------------------------
+
+MOUSE_ACTIONS = {
+    'move', 'left', 'right', 'middle', 'double',
+    'scroll_up', 'scroll_down', 'drag', 'here',
+    'hold', 'release'
+}
+KEYBOARD_ACTIONS = {'type', 'press'}
+KEYBOARD_INDICATORS = {
+    '{Enter}', '{Esc}', '{Tab}', '{Backspace}', '{BS}',
+    '{Delete}', '{Del}', '{Space}', '{Up}', '{Down}',
+    '{Left}', '{Right}', '{Home}', '{End}', '{PgUp}',
+    '{PgDn}', '{F1}', '{F2}', '{F3}', '{F4}', '{F5}',
+    '{F6}', '{F7}', '{F8}', '{F9}', '{F10}', '{F11}', '{F12}',
+    '{LWin}', '{RWin}'
+}
+
+
+def reference_detect(command):
+    tokens = command.strip().split()
+
+    if not tokens:
+        return 'invalid', command
+
+    if len(tokens) >= 2:
+        try:
+            int(tokens[0])
+            int(tokens[1])
+            if len(tokens) >= 3 and tokens[2] in MOUSE_ACTIONS:
+                return 'mouse', command
+            elif len(tokens) == 2:
+                return 'mouse', f"{command} move"
+        except ValueError:
+            pass
+
+    if tokens[0] == 'here':
+        if len(tokens) >= 2 and tokens[1] in MOUSE_ACTIONS:
+            return 'mouse', command
+        else:
+            return 'invalid', command
+
+    if tokens[0] in KEYBOARD_ACTIONS:
+        return 'keyboard', command
+
+    modifier_pattern = r'^[\^+!#]'
+    if re.match(modifier_pattern, command):
+        return 'keyboard', f"press {command}"
+
+    if any(indicator in command for indicator in KEYBOARD_INDICATORS):
+        if not command.startswith('press '):
+            return 'keyboard', f"press {command}"
+        return 'keyboard', command
+
+    if tokens[0] in MOUSE_ACTIONS:
+        return 'mouse', command
+
+    return 'keyboard', f"type {command}"
+
+
+# ------------------------------------------------------------------
+# Golden corpus
+# ------------------------------------------------------------------
+
+GOLDEN = [
+    '', '   ', '\t',
+    '500 500', '500 500 move', '500 500 left', '960 540 right', '1 2 double',
+    '10 10 middle', '10 10 scroll_up', '10 10 scroll_down 5', '200 200 drag 800 600',
+    '500 500 hold', '700 700 release', '5 5 here', '5 5 bogus', '5 5 bogus extra',
+    '-5 +7 left', '1_000 2_000 move', '1__0 5 move', '_1 5 move', '1_ 5 move',
+    '٣ ٤ left', '５ ６ move', '1.5 2 move', '0x10 5 move', '5', '5 x',
+    '  500 500  ', ' 500 500 left', '500 500 LEFT',
+    'here', 'here left', 'here drag 800 600', 'here scroll_up 3', 'here bogus', 'here here',
+    'type Hello World', 'type', 'press ^c', 'press', ' type indented', ' press {Enter}',
+    '^c', '+{Tab}', '!{F4}', '#r', '# comment line', ' ^c', '^', '#',
+    '{Enter}', '{Esc}', 'x{Enter}y', '{{Enter}', '{Ent{Enter}', '{enter}', '{Enter',
+    'Enter}', 'hello {F12} world', 'press {Enter}', 'press  {Enter}', '{F1}{F2}',
+    '{LWin}', '{Unknown}', '{}', '{ Enter }',
+    'left', 'move', 'double', 'scroll_down 10', 'drag 100 100', 'release now',
+    'Hello World', 'notepad', 'if (x > 5) { return true; }', 'user@example.com',
+    'Price: $100 @ 50% off!', 'left-handed', 'types are fun',
+]
+
+ALPHABET = ['500', '-3', '1_0', '٣', 'x', 'here', 'move', 'left', 'drag', 'scroll_up',
+            'type', 'press', '^c', '#r', '!', '+a', '{Enter}', '{F5}', '{Bogus}', '{',
+            '}', 'hello', 'press ', ' ', '\t', 'Left', '{{Tab}']
+
+
+def fuzz_lines(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    for _ in range(count):
+        parts = [rng.choice(ALPHABET) for _ in range(rng.randint(1, 5))]
+        yield rng.choice(['', ' ']) + rng.choice([' ', '', '  ']).join(parts)
+
+
+def check_golden(fuzz: int) -> int:
+    mismatches = 0
+    for line in GOLDEN + list(fuzz_lines(fuzz)):
+        expected = reference_detect(line)
+        actual = parse(line).as_tuple()
+        if expected != actual:
+            mismatches += 1
+            if mismatches <= 10:
+                print(f"[✗] {line!r}: expected {expected!r}, got {actual!r}")
+    return mismatches
+
+
+def trajectory(count: int, seed: int = 11, targets: int = 0):
+    """
+    Recorded-agent-like script: mostly moves and clicks, some typing.
+    With `targets` > 0 the pointer revisits that many fixed UI positions,
+    as agents do, so lines repeat.
+    """
+    rng = random.Random(seed)
+    spots = [(rng.randrange(0, 1920), rng.randrange(0, 1080)) for _ in range(targets)]
+    lines = []
+    for _ in range(count):
+        r = rng.random()
+        if spots:
+            x, y = rng.choice(spots)
+        else:
+            x, y = rng.randrange(0, 1920), rng.randrange(0, 1080)
+        if r < 0.6:
+            lines.append(f"{x} {y} move")
+        elif r < 0.75:
+            lines.append(f"{x} {y} left")
+        elif r < 0.8:
+            lines.append(f"{x} {y} drag {x + 40} {y + 40}")
+        elif r < 0.9:
+            lines.append(rng.choice(['press ^c', 'press ^v', '{Enter}', '^s', '{Tab}']))
+        else:
+            lines.append(f"type {rng.choice(['hello', 'search term', 'admin'])}")
+    return lines
+
+
+def keyboard_script(count: int, seed: int = 13):
+    """Form-filling style script: text, shortcuts and special keys"""
+    rng = random.Random(seed)
+    choices = ['{Tab}', '{Enter}', '^a', 'press ^v', '!{F4}', 'hello world', 'type 42']
+    return [rng.choice(choices) + ('' if rng.random() < 0.5 else f" {rng.randrange(1000)}")
+            for _ in range(count)]
+
+
+def timed(fn, repeat: int = 3) -> float:
+    """Best of `repeat` runs, so a noisy neighbour does not decide the ratio"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Golden check and microbenchmark for command_parser')
+    parser.add_argument('-n', '--count', type=int, default=200000, help='Trajectory lines (default: 200000)')
+    parser.add_argument('--fuzz', type=int, default=200000, help='Random lines to cross-check (default: 200000)')
+    args = parser.parse_args()
+
+    mismatches = check_golden(args.fuzz)
+    total = len(GOLDEN) + args.fuzz
+    if mismatches:
+        print(f"[✗] {mismatches}/{total} lines classified differently")
+        sys.exit(1)
+    print(f"[✓] Identical classification on {total} lines ({len(GOLDEN)} golden + {args.fuzz} fuzzed)")
+
+    workloads = {
+        'unique mouse-heavy trajectory': trajectory(args.count),
+        'trajectory over 200 UI targets': trajectory(args.count, targets=200),
+        'keyboard-heavy script': keyboard_script(args.count),
+    }
+    print(f"\n{'workload':<32} {'implementation':<30} {'ns/line':>8} {'speedup':>8}")
+    for workload, lines in workloads.items():
+        results = {
+            'reference detect_command_type': timed(lambda: [reference_detect(l) for l in lines]),
+            'command_parser.parse': timed(lambda: [parse(l) for l in lines]),
+            'CommandParser.parse_many': timed(lambda: CommandParser().parse_many(lines)),
+        }
+        base = results['reference detect_command_type']
+        for name, elapsed in results.items():
+            print(f"{workload:<32} {name:<30} {elapsed / len(lines) * 1e9:>8.0f} {base / elapsed:>7.1f}x")
+            workload = ''
+
+
+if __name__ == '__main__':
+    main()
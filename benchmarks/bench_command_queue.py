@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Command Queue Benchmark
+Sends the same burst of mouse commands through the legacy single-file
+protocol and the sequenced queue, against a local fake VM with stand-in
+watchers polling every 50ms, and reports throughput and lost commands.
+
+Usage: python3 benchmarks/bench_command_queue.py [-n 300] [--transport session]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from fake_watchers import LegacyWatcher, SpoolWatcher  # noqa: E402
+from fake_windows_server import FakeWindowsServer  # noqa: E402
+from windows_actuation_control import VMController  # noqa: E402
+
+
+def run(protocol: str, delay: float, transport: str, count: int, spawn_delay: float):
+    """Run one burst; returns (elapsed seconds, commands executed by the watcher)"""
+    with tempfile.TemporaryDirectory() as root:
+        server = FakeWindowsServer(root, spawn_delay=spawn_delay)
+        port = server.start()
+        watcher = (SpoolWatcher if protocol == 'queue' else LegacyWatcher)(root, 'mouse')
+        watcher.start()
+        commands = [f"{100 + i} {200 + i} move" for i in range(count)]
+
+        controller = VMController(host='127.0.0.1', username='agent', port=port,
+                                  transport=transport, protocol=protocol)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                if not controller.connect('agent'):
+                    raise SystemExit(f"[✗] Could not connect ({protocol})")
+                start = time.perf_counter()
+                controller.batch_mode(commands, delay=delay)
+                elapsed = time.perf_counter() - start
+                controller.disconnect()
+            # Let the legacy watcher pick up whatever is still on disk
+            time.sleep(watcher.poll_interval * 2)
+        finally:
+            watcher.stop()
+            server.stop()
+
+        executed = watcher.executed
+        if executed != commands[:len(executed)] and protocol == 'queue':
+            raise SystemExit("[✗] Queue delivered commands out of order")
+        return elapsed, len(executed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark file vs queue protocol')
+    parser.add_argument('-n', '--count', type=int, default=300, help='Commands per run (default: 300)')
+    parser.add_argument('--transport', choices=['exec', 'session'], default='session',
+                        help='Transport used for every run (default: session)')
+    parser.add_argument('--spawn-ms', type=float, default=20.0,
+                        help='Emulated cmd.exe startup per exec request in ms (default: 20)')
+    args = parser.parse_args()
+
+    runs = [
+        ('file', 0.1),
+        ('file', 0.0),
+        ('queue', None),
+    ]
+    print(f"{'protocol':<9} {'delay':>6} {'total (s)':>10} {'ops/sec':>9} {'executed':>9} {'lost':>6}")
+    for protocol, delay in runs:
+        elapsed, executed = run(protocol, delay, args.transport, args.count, args.spawn_ms / 1000)
+        label = 'auto' if delay is None else f"{delay:g}"
+        print(f"{protocol:<9} {label:>6} {elapsed:>10.3f} {args.count / elapsed:>9.1f} "
+              f"{executed:>9} {args.count - executed:>6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Control Server Benchmark
+What an agent worker pays to send one command: opening its own SSH
+connection (handshake, auth, shell and queue setup, then the command)
+versus connecting to a running `serve` daemon that already holds the
+session. Also reports the daemon's per-request overhead (ping) and
+command latency for Unix-socket and TCP clients.
+
+Usage: python3 benchmarks/bench_control_server.py [-n 30]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from connection_pool import ConnectionPool  # noqa: E402
+from control_server import ControlClient, ControlServer  # noqa: E402
+from fake_watchers import SpoolWatcher  # noqa: E402
+from fake_windows_server import FakeWindowsServer  # noqa: E402
+from metrics import LatencyHistogram  # noqa: E402
+from windows_actuation_control import VMController  # noqa: E402
+
+
+def row(name: str, histogram: LatencyHistogram):
+    s = histogram.summary()
+    print(f"{name:<34} {s['count']:>6} {s['p50'] * 1000:>9.3f} {s['p95'] * 1000:>9.3f} "
+          f"{s['p99'] * 1000:>9.3f}")
+
+
+def per_process(port: int, count: int) -> LatencyHistogram:
+    """A fresh connection per worker, as every `main()` run does today"""
+    latency = LatencyHistogram()
+    for i in range(count):
+        start = time.perf_counter()
+        controller = VMController('127.0.0.1', 'agent', port, transport='session', protocol='queue',
+                                  pool=ConnectionPool(keepalive_interval=0))
+        controller.connect('agent')
+        controller.execute_command(f"{i} {i} move")
+        controller.disconnect()
+        latency.record(time.perf_counter() - start)
+    return latency
+
+
+def via_daemon(address, port: int, count: int):
+    """(connect + command + close, ping, command on an open client)"""
+    fresh, ping, command = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    for i in range(count):
+        start = time.perf_counter()
+        with ControlClient(address) as client:
+            # Reuses the daemon's open session: the password is checked, no SSH handshake
+            client.connect('127.0.0.1', 'agent', 'agent', port)
+            client.execute(f"{i} {i} move")
+        fresh.record(time.perf_counter() - start)
+
+    with ControlClient(address) as client:
+        client.connect('127.0.0.1', 'agent', 'agent', port)
+        for i in range(count * 10):
+            start = time.perf_counter()
+            client.request('ping')
+            ping.record(time.perf_counter() - start)
+        for i in range(count):
+            start = time.perf_counter()
+            client.execute(f"{i} {i} left")
+            command.record(time.perf_counter() - start)
+    return fresh, ping, command
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark per-process SSH vs the control daemon')
+    parser.add_argument('-n', '--count', type=int, default=30, help='Commands per measurement (default: 30)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        server = FakeWindowsServer(root)
+        port = server.start()
+        watchers = [SpoolWatcher(root, device, poll_interval=0.01) for device in ('mouse', 'keyboard')]
+        for watcher in watchers:
+            watcher.start()
+
+        print(f"{'client':<34} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                baseline = per_process(port, args.count)
+            row('own SSH connection + command', baseline)
+
+            for name, address in (('unix', os.path.join(root, 'control.sock')), ('tcp', ('127.0.0.1', 0))):
+                daemon = ControlServer(address, transport='session', protocol='queue')
+                with contextlib.redirect_stdout(io.StringIO()):
+                    daemon.connect('127.0.0.1', 'agent', 'agent', port)
+                thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    thread.start()
+                    while daemon._server is None:
+                        time.sleep(0.01)
+                    if name == 'tcp':
+                        address = daemon._server.server_address
+                    fresh, ping, command = via_daemon(address, port, args.count)
+                    daemon.shutdown()
+                    thread.join()
+                row(f'{name}: connect daemon + command', fresh)
+                row(f'{name}: ping', ping)
+                row(f'{name}: command on open client', command)
+        finally:
+            for watcher in watchers:
+                watcher.stop()
+            server.stop()
+
+    saved = baseline.summary()['p50'] / fresh.summary()['p50']
+    print(f"\n[✓] Daemon client startup + command is {saved:.0f}x faster than a fresh SSH connection (p50)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Coordinate Space Benchmark
+Mapping a 100k-command script from a 1920x1080 reference space to a
+2560x1440 VM one line at a time (as callers rewrote coordinates before)
+versus as one batch, and rescaling a 100k-event trajectory file between
+the two resolutions. Batch paths run in plain Python and, when NumPy is
+installed, vectorized. Also checks that bare `x y` lines (implicit
+moves) are mapped like `x y move`.
+
+Usage: python3 benchmarks/bench_coordinate_space.py [-n 100000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+import coordinate_space  # noqa: E402
+from coordinate_space import CoordinateSpace, DisplayMetrics, rescale  # noqa: E402
+from trajectory import TrajectoryReader, TrajectoryWriter, to_text  # noqa: E402
+
+
+def script(count: int, seed: int = 1) -> list:
+    """Mostly moves, some clicks, drags and typing, in 1920x1080 pixels"""
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(count):
+        r = rng.random()
+        x, y = rng.randrange(1920), rng.randrange(1080)
+        if r < 0.6:
+            lines.append(f"{x} {y} move")
+        elif r < 0.7:
+            lines.append(f"{x} {y}")  # implicit move
+        elif r < 0.85:
+            lines.append(f"{x} {y} left")
+        elif r < 0.95:
+            lines.append(f"{x} {y} drag {rng.randrange(1920)} {rng.randrange(1080)}")
+        else:
+            lines.append("type hello")
+    return lines
+
+
+def best_of(repeat: int, fn) -> float:
+    """Fastest of `repeat` runs, in milliseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark coordinate space transforms')
+    parser.add_argument('-n', '--count', type=int, default=100000, help='Commands (default: 100000)')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement, best kept (default: 5)')
+    args = parser.parse_args()
+
+    lines = script(args.count)
+    transform = CoordinateSpace.parse('1920x1080').transform(DisplayMetrics.single(2560, 1440))
+    numpy = coordinate_space._load_numpy()
+    modes = [('python', False)] + ([('numpy', True)] if numpy else [])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, 'session.wact')
+        dst = os.path.join(tmp, 'rescaled.wact')
+        with TrajectoryWriter(src) as writer:
+            for line in lines:
+                writer.record(line)
+
+        print(f"{'operation':<40} {'ms':>9}")
+        per_line = best_of(args.repeat, lambda: [transform.apply_line(line) for line in lines])
+        print(f"{'script, line by line':<40} {per_line:>9.1f}")
+        results = {}
+        for name, enabled in modes:
+            coordinate_space._numpy = None if enabled else False  # None: imported again on use
+            batch = best_of(args.repeat, lambda: transform.apply(lines))
+            print(f"{'script, one batch (' + name + ')':<40} {batch:>9.1f}")
+            converted = best_of(args.repeat, lambda: rescale(src, dst, (1920, 1080), (2560, 1440)))
+            print(f"{'trajectory rescale (' + name + ')':<40} {converted:>9.1f}")
+            results[name] = list(to_text(TrajectoryReader(dst)))
+        if not numpy:
+            print("(NumPy is not installed; only the plain Python paths ran)")
+
+    expected = transform.apply(lines)
+    if any(result != expected for result in results.values()):
+        print("\n[✗] Rescaled trajectory differs from the rescaled script")
+        sys.exit(1)
+    vm = DisplayMetrics.single(1280, 720)
+    for space, line in (('1920x1080', '960 540'), ('1920x1080', '960 540 move'), ('normalized', '0.5 0.5')):
+        mapped = CoordinateSpace.parse(space).transform(vm).apply_line(line)
+        if mapped != '640 360 move':
+            print(f"\n[✗] '{line}' in {space} space became '{mapped}' on a 1280x720 VM (expected '640 360 move')")
+            sys.exit(1)
+    print(f"\n[✓] {args.count} commands mapped between resolutions; every path agrees")
+
+
+if __name__ == '__main__':
+    main()
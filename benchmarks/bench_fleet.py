@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Fleet Benchmark
+One shared macro script run across several fake VMs in parallel: healthy
+VMs, one slow VM (every command takes long to act on) and one dead VM
+(accepts TCP but never answers SSH). Reports the fleet's wall time
+against the sum of per-VM times, checks every healthy VM ran its shard
+in full, and that the slow and dead VMs were cut off by their timeouts
+instead of holding up the rest.
+
+Usage: python3 benchmarks/bench_fleet.py [--vms 6] [-n 300] [--parallel 8]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import socket
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from fake_watchers import SpoolWatcher  # noqa: E402
+from fake_windows_server import FakeWindowsServer  # noqa: E402
+from fleet import ERROR, OK, TIMEOUT, FleetRunner, load_inventory, summary_table  # noqa: E402
+
+SCRIPT = """# Shard ${shard} of ${shards}
+@repeat i 0..${count}
+${100 + shard * 10 + i % 50} ${200 + i % 30} move
+@end
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark parallel fleet runs')
+    parser.add_argument('--vms', type=int, default=6, help='Healthy VMs (default: 6)')
+    parser.add_argument('-n', '--count', type=int, default=300, help='Commands per VM (default: 300)')
+    parser.add_argument('--parallel', type=int, default=8, help='VMs at once (default: 8)')
+    parser.add_argument('--slow-time', type=float, default=0.05,
+                        help='Seconds the slow VM takes per command (default: 0.05)')
+    parser.add_argument('--timeout', type=float, default=5.0, help='Per-VM timeout (default: 5)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        servers, watchers, sections = [], {}, []
+        for i in range(args.vms + 1):
+            name = f"vm{i}" if i < args.vms else 'slow'
+            root = os.path.join(tmp, name)
+            server = FakeWindowsServer(root)
+            port = server.start()
+            servers.append(server)
+            action_time = args.slow_time if name == 'slow' else 0.0
+            watchers[name] = [SpoolWatcher(root, device, poll_interval=0.01, action_time=action_time)
+                              for device in ('mouse', 'keyboard')]
+            sections.append(f"[{name}]\nhost = 127.0.0.1\nport = {port}\n")
+        # Dead VM: the TCP handshake completes (backlog) but no SSH banner ever comes
+        dead = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        dead.bind(('127.0.0.1', 0))
+        dead.listen(8)
+        sections.append(f"[dead]\nhost = 127.0.0.1\nport = {dead.getsockname()[1]}\n")
+
+        script = os.path.join(tmp, 'shard.wac')
+        with open(script, 'w', encoding='utf-8') as f:
+            f.write(SCRIPT)
+        inventory = os.path.join(tmp, 'fleet.ini')
+        with open(inventory, 'w', encoding='utf-8') as f:
+            f.write("[DEFAULT]\nusername = agent\npassword = agent\nscript = shard.wac\n\n")
+            f.write('\n'.join(sections))
+
+        for pair in watchers.values():
+            for watcher in pair:
+                watcher.start()
+        # Quiet until the servers are down, so the abandoned slow VM's last words are dropped too
+        quiet = io.StringIO()
+        with contextlib.redirect_stdout(quiet):
+            try:
+                runner = FleetRunner(load_inventory(inventory), parallel=args.parallel,
+                                     host_timeout=args.timeout, connect_timeout=2.0,
+                                     variables={'count': args.count}, settle_mode='fixed',
+                                     progress_interval=0, cache=False)
+                start = time.perf_counter()
+                results = runner.run()
+                wall = time.perf_counter() - start
+                restored = sys.stdout is quiet
+            finally:
+                for pair in watchers.values():
+                    for watcher in pair:
+                        watcher.stop()
+                for server in servers:
+                    server.stop()
+                dead.close()
+
+    print(summary_table(results))
+    by_name = {r['name']: r for r in results}
+    healthy = [by_name[f"vm{i}"] for i in range(args.vms)]
+    print(f"\n{'fleet wall s':<24} {wall:>8.2f}")
+    print(f"{'sum of VM times s':<24} {sum(r['duration'] for r in results):>8.2f}")
+    print(f"{'slowest healthy VM s':<24} {max(r['duration'] for r in healthy):>8.2f}")
+
+    problems = []
+    for result in healthy:
+        executed = len(watchers[result['name']][0].executed)
+        if result['status'] != OK or executed != args.count:
+            problems.append(f"{result['name']}: {result['status']}, {executed}/{args.count} executed")
+    if by_name['slow']['status'] != TIMEOUT:
+        problems.append(f"slow: expected a timeout, got {by_name['slow']['status']}")
+    if by_name['dead']['status'] not in (ERROR, TIMEOUT):
+        problems.append(f"dead: expected an error, got {by_name['dead']['status']}")
+    if not restored:
+        problems.append("sys.stdout was left replaced while the slow VM's worker was still running")
+    if wall > args.timeout + 3:
+        problems.append(f"fleet took {wall:.1f}s, past the {args.timeout:g}s per-VM timeout")
+    if problems:
+        print("\n[✗] " + "\n[✗] ".join(problems))
+        sys.exit(1)
+    print(f"\n[✓] {args.vms} healthy VMs ran their shards in full; the slow and dead VMs were cut off")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Metrics Benchmark
+Measures what instrumentation costs per command (a span with the phases
+execute_command records, enabled vs disabled) and how close the
+log-linear histogram's percentiles are to exact ones on a heavy-tailed
+latency distribution.
+
+Usage: python3 benchmarks/bench_metrics.py [-n 200000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from metrics import QUANTILES, LatencyHistogram, Metrics  # noqa: E402
+
+PHASES = ('parse', 'attach', 'channel_open', 'remote_write', 'exit_status')
+
+
+def overhead(count: int):
+    print(f"{'instrumentation':<12} {'ns/command':>11}")
+    for enabled in (False, True):
+        metrics = Metrics(enabled=enabled, labels={'vm': 'bench'})
+        start = time.perf_counter()
+        for _ in range(count):
+            with metrics.span('execute') as span:
+                span.label(device='mouse', action='move')
+                for name in PHASES:
+                    with metrics.phase(name):
+                        pass
+            metrics.increment('commands_total', device='mouse', action='move', result='ok')
+        elapsed = time.perf_counter() - start
+        print(f"{'enabled' if enabled else 'disabled':<12} {elapsed / count * 1e9:>11.0f}")
+
+
+def accuracy(count: int):
+    rng = random.Random(9)
+    # Mostly ~20ms round trips with a long tail of reconnects and settles
+    samples = [rng.lognormvariate(-3.9, 0.6) + (rng.random() < 0.02) * rng.uniform(0.3, 2.0)
+               for _ in range(count)]
+    histogram = LatencyHistogram()
+    start = time.perf_counter()
+    for sample in samples:
+        histogram.record(sample)
+    elapsed = time.perf_counter() - start
+    exact = sorted(samples)
+
+    print(f"\n{'quantile':<9} {'exact ms':>10} {'histogram ms':>13} {'error':>7}")
+    worst = 0.0
+    for q in QUANTILES:
+        true = exact[max(0, round(q * count) - 1)]
+        approx = histogram.percentile(q)
+        error = abs(approx - true) / true
+        worst = max(worst, error)
+        print(f"p{q * 100:<8g} {true * 1000:>10.3f} {approx * 1000:>13.3f} {error:>7.2%}")
+    print(f"{len(histogram.counts)} buckets for {count} samples, "
+          f"{elapsed / count * 1e9:.0f} ns per record")
+    print(f"[{'✓' if worst < 0.02 else '✗'}] Worst percentile error {worst:.2%} (bound 1.6%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark instrumentation overhead and accuracy')
+    parser.add_argument('-n', '--count', type=int, default=200000, help='Iterations (default: 200000)')
+    args = parser.parse_args()
+    overhead(args.count)
+    accuracy(args.count)
+
+
+if __name__ == '__main__':
+    main()
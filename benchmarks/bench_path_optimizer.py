@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Path Optimizer Benchmark
+Builds a move-heavy agent script (hover tracking, clicks, drag-and-drop
+with hold/release, typing) and reports how many commands each optimizer
+setting eliminates, checking that every non-move command survives
+exactly and in order. Then sends the script one command per round trip
+to the local fake VM, with and without the optimizer, and compares
+round trips, wall time and the time the real AHK watcher would spend
+(it sleeps ~300ms after every command with coordinates).
+
+Usage: python3 benchmarks/bench_path_optimizer.py [-n 20000] [--send 600]
+"""
+
+import argparse
+import contextlib
+import io
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from command_parser import Action, default_parser  # noqa: E402
+from fake_watchers import SpoolWatcher  # noqa: E402
+from fake_windows_server import FakeWindowsServer  # noqa: E402
+from path_optimizer import PathOptimizer  # noqa: E402
+from windows_actuation_control import VMController  # noqa: E402
+
+# AHK watcher sleeps per command (see ExecuteCommand in mouse_control.ahk)
+AHK_COORD_COMMAND = 0.3
+AHK_HERE_COMMAND = 0.1
+
+
+def move_heavy_script(count: int, seed: int = 3):
+    """Agent-like script: tracking curves sampled every few pixels, with actions in between"""
+    rng = random.Random(seed)
+    x, y = 960.0, 540.0
+    lines = []
+    while len(lines) < count:
+        # Hover along a smooth curve towards a target, sampled densely
+        tx, ty = rng.randrange(50, 1870), rng.randrange(50, 1030)
+        bend = rng.uniform(-0.3, 0.3)
+        steps = rng.randint(20, 80)
+        for i in range(1, steps + 1):
+            t = i / steps
+            px = x + (tx - x) * t + bend * (ty - y) * math.sin(math.pi * t)
+            py = y + (ty - y) * t - bend * (tx - x) * math.sin(math.pi * t)
+            lines.append(f"{round(px)} {round(py)} move")
+            if rng.random() < 0.05:
+                lines.append("here move")
+            if rng.random() < 0.05:
+                lines.append(lines[-1])
+        x, y = tx, ty
+
+        r = rng.random()
+        if r < 0.4:
+            lines.append(f"{tx} {ty} left")
+        elif r < 0.55:
+            # Drag and drop with an explicit path while the button is held
+            lines.append("here hold")
+            for i in range(1, 30):
+                lines.append(f"{tx + 4 * i} {ty + (i * i) // 10} move")
+            lines.append("here release")
+            x, y = tx + 116, ty + 84
+        elif r < 0.65:
+            lines.append(f"{tx} {ty} drag {tx + 200} {ty}")
+            x = tx + 200
+        elif r < 0.8:
+            lines.append(f"{tx} {ty} double")
+            lines.append(f"type {rng.choice(['quarterly report', 'hello', 'Café'])}")
+            lines.append("{Enter}")
+        else:
+            lines.append(f"here scroll_down {rng.randint(1, 5)}")
+    return lines[:count]
+
+
+def non_moves(lines):
+    return [c.processed for c in map(default_parser.parse, lines)
+            if not (c.kind == 'mouse' and c.action is Action.MOVE)]
+
+
+def vm_time(lines):
+    """Seconds the AHK watchers would sleep for these commands"""
+    total = 0.0
+    for cmd in map(default_parser.parse, lines):
+        if cmd.kind == 'mouse':
+            total += AHK_COORD_COMMAND if cmd.x is not None else AHK_HERE_COMMAND
+    return total
+
+
+def reduction(lines):
+    settings = [
+        ('path, tolerance 0', PathOptimizer('path', 0)),
+        ('path, tolerance 1', PathOptimizer('path', 1)),
+        ('path, tolerance 2', PathOptimizer('path', 2)),
+        ('path, tolerance 5', PathOptimizer('path', 5)),
+        ('final', PathOptimizer('final')),
+    ]
+    expected = non_moves(lines)
+    print(f"{'setting':<20} {'commands':>9} {'eliminated':>11} {'here':>6} {'dups':>6} "
+          f"{'merged':>7} {'simplified':>11} {'VM time (s)':>12} {'ms':>6}")
+    print(f"{'none':<20} {len(lines):>9} {0:>11} {'':>6} {'':>6} {'':>7} {'':>11} "
+          f"{vm_time(lines):>12.0f} {'':>6}")
+    for name, optimizer in settings:
+        start = time.perf_counter()
+        output, report = optimizer.optimize(lines)
+        elapsed = time.perf_counter() - start
+        if non_moves(output) != expected:
+            raise SystemExit(f"[✗] {name}: clicks, holds, drags or keys changed")
+        print(f"{name:<20} {report['output']:>9} {report['eliminated']:>10} "
+              f"({report['eliminated'] / report['input']:>3.0%}) {report['here_moves']:>5} "
+              f"{report['duplicates']:>6} {report['merged']:>7} {report['simplified']:>11} "
+              f"{vm_time(output):>12.0f} {elapsed * 1000:>6.0f}")
+    print("[✓] Every click, hold, release, drag, scroll and key survived in order")
+
+
+def send(lines, optimizer):
+    """One round trip per command through the fake VM; returns (round trips, wall time, delivered)"""
+    with tempfile.TemporaryDirectory() as root:
+        server = FakeWindowsServer(root)
+        port = server.start()
+        watchers = [SpoolWatcher(root, 'mouse', poll_interval=0.005),
+                    SpoolWatcher(root, 'keyboard', poll_interval=0.005)]
+        for watcher in watchers:
+            watcher.start()
+        controller = VMController('127.0.0.1', 'agent', port, transport='exec',
+                                  protocol='queue', optimizer=optimizer)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                controller.connect('agent')
+                before = server.exec_count
+                start = time.perf_counter()
+                report = controller.batch_mode(lines, delay=0)
+                elapsed = time.perf_counter() - start
+                round_trips = server.exec_count - before
+                controller.disconnect()
+        finally:
+            for watcher in watchers:
+                watcher.stop()
+            server.stop()
+    return round_trips, elapsed, report['commands']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark mouse path coalescing')
+    parser.add_argument('-n', '--count', type=int, default=20000,
+                        help='Commands in the offline reduction run (default: 20000)')
+    parser.add_argument('--send', type=int, default=600,
+                        help='Commands sent to the fake VM, one round trip each (default: 600)')
+    args = parser.parse_args()
+
+    reduction(move_heavy_script(args.count))
+
+    lines = move_heavy_script(args.send, seed=4)
+    print(f"\n{'sent to fake VM':<20} {'round trips':>12} {'wall (s)':>9} {'delivered':>10}")
+    for name, optimizer in (('no optimizer', None),
+                            ('path, tolerance 2', PathOptimizer('path', 2)),
+                            ('final', PathOptimizer('final'))):
+        round_trips, elapsed, delivered = send(lines, optimizer)
+        print(f"{name:<20} {round_trips:>12} {elapsed:>9.2f} {delivered:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Screen Capture Benchmark
+Latency and bytes transferred per capture on the fake VM's synthetic
+1920x1080 desktop: full frames, a region of interest, downscaled frames
+and delta frames (one small window changing between captures). Then the
+time a UI-opening shortcut blocks with the fixed 300ms settle versus
+screen-based settling, for a UI that finishes opening quickly and one that
+takes longer than the fixed pause.
+
+Usage: python3 benchmarks/bench_screen_capture.py [-n 20]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from connection_pool import ConnectionPool  # noqa: E402
+from fake_screen import FakeCaptureAgent, SyntheticScreen  # noqa: E402
+from fake_watchers import SpoolWatcher  # noqa: E402
+from fake_windows_server import FakeWindowsServer  # noqa: E402
+from metrics import LatencyHistogram  # noqa: E402
+from windows_actuation_control import VMController  # noqa: E402
+
+
+def controller(port: int, **options) -> VMController:
+    vm = VMController('127.0.0.1', 'agent', port, transport='session', protocol='queue',
+                      pool=ConnectionPool(keepalive_interval=0), **options)
+    with contextlib.redirect_stdout(io.StringIO()):
+        vm.connect('agent')
+    return vm
+
+
+def captures(vm: VMController, screen: SyntheticScreen, count: int, **options):
+    """(latency histogram, mean bytes per frame) with a small window changing between captures"""
+    latency = LatencyHistogram()
+    size = 0
+    vm.capture_screen(**options)
+    for i in range(count):
+        screen.fill(300 + i % 5 * 10, 200, 120, 80, (i * 40 % 256, 80, 80))
+        start = time.perf_counter()
+        frame = vm.capture_screen(**options)
+        latency.record(time.perf_counter() - start)
+        size += frame.transferred
+    return latency, size / count
+
+
+def settle(port: int, screen: SyntheticScreen, duration: list, count: int, screen_settle: bool) -> LatencyHistogram:
+    """Time `press #r` blocks while the UI takes `duration[0]` seconds to open"""
+    latency = LatencyHistogram()
+    vm = controller(port, screen_settle=screen_settle)
+    if screen_settle:
+        vm.capture_screen(scale=0.25)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(count):
+            start = time.perf_counter()
+            vm.execute_command('press #r')
+            latency.record(time.perf_counter() - start)
+            time.sleep(duration[0] + 0.05)  # let any animation finish before the next one
+        vm.disconnect()
+    return latency
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark screen capture and screen-based settling')
+    parser.add_argument('-n', '--count', type=int, default=20, help='Captures per measurement (default: 20)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        server = FakeWindowsServer(root)
+        port = server.start()
+        screen = SyntheticScreen()
+        agent = FakeCaptureAgent(root, screen, poll_interval=0.005)
+        agent.start()
+        duration = [0.0]
+
+        def open_ui(device: str, line: str) -> float:
+            if line.startswith('press'):
+                screen.animate(duration[0])
+            return 0.0
+        watcher = SpoolWatcher(root, 'keyboard', poll_interval=0.01, action_time=open_ui)
+        watcher.start()
+
+        try:
+            print(f"{'capture':<30} {'p50 ms':>8} {'p95 ms':>8} {'KB/frame':>9}")
+            vm = controller(port)
+            for name, options in (('full frame', {'delta': False}),
+                                  ('region 640x480', {'region': (200, 150, 640, 480), 'delta': False}),
+                                  ('downscaled 0.25', {'scale': 0.25, 'delta': False}),
+                                  ('delta (full size)', {}),
+                                  ('delta 0.25', {'scale': 0.25})):
+                latency, size = captures(vm, screen, args.count, **options)
+                s = latency.summary()
+                print(f"{name:<30} {s['p50'] * 1000:>8.1f} {s['p95'] * 1000:>8.1f} {size / 1024:>9.1f}")
+            with contextlib.redirect_stdout(io.StringIO()):
+                vm.disconnect()
+
+            print(f"\n{'press #r settle':<30} {'p50 ms':>8} {'p95 ms':>8}")
+            for ui_time in (0.1, 0.6):
+                duration[0] = ui_time
+                for name, screen_settle in (('fixed 300ms', False), ('screen stable', True)):
+                    s = settle(port, screen, duration, max(3, args.count // 4), screen_settle).summary()
+                    label = f"UI {ui_time * 1000:.0f}ms, {name}"
+                    print(f"{label:<30} {s['p50'] * 1000:>8.1f} {s['p95'] * 1000:>8.1f}")
+        finally:
+            watcher.stop()
+            agent.stop()
+            server.stop()
+
+    print("\n[✓] Fixed settle returns before a slow UI has opened; screen settling follows the UI")
+
+
+if __name__ == '__main__':
+    main()
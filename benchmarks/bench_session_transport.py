@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Session Transport Benchmark
+Compares one exec_command per action against the persistent shell
+session, both driven through VMController against a local fake VM.
+
+Usage: python3 benchmarks/bench_session_transport.py [-n 300] [--spawn-ms 20]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from fake_windows_server import FakeWindowsServer  # noqa: E402
+from windows_actuation_control import VMController  # noqa: E402
+
+
+def run(transport: str, port: int, count: int) -> float:
+    """Send `count` mouse moves and return elapsed seconds"""
+    controller = VMController(host='127.0.0.1', username='agent', port=port, transport=transport)
+    with contextlib.redirect_stdout(io.StringIO()):
+        if not controller.connect('agent'):
+            raise SystemExit(f"[✗] Could not connect with transport '{transport}'")
+        start = time.perf_counter()
+        for i in range(count):
+            controller.execute_command(f"{100 + i % 500} {200 + i % 300} move")
+        elapsed = time.perf_counter() - start
+        controller.disconnect()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark exec vs session transport')
+    parser.add_argument('-n', '--count', type=int, default=300, help='Commands per run (default: 300)')
+    parser.add_argument('--spawn-ms', type=float, default=20.0,
+                        help='Emulated cmd.exe startup per exec request in ms (default: 20)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        server = FakeWindowsServer(root, spawn_delay=args.spawn_ms / 1000)
+        port = server.start()
+        try:
+            results = {t: run(t, port, args.count) for t in ('exec', 'session')}
+        finally:
+            server.stop()
+
+    print(f"{'transport':<10} {'total (s)':>10} {'per op (ms)':>12} {'ops/sec':>10}")
+    for transport, elapsed in results.items():
+        print(f"{transport:<10} {elapsed:>10.3f} {elapsed / args.count * 1000:>12.2f} "
+              f"{args.count / elapsed:>10.1f}")
+    print(f"\nSpeedup: {results['exec'] / results['session']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark
+Scripts call `windows-actuation -c "..."` thousands of times a day, so
+process startup is part of every action. Measures, in fresh interpreters:
+the bare interpreter, `import paramiko` (the floor for any SSH client),
+importing the tool, and a full headless `-c` run against the local fake
+VM. Fails when the tool's own import cost on top of paramiko exceeds the
+budget, or when update-only dependencies are imported at startup.
+
+Usage: python3 benchmarks/bench_startup.py [-n 10] [--budget-ms 75]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts')
+sys.path.insert(0, SCRIPTS)
+
+from fake_watchers import LegacyWatcher  # noqa: E402
+from fake_windows_server import FakeWindowsServer  # noqa: E402
+
+# Must not be imported just to send a command (unless paramiko already does)
+UPDATE_ONLY = ('requests', 'urllib3', 'zipfile', 'configparser', 'uuid', 'control_server', 'release_download')
+
+
+def run(args, env=None) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable] + args, cwd=SCRIPTS, env=env, check=True,
+                   stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def median_ms(args, count: int, env=None) -> float:
+    run(args, env)  # warm the OS file cache
+    return statistics.median(run(args, env) for _ in range(count)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure CLI startup cost')
+    parser.add_argument('-n', '--count', type=int, default=10, help='Runs per measurement (default: 10)')
+    parser.add_argument('--budget-ms', type=float, default=75.0,
+                        help='Max import cost of the tool on top of paramiko (default: 75)')
+    args = parser.parse_args()
+
+    check = ("import sys, paramiko; before = set(sys.modules); import windows_actuation_control; "
+             f"print(','.join(m for m in {UPDATE_ONLY!r} if m in set(sys.modules) - before))")
+    loaded = subprocess.run([sys.executable, '-c', check], cwd=SCRIPTS, capture_output=True,
+                            text=True, check=True).stdout.strip()
+
+    floor = median_ms(['-c', 'pass'], args.count)
+    ssh = median_ms(['-c', 'import paramiko'], args.count)
+    tool = median_ms(['-c', 'import windows_actuation_control'], args.count)
+
+    with tempfile.TemporaryDirectory() as root:
+        server = FakeWindowsServer(root)
+        port = server.start()
+        watcher = LegacyWatcher(root, 'mouse', poll_interval=0.01)
+        watcher.start()
+        env = dict(os.environ, WAC_PASSWORD='agent')
+        try:
+            command = median_ms(['windows_actuation_control.py', '-c', '500 500 left', '--host', '127.0.0.1',
+                                 '--port', str(port), '--username', 'agent'], args.count, env)
+        finally:
+            watcher.stop()
+            server.stop()
+
+    print(f"{'step':<34} {'p50 ms':>8}")
+    print(f"{'python -c pass':<34} {floor:>8.0f}")
+    print(f"{'import paramiko':<34} {ssh:>8.0f}")
+    print(f"{'import windows_actuation_control':<34} {tool:>8.0f}")
+    print(f"{'-c 500 500 left (fake VM)':<34} {command:>8.0f}")
+    own = tool - ssh
+    print(f"\nTool import on top of paramiko: {own:.0f}ms (budget {args.budget_ms:.0f}ms)")
+
+    if loaded:
+        raise SystemExit(f"[✗] Imported at startup: {loaded}")
+    if own > args.budget_ms:
+        raise SystemExit("[✗] Startup budget exceeded")
+    print("[✓] Within budget; update-only dependencies are not imported")
+
+
+if __name__ == '__main__':
+    main()
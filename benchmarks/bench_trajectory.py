@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Trajectory Benchmark
+Compares a long move-heavy session stored as a text command file and as
+a trajectory (plain and gzip): size on disk, time to read it back, and a
+lossless round trip. Then records a short session against the local fake
+VM and replays it at original and maximum speed, checking the watcher
+sees the same commands in the same order.
+
+Usage: python3 benchmarks/bench_trajectory.py [-n 200000]
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from command_parser import CommandParser  # noqa: E402
+from fake_watchers import SpoolWatcher  # noqa: E402
+from fake_windows_server import FakeWindowsServer  # noqa: E402
+from trajectory import TrajectoryReader, TrajectoryWriter, from_text, replay, to_text  # noqa: E402
+from windows_actuation_control import VMController  # noqa: E402
+
+
+def session(count: int, seed: int = 5):
+    """Agent-like session: mouse paths with clicks, drags, scrolls and typing"""
+    rng = random.Random(seed)
+    x, y = 960, 540
+    lines = []
+    while len(lines) < count:
+        r = rng.random()
+        if r < 0.8:
+            x = min(max(x + rng.randint(-15, 15), 0), 1919)
+            y = min(max(y + rng.randint(-15, 15), 0), 1079)
+            lines.append(f"{x} {y} move")
+        elif r < 0.88:
+            lines.append(f"{x} {y} left")
+        elif r < 0.9:
+            lines.append(f"{x} {y} drag {x + 120} {y + 40}")
+        elif r < 0.92:
+            lines.append(f"{x} {y} scroll_down 3")
+        elif r < 0.94:
+            lines.append("here double")
+        elif r < 0.97:
+            lines.append(rng.choice(['press ^c', 'press ^v', 'press {Enter}', 'press ^+{Esc}']))
+        else:
+            lines.append(f"type {rng.choice(['hello world', 'report.xlsx', 'Café 10%'])}")
+    return lines
+
+
+def timed(fn, repeat: int = 3):
+    """Best time of `repeat` runs of `fn` (with the cyclic GC paused, so its pauses do not pick a winner)"""
+    best = float('inf')
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = fn()
+            best = min(best, time.perf_counter() - start)
+        return best, result
+    finally:
+        gc.enable()
+
+
+def storage(count: int):
+    lines = session(count)
+    events = list(from_text(lines, interval=0.016))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        text_path = os.path.join(tmp, 'session.txt')
+        with open(text_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+
+        def read_text():
+            with open(text_path, encoding='utf-8') as f:
+                return CommandParser().parse_many(f)
+
+        print(f"{'format':<20} {'size (KB)':>10} {'bytes/cmd':>10} {'read (ms)':>10} {'cmds/sec':>12}")
+        elapsed, parsed = timed(read_text)
+        size = os.path.getsize(text_path)
+        print(f"{'text + parse':<20} {size / 1024:>10.0f} {size / count:>10.1f} "
+              f"{elapsed * 1000:>10.0f} {len(parsed) / elapsed:>12.0f}")
+
+        for compress in (False, True):
+            path = os.path.join(tmp, 'session.wact' + ('.gz' if compress else ''))
+            with TrajectoryWriter(path, compress=compress) as writer:
+                writer.write_events(events)
+            elapsed, decoded = timed(lambda: list(TrajectoryReader(path)))
+            if list(to_text(decoded)) != lines:
+                raise SystemExit(f"[✗] Round trip changed commands (compress={compress})")
+            if any(abs(a.offset - b.offset) > 1e-6 for a, b in zip(decoded, events)):
+                raise SystemExit(f"[✗] Round trip changed timing (compress={compress})")
+            size = os.path.getsize(path)
+            label = 'trajectory (gzip)' if compress else 'trajectory'
+            print(f"{label:<20} {size / 1024:>10.0f} {size / count:>10.1f} "
+                  f"{elapsed * 1000:>10.0f} {len(decoded) / elapsed:>12.0f}")
+    print(f"[✓] Lossless round trip of {count} commands (text and timing)")
+
+
+def record_and_replay():
+    """Record a session through execute_command, then replay it twice"""
+    with tempfile.TemporaryDirectory() as root:
+        server = FakeWindowsServer(root)
+        port = server.start()
+        watcher = SpoolWatcher(root, 'mouse', poll_interval=0.01)
+        watcher.start()
+        path = os.path.join(root, 'recorded.wact')
+        commands = [f"{100 + 3 * i} {200 + 2 * i} move" for i in range(40)]
+
+        controller = VMController('127.0.0.1', 'agent', port, transport='session', protocol='queue')
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                controller.connect('agent')
+                controller.start_recording(path)
+                start = time.perf_counter()
+                for command in commands:
+                    controller.execute_command(command)
+                    time.sleep(0.01)
+                controller.drain()
+                recorded_time = time.perf_counter() - start
+                controller.stop_recording()
+                timed_report = replay(controller, TrajectoryReader(path), speed=1.0)
+                fast_report = replay(controller, TrajectoryReader(path), speed=None)
+                controller.disconnect()
+        finally:
+            watcher.stop()
+            server.stop()
+
+    if watcher.executed != commands * 3:
+        raise SystemExit("[✗] Replayed commands differ from the recording")
+    print(f"\n{'run':<20} {'wall (s)':>10} {'max lag (ms)':>13}")
+    print(f"{'recorded':<20} {recorded_time:>10.3f} {'':>13}")
+    print(f"{'replay 1x':<20} {timed_report['wall_time']:>10.3f} {timed_report['max_lag'] * 1000:>13.1f}")
+    print(f"{'replay max speed':<20} {fast_report['wall_time']:>10.3f} {'':>13}")
+    print(f"[✓] Both replays delivered the recorded {len(commands)} commands in order")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark trajectory storage and replay')
+    parser.add_argument('-n', '--count', type=int, default=200000,
+                        help='Commands in the stored session (default: 200000)')
+    args = parser.parse_args()
+    storage(args.count)
+    record_and_replay()
+
+
+if __name__ == '__main__':
+    main()
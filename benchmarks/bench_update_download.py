@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Update Download Benchmark
+A release archive served by a local stand-in for GitHub, throttled per
+connection like a slow VM network. Compares the old update download (one
+stream, 8 KB reads, restart from zero) with the release cache: one
+connection, parallel ranges, a cache hit, several clients pulling at
+once, a flaky network that drops connections, and a run killed half way
+then started again. Then extracting the binary from the archive: unpack
+everything and search, against streaming just that member. Bytes sent
+are counted by the server.
+
+Usage: python3 benchmarks/bench_update_download.py [--size-mb 24] [--rate-mb 12]
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from pathlib import Path
+
+SCRIPTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts')
+sys.path.insert(0, SCRIPTS)
+
+import requests  # noqa: E402
+
+import release_download  # noqa: E402
+from fake_release_server import FakeReleaseServer  # noqa: E402
+from release_download import DownloadError, extract_member, fetch  # noqa: E402
+
+BINARY = 'windows-actuation.exe'
+NAME = 'windows-actuation-9.9.9-win-x64.zip'
+
+
+def archive(size: int) -> bytes:
+    """A release zip: the binary plus a folder of support files, mostly incompressible"""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+        zf.writestr(f"windows-actuation/{BINARY}", os.urandom(size * 2 // 3))
+        for i in range(200):
+            zf.writestr(f"windows-actuation/_internal/lib{i:03}.pyd", os.urandom(size // 3 // 200))
+    return buf.getvalue()
+
+
+def old_download(url: str, dest: str, attempts: int = 5) -> bool:
+    """The previous update download: one stream in 8 KB reads, started over when it drops"""
+    for _ in range(attempts):
+        try:
+            response = requests.get(url, stream=True, timeout=30)
+            response.raise_for_status()
+            with open(dest, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=8192):
+                    f.write(chunk)
+            if os.path.getsize(dest) == int(response.headers['Content-Length']):
+                return True
+        except requests.RequestException:
+            pass
+    return False
+
+
+def measure(server: FakeReleaseServer, fn) -> tuple:
+    """(seconds, MB sent by the server, result) for one call"""
+    server.reset_counters()
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, server.bytes_sent / 2 ** 20, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark resumable, cached update downloads')
+    parser.add_argument('--size-mb', type=int, default=24, help='Archive size in MB (default: 24)')
+    parser.add_argument('--rate-mb', type=float, default=12.0,
+                        help='Per-connection bandwidth in MB/s (default: 12)')
+    args = parser.parse_args()
+
+    data = archive(args.size_mb << 20)
+    sha256 = hashlib.sha256(data).hexdigest()
+    server = FakeReleaseServer({f"/{NAME}": data}, rate=args.rate_mb * 2 ** 20)
+    url = server.start() + f"/{NAME}"
+    size_mb = len(data) / 2 ** 20
+    rows, problems = [], []
+
+    def row(label: str, seconds: float, sent: float, ok: bool):
+        rows.append(f"{label:<34} {seconds:>8.2f} {sent:>9.1f} {'yes' if ok else 'NO':>6}")
+
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        def cache(name: str) -> str:
+            return os.path.join(tmp, name)
+
+        seconds, sent, ok = measure(server, lambda: old_download(url, cache('old.zip')))
+        row('old: one stream, 8 KB reads', seconds, sent, ok)
+        seconds, sent, path = measure(server, lambda: fetch(url, NAME, sha256, cache('one'), connections=1))
+        row('cache: one connection', seconds, sent, path is not None)
+        seconds, sent, path = measure(server, lambda: fetch(url, NAME, sha256, cache('ranges')))
+        row(f'cache: {release_download.DEFAULT_CONNECTIONS} parallel ranges', seconds, sent, path is not None)
+        seconds, sent, path = measure(server, lambda: fetch(url, NAME, sha256, cache('ranges')))
+        row('cache: already cached', seconds, sent, path is not None)
+        if sent:
+            problems.append(f"cache hit still downloaded {sent:.1f} MB")
+
+        # Several clients sharing one cache, all at once: one download between them
+        results = []
+
+        def client():
+            results.append(fetch(url, NAME, sha256, cache('shared')))
+
+        def clients():
+            threads = [threading.Thread(target=client) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            return len(results) == 4
+
+        seconds, sent, ok = measure(server, clients)
+        row('cache: 4 clients at once', seconds, sent, ok)
+        if sent > size_mb * 1.01:
+            problems.append(f"4 clients sharing a cache downloaded {sent:.1f} MB")
+
+        # Flaky network: the next 6 responses drop after a quarter of the file
+        server.drop(len(data) // 4, 6)
+        seconds, sent, ok = measure(server, lambda: old_download(url, cache('old_flaky.zip')))
+        row('old: connections dropping', seconds, sent, ok)
+        server.drop(len(data) // 4, 6)
+        seconds, sent, path = measure(server, lambda: fetch(url, NAME, sha256, cache('flaky'), connections=1))
+        row('cache: connections dropping', seconds, sent, path is not None)
+        server.drop(0, 0)
+
+        # A run killed half way, then started again
+        code = (f"import sys; sys.path.insert(0, {SCRIPTS!r}); from release_download import fetch; "
+                f"fetch({url!r}, {NAME!r}, {sha256!r}, {cache('killed')!r})")
+        server.reset_counters()
+        process = subprocess.Popen([sys.executable, '-c', code], stdout=subprocess.DEVNULL)
+        while server.bytes_sent < len(data) // 2 and process.poll() is None:
+            time.sleep(0.01)
+        process.kill()
+        process.wait()
+        first = server.bytes_sent / 2 ** 20
+        seconds, sent, path = measure(server, lambda: fetch(url, NAME, sha256, cache('killed')))
+        row(f'cache: rerun after kill at {first:.0f} MB', seconds, sent, path is not None)
+        if sent > size_mb - first + 2 * release_download.DEFAULT_CONNECTIONS * 2:
+            problems.append(f"rerun after a kill downloaded {sent:.1f} MB of {size_mb:.1f}")
+
+        # Corrupted download: must be refused, and not cached
+        try:
+            fetch(url, NAME, '0' * 64, cache('bad'))
+            problems.append("a checksum mismatch was accepted")
+        except DownloadError:
+            pass
+        if os.path.exists(os.path.join(cache('bad'), NAME)):
+            problems.append("a download that failed its checksum was cached")
+
+        # Extraction
+        cached = os.path.join(cache('ranges'), NAME)
+        start = time.perf_counter()
+        unpacked = cache('unpacked')
+        with zipfile.ZipFile(cached) as zf:
+            zf.extractall(unpacked)
+        old_bin = str(next(Path(unpacked).rglob(BINARY)))
+        extract_all = time.perf_counter() - start
+        start = time.perf_counter()
+        new_bin = extract_member(cached, BINARY, cache(BINARY))
+        extract_one = time.perf_counter() - start
+        with open(old_bin, 'rb') as a, open(new_bin, 'rb') as b:
+            if a.read() != b.read():
+                problems.append("the streamed binary differs from the unpacked one")
+
+    server.stop()
+    print(f"Archive {size_mb:.1f} MB, {args.rate_mb:g} MB/s per connection\n")
+    print(f"{'download':<34} {'wall s':>8} {'MB sent':>9} {'done':>6}")
+    print('\n'.join(rows))
+    print(f"\n{'extract binary':<34} {'ms':>8}")
+    print(f"{'extractall + rglob':<34} {extract_all * 1000:>8.0f}")
+    print(f"{'stream one member':<34} {extract_one * 1000:>8.0f}")
+
+    if problems:
+        print("\n[✗] " + "\n[✗] ".join(problems))
+        sys.exit(1)
+    print("\n[✓] Downloads resume, verify, and are shared through the cache")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Reconnect Scenarios
+Kills the local fake VM's connections underneath live controllers, or
+restarts it entirely, and checks that the connection pool recovers with
+in-flight commands replayed or failed exactly as the policy says, never
+lost silently and never duplicated.
+
+Usage: python3 benchmarks/check_reconnect.py
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from connection_pool import ConnectionPool, ReconnectPolicy  # noqa: E402
+from fake_watchers import SpoolWatcher  # noqa: E402
+from fake_windows_server import FakeWindowsServer  # noqa: E402
+from windows_actuation_control import VMController  # noqa: E402
+
+
+def restart(server: FakeWindowsServer, root: str, downtime: float) -> FakeWindowsServer:
+    """Stop the VM, stay down for `downtime`, then listen again on the same port"""
+    port = server.port
+    server.stop()
+    time.sleep(downtime)
+    replacement = FakeWindowsServer(root, port=port)
+    replacement.start()
+    return replacement
+
+
+def scenario(name: str, transport: str, replay: bool, fault: str, expected_failures: int) -> bool:
+    """
+    fault = 'drop':    connection killed while the 11th command is in flight
+    fault = 'restart': VM down for a while between commands, keepalive recovers it
+    """
+    with tempfile.TemporaryDirectory() as root:
+        server = FakeWindowsServer(root)
+        server.start()
+        watcher = SpoolWatcher(root, 'mouse')
+        watcher.start()
+
+        pool = ConnectionPool(
+            keepalive_interval=0.2 if fault == 'restart' else 0,
+            policy=ReconnectPolicy(max_attempts=10, initial_delay=0.1, max_delay=0.5, replay=replay),
+        )
+        controller = VMController('127.0.0.1', 'agent', server.port, transport=transport,
+                                  protocol='queue', pool=pool)
+        results = []
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                controller.connect('agent')
+                for i in range(10):
+                    results.append(controller.execute_command(f"{i} {i} move"))
+                if fault == 'drop':
+                    server.drop_on_next_command()
+                else:
+                    server = restart(server, root, 0.5)
+                    time.sleep(0.5)
+                for i in range(10, 20):
+                    results.append(controller.execute_command(f"{i} {i} move"))
+                controller.drain()
+                health = controller.health()
+                controller.disconnect()
+        finally:
+            watcher.stop()
+            server.stop()
+
+    sent = [f"{i} {i} move" for i, ok in enumerate(results) if ok]
+    failed = results.count(False)
+    ok = watcher.executed == sent and failed == expected_failures and health['reconnects'] >= 1
+    print(f"[{'✓' if ok else '✗'}] {name}: {len(sent)} delivered, {failed} failed, "
+          f"{len(watcher.executed) - len(set(watcher.executed))} duplicated, "
+          f"reconnects={health['reconnects']}, state={health['state']}")
+    return ok
+
+
+def main():
+    checks = [
+        scenario('session: in-flight command replayed', 'session', True, 'drop', 0),
+        scenario('session: in-flight command failed', 'session', False, 'drop', 1),
+        scenario('exec: in-flight command replayed', 'exec', True, 'drop', 0),
+        scenario('exec: in-flight command failed', 'exec', False, 'drop', 1),
+        scenario('session: VM restart, keepalive reconnects', 'session', True, 'restart', 0),
+        scenario('exec: VM restart, keepalive reconnects', 'exec', True, 'restart', 0),
+    ]
+    sys.exit(0 if all(checks) else 1)
+
+
+if __name__ == '__main__':
+    main()
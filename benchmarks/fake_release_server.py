@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Fake Release Server
+Local HTTP server standing in for GitHub's release downloads: serves
+files from memory with HEAD, single byte ranges and ETags, and can
+throttle each connection and drop connections part-way through, the way
+slow and flaky VM networks do. Used by the update benchmark.
+"""
+
+import hashlib
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+_RANGE = re.compile(r'bytes=(\d+)-(\d*)$')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: '_Server'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self._serve(body=False)
+
+    def do_GET(self):
+        self._serve(body=True)
+
+    def _serve(self, body: bool):
+        fake = self.server.fake
+        data = fake.files.get(self.path)
+        if data is None:
+            self.send_error(404)
+            return
+        start, end, status = 0, len(data), 200
+        match = _RANGE.match(self.headers.get('Range', ''))
+        if match and fake.ranges:
+            start = int(match.group(1))
+            end = min(len(data), int(match.group(2)) + 1) if match.group(2) else len(data)
+            if start >= end:
+                self.send_error(416)
+                return
+            status = 206
+        self.send_response(status)
+        self.send_header('Content-Length', str(end - start))
+        self.send_header('ETag', f'"{hashlib.md5(data).hexdigest()}"')
+        if fake.ranges:
+            self.send_header('Accept-Ranges', 'bytes')
+            if status == 206:
+                self.send_header('Content-Range', f"bytes {start}-{end - 1}/{len(data)}")
+        self.end_headers()
+        if not body:
+            return
+        with fake.lock:
+            fake.requests += 1
+            drop_at = fake.drop_after if fake.drops_left > 0 else None
+            if drop_at is not None:
+                fake.drops_left -= 1
+
+        # Send in slices, at `rate` bytes/second per connection
+        sent, slice_size, begin = 0, 64 * 1024, time.monotonic()
+        while start + sent < end:
+            size = min(slice_size, end - start - sent)
+            if drop_at is not None and sent + size > drop_at:
+                size = drop_at - sent
+            if size <= 0:
+                self.close_connection = True
+                return
+            self.wfile.write(data[start + sent:start + sent + size])
+            sent += size
+            with fake.lock:
+                fake.bytes_sent += size
+            if fake.rate:
+                ahead = sent / fake.rate - (time.monotonic() - begin)
+                if ahead > 0:
+                    time.sleep(ahead)
+            if drop_at is not None and sent >= drop_at:
+                self.close_connection = True
+                return
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    fake: 'FakeReleaseServer'
+
+    def handle_error(self, request, client_address):
+        pass  # clients hanging up mid-download are part of the test
+
+
+class FakeReleaseServer:
+    """
+    Serves `files` ({path: bytes}). `rate` limits each connection (bytes
+    per second, 0 for none); the next `drops` responses are cut off after
+    `drop_after` bytes; `ranges` False makes it ignore Range headers.
+    """
+
+    def __init__(self, files: Optional[Dict[str, bytes]] = None, rate: float = 0.0, ranges: bool = True):
+        self.files = dict(files or {})
+        self.rate = rate
+        self.ranges = ranges
+        self.drop_after = 0
+        self.drops_left = 0
+        self.bytes_sent = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+        self._server: Optional[_Server] = None
+
+    def start(self) -> str:
+        """Start serving; returns the base URL"""
+        self._server = _Server(('127.0.0.1', 0), _Handler)
+        self._server.fake = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def drop(self, after: int, count: int):
+        """Cut the next `count` responses off after `after` bytes each"""
+        with self.lock:
+            self.drop_after = after
+            self.drops_left = count
+
+    def reset_counters(self):
+        with self.lock:
+            self.bytes_sent = 0
+            self.requests = 0
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
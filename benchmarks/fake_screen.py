@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Stand-in Capture Agent
+Python equivalent of screen_capture.ps1 serving frames of a synthetic
+desktop from the fake VM's C:\\wac_capture directory, so capture, deltas
+and screen-based settling can be measured on plain Linux.
+"""
+
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import List, Optional, Tuple
+
+
+class SyntheticScreen:
+    """
+    A desktop image (gradient background) that tests draw on. animate()
+    moves a window across it in the background, like a UI opening.
+    """
+
+    def __init__(self, width: int = 1920, height: int = 1080):
+        self.width = width
+        self.height = height
+        self.lock = threading.Lock()
+        row = bytearray()
+        for x in range(width):
+            row += bytes((x * 255 // width, 96, 160))
+        self.pixels = bytearray()
+        for y in range(height):
+            self.pixels += row
+        self.version = 0
+
+    def fill(self, x: int, y: int, w: int, h: int, color: Tuple[int, int, int]):
+        """Paint a rectangle, clipped to the screen"""
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(self.width, x + w), min(self.height, y + h)
+        if x1 <= x0 or y1 <= y0:
+            return
+        line = bytes(color) * (x1 - x0)
+        with self.lock:
+            for row in range(y0, y1):
+                start = (row * self.width + x0) * 3
+                self.pixels[start:start + len(line)] = line
+            self.version += 1
+
+    def animate(self, duration: float, steps: int = 10, size: Tuple[int, int] = (400, 300)):
+        """Slide a window in over `duration` seconds (non-blocking)"""
+        def run():
+            w, h = size
+            for i in range(steps + 1):
+                shade = 40 + i * 200 // steps
+                self.fill(200 + i * 20, 150 + i * 10, w, h, (shade, shade, shade))
+                time.sleep(duration / steps)
+        threading.Thread(target=run, daemon=True).start()
+
+    def grab(self, x: int, y: int, w: int, h: int, scale: int) -> Tuple[bytes, int, int]:
+        """Packed RGB pixels of a region, downscaled by an integer factor (nearest)"""
+        step = max(1, round(100 / scale))
+        out_w, out_h = max(1, w // step), max(1, h // step)
+        out = bytearray(out_w * out_h * 3)
+        with self.lock:
+            for r in range(out_h):
+                start = ((y + r * step) * self.width + x) * 3
+                row = self.pixels[start:start + out_w * step * 3]
+                dst = r * out_w * 3
+                for channel in range(3):
+                    out[dst + channel:dst + out_w * 3:3] = row[channel::3 * step][:out_w]
+        return bytes(out), out_w, out_h
+
+
+class FakeCaptureAgent:
+    """Polling thread answering capture requests with frames of a SyntheticScreen"""
+
+    def __init__(self, root: str, screen: SyntheticScreen, poll_interval: float = 0.01):
+        self.directory = os.path.join(root, 'wac_capture')
+        self.screen = screen
+        self.poll_interval = poll_interval
+        self.served: List[int] = []
+        self._last: Optional[Tuple[int, str, bytes]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join()
+
+    def _loop(self):
+        while self._running:
+            for name in sorted(os.listdir(self.directory)):
+                if name.endswith('.req'):
+                    path = os.path.join(self.directory, name)
+                    try:
+                        with open(path) as f:
+                            self.serve(f.read())
+                    finally:
+                        os.remove(path)
+            time.sleep(self.poll_interval)
+
+    def serve(self, request: str):
+        """capture <id> <x> <y> <w> <h> <scale> <tile> <base>"""
+        fields = request.split()
+        frame_id, x, y, w, h, scale, tile, base = (int(v) for v in fields[1:9])
+        if w <= 0 or h <= 0:
+            x, y, w, h = 0, 0, self.screen.width, self.screen.height
+        pixels, width, height = self.screen.grab(x, y, w, h, scale)
+        key = f"{x},{y},{w},{h},{scale},{tile}"
+        previous = self._last[2] if self._last and base and self._last[:2] == (base, key) else None
+
+        tiles = []
+        cols = (width + tile - 1) // tile
+        rows = (height + tile - 1) // tile
+        for index in range(cols * rows):
+            tx, ty = (index % cols) * tile, (index // cols) * tile
+            row_bytes = min(tile, width - tx) * 3
+            raw = b''.join(pixels[((ty + r) * width + tx) * 3:((ty + r) * width + tx) * 3 + row_bytes]
+                           for r in range(min(tile, height - ty)))
+            if previous is not None:
+                old = b''.join(previous[((ty + r) * width + tx) * 3:((ty + r) * width + tx) * 3 + row_bytes]
+                               for r in range(min(tile, height - ty)))
+                if old == raw:
+                    continue
+            packer = zlib.compressobj(1, zlib.DEFLATED, -15)
+            data = packer.compress(raw) + packer.flush()
+            tiles.append(struct.pack('<II', index, len(data)) + data)
+
+        header = struct.pack('<4sBBHHHIII', b'WACF', 1, 1 if previous is not None else 0, tile, width, height,
+                             frame_id, base if previous is not None else 0, len(tiles))
+        part = os.path.join(self.directory, f"{frame_id}.part")
+        with open(part, 'wb') as f:
+            f.write(header + b''.join(tiles))
+        os.replace(part, os.path.join(self.directory, f"{frame_id}.frame"))
+        self._last = (frame_id, key, pixels)
+        self.served.append(frame_id)
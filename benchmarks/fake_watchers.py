@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Stand-in AHK Watchers
+Python equivalents of the watcher loops in mouse_control.ahk and
+keyboard_control.ahk, polling the fake VM's C:\\ directory so the
+command protocols can be measured on plain Linux.
+"""
+
+import os
+import threading
+import time
+from typing import Callable, List, Optional, Union
+
+
+def ahk_action_time(device: str, line: str) -> float:
+    """
+    Seconds the real AHK watchers sleep while executing `line` (see
+    ExecuteCommand in mouse_control.ahk and keyboard_control.ahk).
+    """
+    tokens = line.split()
+    if device == 'mouse':
+        if not tokens or tokens[0] == 'here':
+            return 0.1
+        # MouseMove + 200ms stabilization, 100ms post-action sleep
+        delay = 0.3
+        if len(tokens) > 2 and tokens[2] == 'drag':
+            delay += 0.2 + 0.15
+        return delay
+    # 500ms stabilization, 50ms key delay + 50ms press per key, 100ms after
+    if tokens and tokens[0] == 'typefile':
+        return 0.5 + 0.1
+    keys = tokens[1:] if tokens and tokens[0] in ('type', 'press') else tokens
+    length = len(' '.join(keys)) if tokens and tokens[0] == 'type' else 1
+    return 0.5 + 0.1 * length + 0.1
+
+
+class _Watcher:
+    """Polling thread that records every command it consumes"""
+
+    def __init__(self, root: str, device: str, poll_interval: float = 0.05,
+                 action_time: Union[float, Callable[[str, str], float]] = 0.0):
+        self.root = root
+        self.device = device
+        self.poll_interval = poll_interval
+        self.action_time = action_time
+        self.executed: List[str] = []
+        self.typed: List[str] = []
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join()
+
+    def _loop(self):
+        while self._running:
+            self.poll()
+            time.sleep(self.poll_interval)
+
+    def poll(self):
+        raise NotImplementedError
+
+    def _execute(self, line: str):
+        line = line.strip()
+        if line:
+            self.executed.append(line)
+            if line.startswith('typefile '):
+                self._type_file(line.split()[1])
+            delay = self.action_time(self.device, line) if callable(self.action_time) else self.action_time
+            if delay:
+                time.sleep(delay)
+
+    def _type_file(self, path: str):
+        """Bulk typing: rename the uploaded payload while typing it, then delete it"""
+        if len(path) >= 2 and path[1] == ':':
+            path = path[2:]
+        path = os.path.join(self.root, *[p for p in path.split('\\') if p])
+        working = path + '.typing'
+        try:
+            os.replace(path, working)
+        except OSError:
+            return
+        with open(working, encoding='utf-8-sig') as f:
+            self.typed.append(f.read())
+        os.remove(working)
+
+
+class LegacyWatcher(_Watcher):
+    """Consumes and deletes C:\\<device>_cmd.txt, like the original watcher"""
+
+    def poll(self):
+        path = os.path.join(self.root, f"{self.device}_cmd.txt")
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, encoding='utf-8') as f:
+                text = f.read()
+            os.remove(path)
+        except OSError:
+            return
+        self._execute(text)
+
+
+class SpoolWatcher(_Watcher):
+    """
+    Consumes numbered entries from each client spool under
+    C:\\wac_queue\\<device> (and from the device directory itself, where
+    older clients write) and publishes each spool's ack.txt
+    """
+
+    @property
+    def directory(self) -> str:
+        return os.path.join(self.root, 'wac_queue', self.device)
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        super().start()
+
+    def poll(self):
+        self._process(self.directory)
+        try:
+            spools = sorted(os.listdir(self.directory))
+        except OSError:
+            return
+        for name in spools:
+            path = os.path.join(self.directory, name)
+            if os.path.isdir(path):
+                self._process(path)
+
+    def _process(self, directory: str):
+        try:
+            names = sorted(n for n in os.listdir(directory) if n.endswith('.cmd'))
+        except OSError:
+            return  # the client removed its spool
+        if not names:
+            return
+        last_ack = self._read_ack(directory)
+        for name in names:
+            path = os.path.join(directory, name)
+            claimed = path[:-4] + '.run'
+            seq = int(name[:-4])
+            try:
+                # Claim, run, acknowledge, delete: the entry is never gone
+                # before its number is in ack.txt
+                os.replace(path, claimed)
+                with open(claimed, encoding='utf-8') as f:
+                    text = f.read()
+                # Replayed entries that already ran are skipped
+                if seq > last_ack:
+                    for line in text.splitlines():
+                        self._execute(line)
+                    last_ack = seq
+                    self._write_ack(directory, last_ack)
+                os.remove(claimed)
+            except OSError:
+                continue
+
+    @staticmethod
+    def _read_ack(directory: str) -> int:
+        try:
+            with open(os.path.join(directory, 'ack.txt'), encoding='utf-8') as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return 0
+
+    @staticmethod
+    def _write_ack(directory: str, seq: int):
+        tmp = os.path.join(directory, 'ack.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(str(seq))
+        os.replace(tmp, os.path.join(directory, 'ack.txt'))
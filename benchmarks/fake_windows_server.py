@@ -0,0 +1,508 @@
+#!/usr/bin/env python3
+"""
+Fake Windows SSH Endpoint
+Local paramiko SSH server that emulates the parts of a Windows VM the
+client relies on: a cmd.exe-like interpreter and an SFTP subsystem, both
+with the C:\\ drive mapped to a local directory. Used by the benchmarks
+to run on plain Linux.
+"""
+
+import fnmatch
+import logging
+import os
+import re
+import shutil
+import socket
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import paramiko
+
+# Client disconnects are routine here; keep paramiko's transport noise quiet
+logging.getLogger('paramiko').setLevel(logging.CRITICAL)
+
+
+# ------------------------------------------------------------------
+# Minimal cmd.exe interpreter
+# ------------------------------------------------------------------
+
+_IF_EXIST = re.compile(r'@?if +(not +)?exist +(\S+) +', re.IGNORECASE)
+
+
+class _Simple:
+    """Single command with its redirections"""
+
+    def __init__(self):
+        self.text = ""
+        self.redirects: List[Tuple[str, str]] = []
+
+
+class _Group:
+    """Parenthesised command block with its redirections"""
+
+    def __init__(self, seq):
+        self.seq = seq
+        self.redirects: List[Tuple[str, str]] = []
+
+
+class _If:
+    """`if [not] exist <path>` and the rest of its line (or group), as cmd.exe parses it"""
+
+    def __init__(self, negate: bool, path: str, seq):
+        self.negate = negate
+        self.path = path
+        self.seq = seq
+        self.redirects: List[Tuple[str, str]] = []
+
+
+class FakeCmd:
+    """
+    Tiny subset of cmd.exe: echo, type, del, move, ren, mkdir, rmdir, if exist,
+    chcp, cd, rem and exit; `&`, `&&`, `||`, `( )`, `>`, `>>` and `^` escapes.
+    Paths on C:\\ resolve inside `root`.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    # Path mapping
+    def resolve(self, path: str) -> str:
+        path = path.strip().strip('"')
+        if path.lower() == 'nul':
+            return os.devnull
+        if len(path) >= 2 and path[1] == ':':
+            path = path[2:]
+        return os.path.join(self.root, *[p for p in path.replace('\\', '/').split('/') if p])
+
+    # Parsing
+    def parse(self, line: str):
+        seq, pos = self._parse_seq(line, 0, nested=False)
+        return seq
+
+    def _parse_seq(self, line: str, pos: int, nested: bool, consume: bool = True):
+        seq = []
+        op = None
+        while pos < len(line):
+            node, pos = self._parse_command(line, pos, nested)
+            seq.append((op, node))
+            if pos >= len(line):
+                break
+            if line[pos] == ')':
+                return seq, pos + 1 if consume else pos
+            if line.startswith('&&', pos):
+                op, pos = '&&', pos + 2
+            elif line.startswith('||', pos):
+                op, pos = '||', pos + 2
+            elif line[pos] == '&':
+                op, pos = '&', pos + 1
+            else:
+                pos += 1
+        return seq, pos
+
+    def _parse_command(self, line: str, pos: int, nested: bool):
+        while pos < len(line) and line[pos] == ' ':
+            pos += 1
+        if pos < len(line) and line[pos] == '(':
+            seq, pos = self._parse_seq(line, pos + 1, nested=True)
+            node = _Group(seq)
+        elif _IF_EXIST.match(line, pos):
+            # The body is everything up to the end of the line or the
+            # enclosing group, `&&` and `||` included
+            match = _IF_EXIST.match(line, pos)
+            seq, pos = self._parse_seq(line, match.end(), nested, consume=False)
+            return _If(bool(match.group(1)), match.group(2), seq), pos
+        else:
+            node = _Simple()
+            chars = []
+            quoted = False
+            while pos < len(line):
+                ch = line[pos]
+                if ch == '^' and not quoted and pos + 1 < len(line):
+                    chars.append(line[pos + 1])
+                    pos += 2
+                    continue
+                if ch == '"':
+                    quoted = not quoted
+                elif not quoted and (ch in '&|' or (ch == ')' and nested)):
+                    break
+                elif not quoted and ch == '>':
+                    pos = self._parse_redirect(line, pos, node, chars)
+                    continue
+                chars.append(ch)
+                pos += 1
+            node.text = ''.join(chars)
+            return node, pos
+
+        # Redirections after a group
+        while pos < len(line) and line[pos] in ' >':
+            if line[pos] == '>':
+                pos = self._parse_redirect(line, pos, node, [])
+            else:
+                pos += 1
+        return node, pos
+
+    def _parse_redirect(self, line: str, pos: int, node, chars: list) -> int:
+        stream = '1'
+        if chars and chars[-1] in '12' and (len(chars) == 1 or chars[-2] == ' '):
+            stream = chars.pop()
+        mode = 'w'
+        pos += 1
+        if pos < len(line) and line[pos] == '>':
+            mode, pos = 'a', pos + 1
+        while pos < len(line) and line[pos] == ' ':
+            pos += 1
+        start = pos
+        while pos < len(line) and line[pos] not in ' &|)>':
+            pos += 1
+        node.redirects.append((stream + mode, line[start:pos]))
+        return pos
+
+    # Evaluation
+    def run_line(self, line: str) -> Tuple[int, str]:
+        """Run one command line; returns (exit status, stdout text)"""
+        out: List[str] = []
+        rc = self._run_seq(self.parse(line), out)
+        return rc, ''.join(out)
+
+    def _run_seq(self, seq, out: List[str]) -> int:
+        rc = 0
+        for op, node in seq:
+            if op == '&&' and rc != 0:
+                continue
+            if op == '||' and rc == 0:
+                continue
+            rc = self._run_node(node, out)
+        return rc
+
+    def _run_node(self, node, out: List[str]) -> int:
+        buf: List[str] = []
+        if isinstance(node, _Group):
+            rc = self._run_seq(node.seq, buf)
+        elif isinstance(node, _If):
+            if os.path.exists(self.resolve(node.path)) == node.negate:
+                return 0
+            rc = self._run_seq(node.seq, buf)
+        else:
+            rc = self._run_simple(node.text, buf)
+
+        target = out
+        for spec, path in node.redirects:
+            if spec[0] == '2':
+                continue
+            try:
+                with open(self.resolve(path), spec[1], encoding='utf-8', newline='') as f:
+                    f.write(''.join(buf))
+                target = None
+            except OSError:
+                return 1
+        if target is not None:
+            out.extend(buf)
+        return rc
+
+    def _run_simple(self, text: str, out: List[str]) -> int:
+        stripped = text.lstrip(' @')
+        if not stripped.strip():
+            return 0
+        name, _, rest = stripped.partition(' ')
+        name = name.lower()
+
+        if name in ('echo', 'echo.'):
+            out.append(rest + '\r\n')
+            return 0
+        if name in ('rem', 'chcp', 'cd', 'exit'):
+            return 0
+        if name == 'type':
+            try:
+                with open(self.resolve(rest), encoding='utf-8', newline='') as f:
+                    out.append(f.read())
+                return 0
+            except OSError:
+                return 1
+        if name == 'dir':
+            # Only the bare listing form: dir /b [/o:n] <dir>\<pattern>
+            args = [a for a in rest.split() if not a.startswith('/')]
+            if len(args) != 1:
+                return 1
+            folder, _, pattern = self.resolve(args[0]).rpartition(os.sep)
+            try:
+                names = sorted(n for n in os.listdir(folder) if fnmatch.fnmatch(n, pattern))
+            except OSError:
+                return 1
+            out.extend(n + '\r\n' for n in names)
+            return 0 if names else 1
+        if name in ('mkdir', 'md'):
+            os.makedirs(self.resolve(rest), exist_ok=True)
+            return 0
+        if name in ('rmdir', 'rd'):
+            args = [a for a in rest.split() if not a.startswith('/')]
+            if len(args) != 1:
+                return 1
+            try:
+                if '/s' in rest.lower():
+                    shutil.rmtree(self.resolve(args[0]))
+                else:
+                    os.rmdir(self.resolve(args[0]))
+                return 0
+            except OSError:
+                return 1
+        if name in ('del', 'erase'):
+            args = [a for a in rest.split() if not a.startswith('/')]
+            for arg in args:
+                try:
+                    os.remove(self.resolve(arg))
+                except OSError:
+                    pass
+            return 0
+        if name in ('move', 'ren', 'rename'):
+            args = [a for a in rest.split() if not a.startswith('/')]
+            if len(args) != 2:
+                return 1
+            src = self.resolve(args[0])
+            dst = args[1]
+            dst = self.resolve(dst) if name == 'move' else os.path.join(os.path.dirname(src), dst)
+            try:
+                os.replace(src, dst)
+                return 0
+            except OSError:
+                return 1
+        return 1
+
+
+# ------------------------------------------------------------------
+# SFTP subsystem
+# ------------------------------------------------------------------
+
+class _SFTPHandle(paramiko.SFTPHandle):
+    def stat(self):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+
+class _SFTPInterface(paramiko.SFTPServerInterface):
+    """
+    Files under C:\\ as Windows OpenSSH's sftp-server exposes them
+    (`/C:/dir/file`); just what uploads and polling need.
+    """
+
+    def __init__(self, server, root: str, *args, **kwargs):
+        super().__init__(server, *args, **kwargs)
+        self.root = root
+
+    def _resolve(self, path: str) -> str:
+        return FakeCmd(self.root).resolve(path.lstrip('/'))
+
+    def _call(self, fn, *args):
+        try:
+            return fn(*args)
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def open(self, path, flags, attr):
+        path = self._resolve(path)
+        try:
+            fd = os.open(path, flags | getattr(os, 'O_BINARY', 0), 0o644)
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        if flags & os.O_WRONLY:
+            mode = 'ab' if flags & os.O_APPEND else 'wb'
+        elif flags & os.O_RDWR:
+            mode = 'a+b' if flags & os.O_APPEND else 'r+b'
+        else:
+            mode = 'rb'
+        f = os.fdopen(fd, mode)
+        handle = _SFTPHandle(flags)
+        handle.filename = path
+        handle.readfile = f
+        handle.writefile = f
+        return handle
+
+    def stat(self, path):
+        return self._call(lambda p: paramiko.SFTPAttributes.from_stat(os.stat(p)), self._resolve(path))
+
+    lstat = stat
+
+    def list_folder(self, path):
+        path = self._resolve(path)
+
+        def listing(folder):
+            return [paramiko.SFTPAttributes.from_stat(os.stat(os.path.join(folder, name)), name)
+                    for name in os.listdir(folder)]
+        return self._call(listing, path)
+
+    def remove(self, path):
+        return self._call(lambda p: os.remove(p) or paramiko.SFTP_OK, self._resolve(path))
+
+    def rename(self, oldpath, newpath):
+        return self._call(lambda a, b: os.replace(a, b) or paramiko.SFTP_OK,
+                          self._resolve(oldpath), self._resolve(newpath))
+
+    def mkdir(self, path, attr):
+        return self._call(lambda p: os.mkdir(p) or paramiko.SFTP_OK, self._resolve(path))
+
+    def rmdir(self, path):
+        return self._call(lambda p: os.rmdir(p) or paramiko.SFTP_OK, self._resolve(path))
+
+
+# ------------------------------------------------------------------
+# SSH server
+# ------------------------------------------------------------------
+
+class _ServerInterface(paramiko.ServerInterface):
+    def __init__(self, server: 'FakeWindowsServer'):
+        self.server = server
+
+    def check_auth_password(self, username, password):
+        if username == self.server.username and password == self.server.password:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def get_allowed_auths(self, username):
+        return 'password'
+
+    def check_channel_request(self, kind, chanid):
+        if kind == 'session':
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_exec_request(self, channel, command):
+        threading.Thread(
+            target=self.server._handle_exec,
+            args=(channel, command.decode('utf-8', errors='replace')),
+            daemon=True,
+        ).start()
+        return True
+
+
+class FakeWindowsServer:
+    """
+    Local SSH server standing in for the Windows VM.
+
+    `spawn_delay` emulates the cost of starting cmd.exe for every exec
+    request, which is what dominates per-action latency on real VMs.
+    """
+
+    _host_key: Optional[paramiko.PKey] = None
+
+    def __init__(self, root: str, host: str = '127.0.0.1', port: int = 0,
+                 username: str = 'agent', password: str = 'agent',
+                 spawn_delay: float = 0.02):
+        self.root = root
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.spawn_delay = spawn_delay
+        self.exec_count = 0
+        self._sock: Optional[socket.socket] = None
+        self._transports: List[paramiko.Transport] = []
+        self._running = False
+        self._drop_next = False
+
+    @classmethod
+    def host_key(cls) -> paramiko.PKey:
+        if cls._host_key is None:
+            cls._host_key = paramiko.RSAKey.generate(2048)
+        return cls._host_key
+
+    def start(self) -> int:
+        """Start listening; returns the bound port"""
+        os.makedirs(self.root, exist_ok=True)
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((self.host, self.port))
+        self._sock.listen(100)
+        self.port = self._sock.getsockname()[1]
+        self._running = True
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        return self.port
+
+    def stop(self):
+        """Stop listening and drop all client connections"""
+        self._running = False
+        if self._sock:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._sock.close()
+            self._sock = None
+        for transport in self._transports:
+            transport.close()
+        self._transports.clear()
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                client, _ = self._sock.accept()
+            except OSError:
+                break
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            transport = paramiko.Transport(client)
+            transport.add_server_key(self.host_key())
+            self._configure_transport(transport)
+            try:
+                transport.start_server(server=_ServerInterface(self))
+            except (paramiko.SSHException, EOFError, OSError):
+                continue
+            self._transports.append(transport)
+
+    def _configure_transport(self, transport: paramiko.Transport):
+        """Register subsystems; subclasses may add more"""
+        transport.set_subsystem_handler('sftp', paramiko.SFTPServer, _SFTPInterface, self.root)
+
+    def drop_on_next_command(self):
+        """Kill the connection when the next command arrives, before running it"""
+        self._drop_next = True
+
+    def _should_drop(self, channel: paramiko.Channel) -> bool:
+        if not self._drop_next:
+            return False
+        self._drop_next = False
+        channel.get_transport().close()
+        return True
+
+    def _handle_exec(self, channel: paramiko.Channel, command: str):
+        self.exec_count += 1
+        if self._should_drop(channel):
+            return
+        time.sleep(self.spawn_delay)
+        shell = FakeCmd(self.root)
+        try:
+            if command.strip().lower() in ('cmd', 'cmd.exe', 'cmd /q', 'cmd.exe /q'):
+                self._serve_shell(channel, shell)
+                return
+            rc, out = shell.run_line(command)
+            if out:
+                channel.sendall(out.encode('utf-8'))
+            channel.send_exit_status(rc)
+        except (OSError, EOFError, paramiko.SSHException):
+            pass
+        finally:
+            try:
+                channel.close()
+            except (OSError, EOFError, paramiko.SSHException):
+                pass
+
+    def _serve_shell(self, channel: paramiko.Channel, shell: FakeCmd):
+        """Read lines from stdin and run them, like `cmd.exe /Q` on a pipe"""
+        buffer = b''
+        while True:
+            data = channel.recv(65536)
+            if not data:
+                break
+            buffer += data
+            *lines, buffer = buffer.split(b'\n')
+            for raw in lines:
+                line = raw.decode('utf-8', errors='replace').rstrip('\r')
+                if self._should_drop(channel):
+                    return
+                if line.strip().lower() == 'exit':
+                    channel.send_exit_status(0)
+                    return
+                rc, out = shell.run_line(line)
+                if out:
+                    channel.sendall(out.encode('utf-8'))
+        channel.send_exit_status(0)
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Benchmark Suite
+Reproducible baseline for transport and protocol changes. Starts a local
+paramiko SSH server that emulates the Windows side (cmd.exe writes to
+C:\\, watchers polling every 50ms that consume and delete command files
+or spool entries) and drives VMController through three workloads:
+
+  single       -c style: connect, run one command, disconnect
+  batch        batch_mode over a mixed mouse/keyboard script
+  interactive  one connection, commands spaced by operator think time
+
+for every transport x protocol combination. Reports latency
+percentiles, throughput and commands the watchers never executed.
+Runs on plain Linux; no Windows VM needed.
+
+Usage:
+    python3 benchmarks/run_benchmarks.py
+    python3 benchmarks/run_benchmarks.py --json baseline.json
+    python3 benchmarks/run_benchmarks.py --baseline baseline.json   # compare
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from connection_pool import ConnectionPool  # noqa: E402
+from fake_watchers import LegacyWatcher, SpoolWatcher, ahk_action_time  # noqa: E402
+from fake_windows_server import FakeWindowsServer  # noqa: E402
+from metrics import LatencyHistogram  # noqa: E402
+from windows_actuation_control import VMController  # noqa: E402
+
+WORKLOADS = ('single', 'batch', 'interactive')
+
+
+def mixed_script(count: int, seed: int):
+    """Mostly mouse work with some typing and shortcuts, like an agent session"""
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(count):
+        x, y = rng.randrange(0, 1920), rng.randrange(0, 1080)
+        r = rng.random()
+        if r < 0.5:
+            lines.append(f"{x} {y} move")
+        elif r < 0.75:
+            lines.append(f"{x} {y} left")
+        elif r < 0.8:
+            lines.append(f"{x} {y} scroll_down 3")
+        elif r < 0.9:
+            lines.append(f"type {rng.choice(['hello', 'report', 'ok'])}")
+        else:
+            lines.append(rng.choice(['press ^c', 'press ^v', '{Enter}', '{Tab}']))
+    return lines
+
+
+class Endpoint:
+    """Fake VM plus both watchers for one measurement"""
+
+    def __init__(self, protocol: str, args):
+        self.root = tempfile.mkdtemp(prefix='wac-bench-')
+        self.server = FakeWindowsServer(self.root, spawn_delay=args.spawn_ms / 1000)
+        watcher = SpoolWatcher if protocol == 'queue' else LegacyWatcher
+        action_time = ahk_action_time if args.ahk_timing else 0.0
+        self.watchers = [watcher(self.root, device, poll_interval=args.poll_ms / 1000,
+                                 action_time=action_time)
+                         for device in ('mouse', 'keyboard')]
+
+    def __enter__(self) -> 'Endpoint':
+        self.port = self.server.start()
+        for watcher in self.watchers:
+            watcher.start()
+        return self
+
+    def __exit__(self, *exc):
+        for watcher in self.watchers:
+            watcher.stop()
+        self.server.stop()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def executed(self) -> int:
+        return sum(len(w.executed) for w in self.watchers)
+
+    def settle(self, timeout: float = 30.0):
+        """Give the watchers time to consume whatever is still on disk"""
+        deadline = time.monotonic() + timeout
+        last = -1
+        while time.monotonic() < deadline:
+            time.sleep(self.watchers[0].poll_interval * 3)
+            current = self.executed()
+            if current == last:
+                return
+            last = current
+
+
+def controller(endpoint: Endpoint, transport: str, protocol: str) -> VMController:
+    return VMController('127.0.0.1', 'agent', endpoint.port, transport=transport,
+                        protocol=protocol, pool=ConnectionPool(keepalive_interval=0))
+
+
+def run_single(transport: str, protocol: str, args) -> dict:
+    commands = mixed_script(args.single, seed=1)
+    latency = LatencyHistogram()
+    sent = 0
+    with Endpoint(protocol, args) as endpoint:
+        start = time.perf_counter()
+        for command in commands:
+            begin = time.perf_counter()
+            vm = controller(endpoint, transport, protocol)
+            if vm.connect('agent'):
+                if vm.execute_command(command):
+                    sent += 1
+                vm.disconnect()
+            latency.record(time.perf_counter() - begin)
+        elapsed = time.perf_counter() - start
+        endpoint.settle()
+        executed = endpoint.executed()
+    return result('single', transport, protocol, len(commands), sent, executed, elapsed, latency)
+
+
+def run_batch(transport: str, protocol: str, args) -> dict:
+    commands = mixed_script(args.batch, seed=2)
+    with Endpoint(protocol, args) as endpoint:
+        vm = controller(endpoint, transport, protocol)
+        vm.connect('agent')
+        report = vm.batch_mode(commands)
+        vm.disconnect()
+        endpoint.settle()
+        executed = endpoint.executed()
+    latency = LatencyHistogram()
+    for (name, labels), histogram in vm.metrics.histograms.items():
+        if name == 'span_seconds' and dict(labels).get('span') in ('execute', 'batch_step'):
+            latency.merge(histogram)
+    return result('batch', transport, protocol, len(commands), report['commands'], executed,
+                  report['wall_time'], latency)
+
+
+def run_interactive(transport: str, protocol: str, args) -> dict:
+    commands = mixed_script(args.interactive, seed=3)
+    rng = random.Random(4)
+    sent = 0
+    with Endpoint(protocol, args) as endpoint:
+        vm = controller(endpoint, transport, protocol)
+        vm.connect('agent')
+        start = time.perf_counter()
+        for command in commands:
+            if vm.execute_command(command):
+                sent += 1
+            time.sleep(rng.uniform(0, args.think_ms / 1000))
+        elapsed = time.perf_counter() - start
+        vm.disconnect()
+        endpoint.settle()
+        executed = endpoint.executed()
+    latency = LatencyHistogram()
+    for (name, labels), histogram in vm.metrics.histograms.items():
+        if name == 'span_seconds' and dict(labels).get('span') == 'execute':
+            latency.merge(histogram)
+    return result('interactive', transport, protocol, len(commands), sent, executed, elapsed, latency)
+
+
+def result(workload: str, transport: str, protocol: str, commands: int, sent: int,
+           executed: int, elapsed: float, latency: LatencyHistogram) -> dict:
+    summary = latency.summary()
+    return {
+        'workload': workload,
+        'transport': transport,
+        'protocol': protocol,
+        'commands': commands,
+        'sent': sent,
+        'executed': executed,
+        'dropped': max(sent - executed, 0),
+        'wall_time': elapsed,
+        'ops_per_sec': executed / elapsed if elapsed > 0 else 0.0,
+        'p50_ms': summary['p50'] * 1000,
+        'p95_ms': summary['p95'] * 1000,
+        'p99_ms': summary['p99'] * 1000,
+    }
+
+
+def key(row: dict):
+    return row['workload'], row['transport'], row['protocol']
+
+
+def print_table(rows, baseline=None):
+    previous = {key(row): row for row in (baseline or [])}
+    header = (f"{'workload':<12} {'transport':<9} {'protocol':<8} {'cmds':>5} {'p50 ms':>8} "
+              f"{'p95 ms':>8} {'p99 ms':>8} {'ops/sec':>8} {'dropped':>8}")
+    if baseline:
+        header += f" {'Δ ops/sec':>10} {'Δ p95':>8}"
+    print(header)
+    for row in rows:
+        line = (f"{row['workload']:<12} {row['transport']:<9} {row['protocol']:<8} {row['commands']:>5} "
+                f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} "
+                f"{row['ops_per_sec']:>8.1f} {row['dropped']:>8}")
+        old = previous.get(key(row))
+        if old:
+            line += (f" {change(row['ops_per_sec'], old['ops_per_sec']):>10}"
+                     f" {change(row['p95_ms'], old['p95_ms']):>8}")
+        print(line)
+
+
+def change(new: float, old: float) -> str:
+    if not old:
+        return 'n/a'
+    return f"{(new - old) / old:+.0%}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark VMController against a local fake Windows endpoint')
+    parser.add_argument('--workloads', default=','.join(WORKLOADS),
+                        help=f"Comma-separated subset of {', '.join(WORKLOADS)}")
+    parser.add_argument('--transports', default='exec,session', help='Comma-separated transports')
+    parser.add_argument('--protocols', default='file,queue', help='Comma-separated protocols')
+    parser.add_argument('--single', type=int, default=30, help='Commands in the single workload (default: 30)')
+    parser.add_argument('--batch', type=int, default=100, help='Commands in the batch workload (default: 100)')
+    parser.add_argument('--interactive', type=int, default=40,
+                        help='Commands in the interactive workload (default: 40)')
+    parser.add_argument('--think-ms', type=float, default=150.0,
+                        help='Max operator think time between interactive commands (default: 150)')
+    parser.add_argument('--poll-ms', type=float, default=50.0, help='Watcher polling interval (default: 50)')
+    parser.add_argument('--spawn-ms', type=float, default=20.0,
+                        help='Emulated cmd.exe startup per exec request (default: 20)')
+    parser.add_argument('--ahk-timing', action='store_true',
+                        help="Make the watchers sleep like the AHK scripts do (stabilization, key delays)")
+    parser.add_argument('--json', metavar='PATH', help='Save results (use as a later --baseline)')
+    parser.add_argument('--baseline', metavar='PATH', help='Compare against results saved with --json')
+    args = parser.parse_args()
+
+    runners = {'single': run_single, 'batch': run_batch, 'interactive': run_interactive}
+    rows = []
+    for workload in args.workloads.split(','):
+        for transport in args.transports.split(','):
+            for protocol in args.protocols.split(','):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    row = runners[workload](transport, protocol, args)
+                rows.append(row)
+                print(f"[*] {workload}/{transport}/{protocol}: {row['ops_per_sec']:.1f} ops/sec, "
+                      f"{row['dropped']} dropped", file=sys.stderr)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+    print()
+    print_table(rows, baseline)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'settings': {k: v for k, v in vars(args).items() if k not in ('json', 'baseline')},
+                'results': rows,
+            }, f, indent=2)
+        print(f"\n[✓] Results saved to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Async VM Controller
+asyncio API over VMController for driving many Windows VMs from one event
+loop. Blocking paramiko calls run in a thread pool; command parsing is the
+unchanged VMController.detect_command_type.
+"""
+
+import asyncio
+import functools
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Union
+
+from metrics import prometheus_text
+from windows_actuation_control import VMController
+
+
+class AsyncVMController:
+    """Awaitable wrapper around a single VMController"""
+
+    def __init__(self, host: str, username: str, port: int = 2222,
+                 executor: Optional[ThreadPoolExecutor] = None, **options):
+        self.controller = VMController(host=host, username=username, port=port, **options)
+        self.executor = executor
+        # Commands to one VM are serialised so they keep their order
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def name(self) -> str:
+        c = self.controller
+        return f"{c.username}@{c.host}:{c.port}"
+
+    @property
+    def connected(self) -> bool:
+        return self.controller.connected
+
+    def detect_command_type(self, command: str):
+        """Same classification as VMController.detect_command_type"""
+        return self.controller.detect_command_type(command)
+
+    async def _call(self, fn, *args, **kwargs):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+
+    async def connect(self, password: str) -> bool:
+        """Establish the SSH connection"""
+        return await self._call(self.controller.connect, password)
+
+    async def disconnect(self):
+        """Close the SSH connection"""
+        await self._call(self.controller.disconnect)
+
+    async def execute(self, command: str) -> bool:
+        """Execute a single command"""
+        return await self._call(self.controller.execute_command, command)
+
+    async def batch(self, commands: List[str], delay: Optional[float] = None) -> dict:
+        """
+        Execute a batch of commands and return the timing report. The batch
+        is one VMController.batch_mode call in a worker, under the same lock
+        as execute(), so the two never interleave on a VM.
+        """
+        return await self._call(self.controller.batch_mode, commands, delay)
+
+
+class AsyncFleet:
+    """
+    Fans operations out to many AsyncVMControllers with bounded concurrency.
+
+    Results are keyed by controller name; a failure on one VM is returned
+    as its exception instead of cancelling the others.
+    """
+
+    def __init__(self, controllers: Iterable[AsyncVMController], concurrency: int = 32):
+        self.controllers = list(controllers)
+        self.concurrency = concurrency
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='vm')
+        for controller in self.controllers:
+            if controller.executor is None:
+                controller.executor = self.executor
+
+    @classmethod
+    def from_hosts(cls, hosts: Iterable[str], username: str, port: int = 2222,
+                   concurrency: int = 32, **options) -> 'AsyncFleet':
+        """Build a fleet of controllers sharing the same credentials"""
+        return cls([AsyncVMController(h, username, port, **options) for h in hosts], concurrency)
+
+    async def _fan_out(self, make_call) -> Dict[str, object]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def guarded(controller: AsyncVMController):
+            async with semaphore:
+                return await make_call(controller)
+
+        results = await asyncio.gather(
+            *(guarded(c) for c in self.controllers), return_exceptions=True
+        )
+        return {c.name: r for c, r in zip(self.controllers, results)}
+
+    async def connect(self, password: Union[str, Dict[str, str]]) -> Dict[str, object]:
+        """Connect every VM; `password` may be shared or keyed by host"""
+        def lookup(c: AsyncVMController) -> str:
+            return password if isinstance(password, str) else password[c.controller.host]
+        return await self._fan_out(lambda c: c.connect(lookup(c)))
+
+    async def execute(self, command: str) -> Dict[str, object]:
+        """Run one command on every connected VM"""
+        return await self._fan_out(lambda c: c.execute(command))
+
+    async def batch(self, commands: Union[List[str], Dict[str, List[str]]],
+                    delay: Optional[float] = None) -> Dict[str, object]:
+        """Run a shared script, or a per-host script keyed by host, on every VM"""
+        def script(c: AsyncVMController) -> List[str]:
+            return commands if isinstance(commands, list) else commands.get(c.controller.host, [])
+        return await self._fan_out(lambda c: c.batch(script(c), delay))
+
+    def stats(self) -> Dict[str, dict]:
+        """Per-VM statistics snapshots, keyed by controller name"""
+        return {c.name: c.controller.stats() for c in self.controllers}
+
+    def export_stats(self, fmt: str = 'json') -> str:
+        """Fleet statistics as JSON or one Prometheus exposition with a `vm` label per series"""
+        if fmt == 'prometheus':
+            return prometheus_text(c.controller.metrics for c in self.controllers)
+        if fmt == 'json':
+            return json.dumps(self.stats(), indent=2)
+        raise ValueError(f"Unknown stats format '{fmt}' (expected 'json' or 'prometheus')")
+
+    async def disconnect(self):
+        """Disconnect every VM and release the worker pool"""
+        await self._fan_out(lambda c: c.disconnect())
+        self.executor.shutdown(wait=False)
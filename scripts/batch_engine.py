@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Pipelined Batch Engine
+Classifies a whole script up front and coalesces runs of same-device
+commands into single queue entries, so a batch costs one remote write per
+run instead of one per line. Pauses are kept only where a step needs
+them (commands whose settle class currently has a non-zero settle time).
+"""
+
+import time
+from typing import Callable, List, Optional, Tuple
+
+from command_parser import default_parser
+
+# Keep each remote command line well under cmd.exe's 8191 character limit
+MAX_PAYLOAD_CHARS = 7000
+
+# Upper bound on commands carried by a single queue entry
+MAX_ENTRY_COMMANDS = 256
+
+
+class BatchStep:
+    """Run of consecutive commands for one device, sent as one payload"""
+
+    def __init__(self, device: str):
+        self.device = device
+        self.lines: List[str] = []
+        self.size = 0
+        self.settle = 0.0
+        self.action_class: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+
+def plan_batch(commands: List[str],
+               detect: Callable[[str], Tuple[str, str]],
+               settle_time: Callable[[str], float],
+               max_chars: int = MAX_PAYLOAD_CHARS,
+               max_commands: int = MAX_ENTRY_COMMANDS,
+               action_class: Optional[Callable[[str], str]] = None) -> Tuple[List[BatchStep], List[str]]:
+    """
+    Split a script into payload steps.
+
+    A step ends when the device changes, when it would exceed the payload
+    limits, or after any command whose `settle_time` is non-zero, so the
+    pause happens exactly after that command has run. With `action_class`,
+    each step is tagged with the class of its last command.
+    Returns (steps, invalid commands).
+    """
+    steps: List[BatchStep] = []
+    invalid: List[str] = []
+    current = None
+
+    for raw in commands:
+        command = raw.strip()
+        if not command:
+            continue
+
+        cmd_type, processed_cmd = detect(command)
+        if cmd_type == 'invalid':
+            invalid.append(command)
+            continue
+
+        # Escaping can roughly double the length on the wire
+        size = 2 * len(processed_cmd) + 6
+        if (current is None or current.device != cmd_type or current.settle
+                or current.size + size > max_chars or len(current) >= max_commands):
+            current = BatchStep(cmd_type)
+            steps.append(current)
+
+        current.lines.append(processed_cmd)
+        current.size += size
+        current.settle = settle_time(processed_cmd)
+        if action_class:
+            current.action_class = action_class(processed_cmd)
+
+    return steps, invalid
+
+
+class BatchEngine:
+    """Executes planned steps through a controller's command queues"""
+
+    def __init__(self, controller):
+        self.controller = controller
+
+    def run(self, commands: List[str]) -> dict:
+        """Execute a script and return a report with wall time and throughput"""
+        controller = self.controller
+        start = time.perf_counter()
+
+        with controller.metrics.phase('plan'):
+            steps, invalid = plan_batch(commands, controller.detect_command_type,
+                                        controller.settle_time, action_class=controller.action_class)
+        metrics = controller.metrics
+        scheduler = controller.scheduler
+        log = controller.log
+        for command in invalid:
+            log.command('invalid', command, 'invalid', 0.0)
+            controller._record(command, False)
+            metrics.increment('commands_total', device='invalid', action='invalid', result='invalid')
+
+        sent = 0
+        failed = 0
+        entries: List[Tuple[str, int, int]] = []  # (device, entry number, commands carried)
+        for i, step in enumerate(steps, 1):
+            step_start = time.perf_counter()
+            seq = None
+            error = None
+            with metrics.span('batch_step', device=step.device) as span:
+                span.describe(step.lines[0] if len(step) == 1 else f"{step.lines[0]} (+{len(step) - 1} more)")
+                try:
+                    seq = controller._submit_queued(step.device, step.lines,
+                                                    action_class=step.action_class)
+                    # Re-read the settle time: acks seen so far in this batch may have changed it
+                    settle = scheduler.settle_for(step.action_class) if step.settle else 0.0
+                    if settle:
+                        with span.phase('ack_wait'):
+                            controller.queues[step.device].wait_for(seq)
+                        with span.phase('settle'):
+                            scheduler.wait(step.action_class, settle)
+                    entries.append((step.device, seq, len(step)))
+                    sent += len(step)
+                    ok = True
+                except Exception as e:
+                    failed += len(step)
+                    ok = False
+                    error = str(e)
+                span.ok = ok
+            log.step(step.device, step.lines, seq, ok, time.perf_counter() - step_start, error, (i, len(steps)))
+            result = 'ok' if ok else 'error'
+            for line in step.lines:
+                controller._record(line, ok)
+                metrics.increment('commands_total', device=step.device,
+                                  action=default_parser.parse(line).action.value, result=result)
+
+        try:
+            with metrics.phase('drain'):
+                controller.drain()
+        except Exception as e:
+            # Commands in entries the watchers never acknowledged did not run
+            undone = 0
+            for device, seq, count in entries:
+                queue = controller.queues.get(device)
+                if queue is None or queue.last_acked < seq:
+                    undone += count
+            sent -= undone
+            failed += undone
+            log.message('error', f"[✗] Queue did not drain: {e}")
+
+        wall_time = time.perf_counter() - start
+        return {
+            'commands': sent,
+            'payloads': len(steps),
+            'failed': failed,
+            'invalid': len(invalid),
+            'wall_time': wall_time,
+            'ops_per_sec': sent / wall_time if wall_time > 0 else 0.0,
+        }
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Bulk Text Typing
+Types large text (code, documents, MBs of it) without going through
+`echo type <text>`, which mangles cmd.exe metacharacters and is limited
+by the command line length.
+
+The text is streamed over SFTP to a uniquely named UTF-8 file:
+
+    C:\\wac_typing\\<id>.txt
+
+and a single keyboard command points the watcher at it:
+
+    typefile C:\\wac_typing\\<id>.txt <chunk> <pause> <key_delay>
+
+The watcher renames the file to <id>.txt.typing, types it `chunk`
+characters at a time (pausing `pause` ms between chunks; key_delay -1
+sends each chunk with SendInput, 0 or more types it key by key with that
+delay) and deletes it when done. Both ends read the text in blocks, so
+memory use does not grow with its size.
+"""
+
+import os
+import time
+from typing import IO, Iterable, Iterator, Optional, Tuple, Union
+
+# Directory on the VM holding payloads waiting to be typed
+TYPING_ROOT = "C:\\wac_typing"
+
+# Same directory as Windows OpenSSH's sftp-server names it
+_SFTP_ROOT = "/C:/wac_typing"
+
+# Throughput presets: (chars per chunk, pause between chunks in ms, key delay in ms)
+TYPING_PROFILES = {
+    'fast': (4000, 0, -1),       # SendInput, large chunks: editors and terminals
+    'balanced': (1000, 20, -1),  # SendInput with breathing room between chunks
+    'safe': (200, 50, 5),        # Key by key, for apps that drop fast input
+}
+
+Source = Union[str, IO[str], Iterable[str]]
+
+
+class BulkTypingError(Exception):
+    """Raised when a bulk payload cannot be uploaded or is never typed"""
+
+
+def iter_blocks(source: Source, block_size: int = 65536) -> Iterator[str]:
+    """Text blocks from a string, a text file object, or an iterable of strings"""
+    if isinstance(source, str):
+        for start in range(0, len(source), block_size):
+            yield source[start:start + block_size]
+    elif hasattr(source, 'read'):
+        while True:
+            block = source.read(block_size)
+            if not block:
+                break
+            yield block
+    else:
+        for block in source:
+            if block:
+                yield block
+
+
+def upload_text(sftp, source: Source, remote_path: str, block_size: int = 65536) -> Tuple[int, int]:
+    """Stream `source` to `remote_path` as UTF-8; returns (characters, bytes)"""
+    chars = 0
+    size = 0
+    with sftp.open(remote_path, 'wb') as f:
+        # Writes are acknowledged in the background instead of one round trip each
+        f.set_pipelined(True)
+        for block in iter_blocks(source, block_size):
+            data = block.encode('utf-8')
+            f.write(data)
+            chars += len(block)
+            size += len(data)
+    return chars, size
+
+
+def new_payload() -> Tuple[str, str]:
+    """(SFTP path, Windows path) for a new uniquely named payload"""
+    name = f"{os.urandom(16).hex()}.txt"
+    return f"{_SFTP_ROOT}/{name}", f"{TYPING_ROOT}\\{name}"
+
+
+def ensure_root(sftp):
+    """Create the payload directory on the VM if it is missing"""
+    try:
+        sftp.stat(_SFTP_ROOT)
+    except IOError:
+        sftp.mkdir(_SFTP_ROOT)
+
+
+def typefile_command(windows_path: str, chunk: int, pause: int, key_delay: int) -> str:
+    """Keyboard watcher command that types an uploaded payload"""
+    return f"typefile {windows_path} {chunk} {pause} {key_delay}"
+
+
+def _exists(sftp, path: str) -> bool:
+    try:
+        sftp.stat(path)
+        return True
+    except IOError:
+        return False
+
+
+def wait_typed(sftp, sftp_path: str, pickup_timeout: float = 30.0,
+               timeout: Optional[float] = None, poll_interval: float = 0.1) -> float:
+    """
+    Block until the watcher has typed and deleted the payload; returns the
+    time it spent typing. Fails if the watcher does not pick the payload up
+    within `pickup_timeout`, or (if given) does not finish within `timeout`.
+    """
+    deadline = time.monotonic() + pickup_timeout
+    while _exists(sftp, sftp_path):
+        if time.monotonic() > deadline:
+            raise BulkTypingError(f"Keyboard watcher did not pick up {sftp_path} "
+                                  f"within {pickup_timeout:.0f}s")
+        time.sleep(poll_interval)
+
+    started = time.perf_counter()
+    working = sftp_path + '.typing'
+    while _exists(sftp, working):
+        if timeout is not None and time.perf_counter() - started > timeout:
+            raise BulkTypingError(f"Typing {sftp_path} did not finish within {timeout:.0f}s")
+        time.sleep(poll_interval)
+    return time.perf_counter() - started
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Command Log
+The controller's per-command output: what was sent, how long it took and
+how it ended.
+
+- Levels: debug, info, warning, error. `warning` is quiet mode; only
+  failures are shown.
+- Formats: `text` (the `[MOUSE] Executed: ...` lines) or `jsonl` (one JSON
+  object per event, for machines).
+- A ring buffer keeps the last `capacity` commands, with timings and
+  results, at every level. Interactive mode shows it with `history`, and
+  it can be dumped as JSONL after a failure.
+- Events are formatted and written on a background thread, so a slow
+  terminal or disk never holds up a command. If the writer falls
+  `MAX_PENDING` events behind, further lines are dropped and counted
+  (never blocked on); the ring buffer still has them.
+"""
+
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from typing import List, Optional, TextIO, Tuple
+
+LEVELS = {'debug': 10, 'info': 20, 'warning': 30, 'error': 40}
+FORMATS = ('text', 'jsonl')
+
+# Commands kept for `history` and dumps
+DEFAULT_CAPACITY = 1000
+
+# Events waiting for the writer before new ones are dropped
+MAX_PENDING = 100000
+
+# Command results, and the level each is logged at
+RESULT_LEVELS = {'ok': 'info', 'skipped': 'info', 'invalid': 'error', 'error': 'error'}
+
+_TAGS = {'mouse': '[MOUSE]', 'keyboard': '[KEYBOARD]'}
+
+
+class CommandLog:
+    """
+    Leveled command log for one controller. Output goes to `path`
+    (appended) if given, else `stream`, else whatever sys.stdout is when
+    the writer gets to it.
+    """
+
+    def __init__(self, level: str = 'info', format: str = 'text', stream: Optional[TextIO] = None,
+                 path: Optional[str] = None, capacity: int = DEFAULT_CAPACITY):
+        if level not in LEVELS:
+            raise ValueError(f"Unknown log level '{level}' (expected one of {', '.join(LEVELS)})")
+        if format not in FORMATS:
+            raise ValueError(f"Unknown log format '{format}' (expected one of {', '.join(FORMATS)})")
+        self.level = LEVELS[level]
+        self.format = format
+        self.stream = stream
+        self.path = os.path.expanduser(path) if path else None
+        self.history: deque = deque(maxlen=capacity)
+        self.dropped = 0
+        self._reported = 0
+        self._pending: queue.SimpleQueue = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._file: Optional[TextIO] = None
+
+    # Events
+    def command(self, device: Optional[str], command: str, result: str, seconds: float,
+                error: Optional[str] = None, position: Optional[Tuple[int, int]] = None):
+        """
+        One command finished: `result` is ok, skipped (optimized away),
+        invalid or error. `position` is (i, n) within a sequential batch.
+        """
+        entry = {'time': time.time(), 'device': device, 'command': command, 'result': result,
+                 'seconds': seconds, 'error': error}
+        self.history.append(entry)
+        level = RESULT_LEVELS[result]
+        if LEVELS[level] >= self.level:
+            self._emit(level, 'command', entry, position)
+
+    def step(self, device: str, lines: List[str], entry: Optional[int], ok: bool, seconds: float,
+             error: Optional[str] = None, position: Optional[Tuple[int, int]] = None):
+        """A pipelined batch step: `lines` sent together as queue `entry`"""
+        now = time.time()
+        result = 'ok' if ok else 'error'
+        each = seconds / len(lines) if lines else 0.0
+        self.history.extend({'time': now, 'device': device, 'command': line, 'result': result,
+                             'seconds': each, 'error': error} for line in lines)
+        level = 'info' if ok else 'error'
+        if LEVELS[level] >= self.level:
+            self._emit(level, 'step', {'time': now, 'device': device, 'commands': len(lines),
+                                       'first': lines[0] if lines else None, 'entry': entry,
+                                       'result': result, 'seconds': seconds, 'error': error}, position)
+
+    def message(self, level: str, text: str):
+        """Free-form line on the command path (e.g. a queue that did not drain)"""
+        if LEVELS[level] >= self.level:
+            self._emit(level, 'message', {'time': time.time(), 'text': text}, None)
+
+    def _emit(self, level: str, event: str, data: dict, position: Optional[Tuple[int, int]]):
+        if self._writer is None:
+            self._start()
+        if self._pending.qsize() >= MAX_PENDING:
+            self.dropped += 1
+            return
+        self._pending.put((level, event, data, position))
+
+    # Writer thread
+    def _start(self):
+        with self._start_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, daemon=True, name='command-log')
+                self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            batch = [self._pending.get()]
+            while len(batch) < 1024:
+                try:
+                    batch.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            out = []
+            markers = []
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    markers.append(item)
+                elif item is not None:
+                    out.append(self._format(*item))
+            if self.dropped > self._reported:
+                out.append(self._format('warning', 'message', {
+                    'time': time.time(),
+                    'text': f"[!] {self.dropped - self._reported} log lines dropped (output could not keep up)"},
+                    None))
+                self._reported = self.dropped
+            if out:
+                try:
+                    stream = self._output()
+                    stream.write(''.join(out))
+                    stream.flush()
+                except (OSError, ValueError):
+                    pass  # a closed console or full disk must not take the controller down
+            for marker in markers:
+                marker.set()
+            if None in batch:
+                return
+
+    def _output(self) -> TextIO:
+        if self.path:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            return self._file
+        return self.stream or sys.stdout
+
+    def _format(self, level: str, event: str, data: dict, position: Optional[Tuple[int, int]]) -> str:
+        if self.format == 'jsonl':
+            record = {'level': level, 'event': event}
+            record.update(data)
+            if position:
+                record['index'], record['total'] = position
+            return json.dumps(record, ensure_ascii=False) + '\n'
+
+        if event == 'message':
+            return data['text'] + '\n'
+        tag = _TAGS.get(data['device'], '')
+        if event == 'step':
+            prefix = f"[{position[0]}/{position[1]}] " if position else ''
+            if data['result'] == 'ok':
+                return f"{prefix}{tag} Sent {data['commands']} command(s) as entry {data['entry']}\n"
+            return f"{prefix}{tag} Failed to send {data['commands']} command(s): {data['error']}\n"
+
+        # Sequential batches set each command apart with a blank line
+        prefix = f"\n[{position[0]}/{position[1]}] " if position else ''
+        command, result = data['command'], data['result']
+        if result == 'ok':
+            parts = command.split()
+            if 'drag' in command and len(parts) >= 5:
+                return f"{prefix}{tag} Drag: ({parts[0]},{parts[1]}) → ({parts[3]},{parts[4]})\n"
+            return f"{prefix}{tag} Executed: {command}\n"
+        if result == 'skipped':
+            return f"{prefix}{tag} Skipped redundant move: {command}\n"
+        if result == 'invalid':
+            return f"{prefix}[✗] Invalid command: {command}\n"
+        return f"{prefix}[✗] {data['error']}\n"
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything logged so far has been written"""
+        if self._writer is None or not self._writer.is_alive():
+            return True
+        marker = threading.Event()
+        self._pending.put(marker)
+        return marker.wait(timeout)
+
+    def close(self):
+        """Write what is pending and stop the writer (a later event starts it again)"""
+        if self._writer is not None and self._writer.is_alive():
+            self._pending.put(None)
+            self._writer.join()
+        self._writer = None
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    # History
+    def recent(self, count: Optional[int] = None) -> List[dict]:
+        """The last `count` commands (all kept, by default), oldest first"""
+        entries = list(self.history)
+        return entries[-count:] if count else entries
+
+    def dump(self, path: str) -> int:
+        """Write the kept commands to `path` as JSONL; returns how many"""
+        entries = self.recent()
+        with open(os.path.expanduser(path), 'w', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        return len(entries)
+
+
+def format_history(entries: List[dict]) -> str:
+    """Table of history entries for the terminal"""
+    rows = [f"{'time':<12} {'ms':>8} {'result':<8} command"]
+    for entry in entries:
+        stamp = time.strftime('%H:%M:%S', time.localtime(entry['time'])) + f".{int(entry['time'] * 1000) % 1000:03}"
+        detail = entry['command'] + (f"  ({entry['error']})" if entry['error'] else '')
+        rows.append(f"{stamp:<12} {entry['seconds'] * 1000:>8.1f} {entry['result']:<8} {detail}")
+    return '\n'.join(rows)
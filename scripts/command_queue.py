@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Sequenced Command Queue
+Client side of the spool protocol that replaces the single, overwritten
+C:\\mouse_cmd.txt / C:\\keyboard_cmd.txt files.
+
+Each connection gets its own spool directory per device (named after a
+random client id, so clients sharing a VM never reuse each other's
+numbers). Every command batch is written to its own monotonically
+numbered file there and renamed into place, so the watcher never sees a
+partial write and nothing is overwritten:
+
+    C:\\wac_queue\\mouse\\3f9a0c12d4e7\\0000000017.cmd
+
+The watcher consumes files in sequence order. It claims each one by
+renaming it to .run, runs it, records its number in that directory's
+ack.txt and only then deletes it, so an entry is always either on disk
+or acknowledged. The client reads the ack (it is returned with every
+write) to track how many commands are in flight and to apply
+backpressure once the window is full, and removes its directory on
+close.
+
+With `on_ack`, entries sent while nothing else was in flight are timed
+from write to acknowledgement, whenever the client is polling for that
+acknowledgement; those samples feed the settle scheduler.
+"""
+
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Root of the per-device spool directories on the VM
+QUEUE_ROOT = "C:\\wac_queue"
+
+# Characters cmd.exe treats specially on a command line
+_CMD_SPECIAL = set('^&|<>()%"')
+
+
+class QueueError(Exception):
+    """Raised when the remote consumer stops acknowledging commands"""
+
+
+def escape_echo_text(text: str) -> str:
+    """Escape text so `echo` writes it verbatim"""
+    return ''.join('^' + ch if ch in _CMD_SPECIAL else ch for ch in text)
+
+
+class CommandQueue:
+    """
+    Sequenced, acknowledged command spool for one device (mouse or keyboard).
+
+    `run_remote` runs a shell command on the VM and returns
+    (exit status, stdout), so the queue works over any transport.
+    """
+
+    def __init__(self, run_remote: Callable[[str], Tuple[int, str]], device: str,
+                 window: int = 32, poll_interval: float = 0.02, timeout: float = 10.0,
+                 on_ack: Optional[Callable[[object, float, int], None]] = None,
+                 client: Optional[str] = None):
+        self.run_remote = run_remote
+        self.device = device
+        self.window = window
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.client = client or os.urandom(6).hex()
+        self.directory = f"{QUEUE_ROOT}\\{device}\\{self.client}"
+        self.ack_file = f"{self.directory}\\ack.txt"
+        self.last_sent = 0
+        self.last_acked = 0
+        self.on_ack = on_ack
+        # seq -> (write started, commands, tag) of entries being timed
+        self._timed: Dict[int, Tuple[float, int, object]] = {}
+
+    @property
+    def in_flight(self) -> int:
+        """Commands written but not yet consumed by the watcher"""
+        return self.last_sent - self.last_acked
+
+    # Prepare the spool directory and resume numbering
+    def open(self):
+        """Create the spool directory and continue after the last acknowledged number"""
+        # One round trip: create what is missing, list entries a previous
+        # connection with the same client id left unconsumed or running,
+        # then read the ack
+        _, output = self.run_remote(
+            f"(if not exist {self.directory} mkdir {self.directory})"
+            f"&(if not exist {self.ack_file} >{self.ack_file} echo 0)"
+            f"&dir /b /o:n {self.directory}\\*.cmd 2>nul"
+            f"&dir /b /o:n {self.directory}\\*.run 2>nul"
+            f"&type {self.ack_file} 2>nul"
+        )
+        self.last_acked = self._parse_ack(output)
+        # Never reuse the number of a pending entry: it would be overwritten
+        pending = [int(name[:-4]) for name in output.split()
+                   if name.endswith(('.cmd', '.run')) and name[:-4].isdigit()]
+        self.last_sent = max([self.last_acked] + pending)
+
+    def close(self):
+        """Remove this client's spool directory (call after drain(); pending entries are discarded)"""
+        self.run_remote(f"rmdir /s /q {self.directory} 2>nul")
+
+    # Write a command batch to the spool
+    def submit(self, lines: List[str], tag: object = None) -> int:
+        """
+        Queue one or more command lines as a single spool entry.
+        Blocks while the in-flight window is full; returns the entry's number.
+        `tag` is passed to on_ack if the entry's latency is measured.
+        """
+        self.wait_for_capacity()
+
+        seq = self.last_sent + 1
+        # Only an entry with nothing ahead of it measures the VM, not the queue
+        timed = self.on_ack is not None and self.in_flight == 0
+        started = time.perf_counter()
+        rc, output = self.run_remote(self.build_write(seq, lines))
+        if rc != 0:
+            raise QueueError(f"Failed to write {self.device} queue entry {seq}")
+
+        self.last_sent = seq
+        if timed:
+            self._timed[seq] = (started, len(lines), tag)
+        self._update_ack(output)
+        return seq
+
+    def build_write(self, seq: int, lines: List[str]) -> str:
+        """Remote command that writes `lines` as entry `seq` and returns the current ack"""
+        name = f"{self.directory}\\{seq:010d}"
+        if len(lines) == 1:
+            write = f">{name}.tmp echo {escape_echo_text(lines[0])}"
+        else:
+            body = '&'.join(f"echo {escape_echo_text(line)}" for line in lines)
+            write = f"({body})>{name}.tmp"
+        return (
+            f"{write}&& move /y {name}.tmp {name}.cmd >nul"
+            f"&& type {self.ack_file} 2>nul"
+        )
+
+    # Backpressure
+    def wait_for_capacity(self):
+        """Block until fewer than `window` entries are in flight"""
+        self._wait_until(lambda: self.in_flight < self.window)
+
+    def drain(self):
+        """Block until the watcher has consumed everything sent so far"""
+        self._wait_until(lambda: self.in_flight == 0)
+
+    def wait_for(self, seq: int):
+        """Block until entry `seq` has been consumed"""
+        self._wait_until(lambda: self.last_acked >= seq)
+
+    def _wait_until(self, condition: Callable[[], bool]):
+        # The deadline only trips if the watcher makes no progress at all
+        deadline = time.monotonic() + self.timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                raise QueueError(
+                    f"{self.device} watcher stopped acknowledging "
+                    f"(sent {self.last_sent}, acked {self.last_acked})"
+                )
+            time.sleep(self.poll_interval)
+            acked = self._poll_ack()
+            if acked > self.last_acked:
+                self._advance(acked, measured=True)
+                deadline = time.monotonic() + self.timeout
+
+    def _poll_ack(self) -> int:
+        _, output = self.run_remote(f"type {self.ack_file} 2>nul")
+        return self._parse_ack(output)
+
+    def _update_ack(self, output: str):
+        self._advance(self._parse_ack(output), measured=False)
+
+    def _advance(self, acked: int, measured: bool):
+        # Acks read back with a write arrive late by an unknown amount, so
+        # only those seen while polling are reported as latency samples
+        if acked <= self.last_acked:
+            return
+        self.last_acked = acked
+        if self._timed:
+            now = time.perf_counter()
+            for seq in [seq for seq in self._timed if seq <= acked]:
+                started, count, tag = self._timed.pop(seq)
+                if measured:
+                    self.on_ack(tag, now - started, count)
+
+    @staticmethod
+    def _parse_ack(output: str) -> int:
+        try:
+            return int(output.strip().split()[-1])
+        except (ValueError, IndexError):
+            return 0
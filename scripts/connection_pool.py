@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+SSH Connection Pool
+Shares authenticated SSH connections between VMController instances,
+keyed by (host, port, username) and a fingerprint of the credentials, so
+a caller only gets a connection it could have authenticated itself.
+Connections are kept alive, and reconnect with backoff when a VM reboots
+or the network drops instead of killing the process.
+"""
+
+import hashlib
+import socket
+import threading
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+import paramiko
+
+# Connection health states
+CONNECTED = 'connected'
+RECONNECTING = 'reconnecting'
+DOWN = 'down'
+CLOSED = 'closed'
+
+
+class ConnectionLostError(Exception):
+    """Raised when a connection cannot be re-established within the policy"""
+
+
+# Connect options that do not change who the connection authenticates as
+_TIMEOUT_OPTIONS = ('timeout', 'banner_timeout', 'auth_timeout')
+
+
+def credential_fingerprint(password: Optional[str], connect_kwargs: dict) -> str:
+    """Digest of the password and authentication options (key file, agent, ...)"""
+    options = sorted((k, repr(v)) for k, v in connect_kwargs.items() if k not in _TIMEOUT_OPTIONS)
+    return hashlib.sha256(repr((password or None, options)).encode('utf-8')).hexdigest()
+
+
+class ReconnectPolicy:
+    """
+    How to recover a lost connection.
+
+    `replay` controls in-flight commands whose transport died mid-call:
+    True re-sends the command once after reconnecting, False fails it with
+    ConnectionLostError. With the queue protocol a replay is exactly-once
+    (the watcher skips entries it already acknowledged); with the file
+    protocol it is at-least-once.
+    """
+
+    def __init__(self, max_attempts: int = 5, initial_delay: float = 0.5,
+                 max_delay: float = 10.0, multiplier: float = 2.0, replay: bool = True):
+        self.max_attempts = max_attempts
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.replay = replay
+
+    def delays(self) -> Iterator[float]:
+        """Wait before each reconnect attempt (first attempt is immediate)"""
+        delay = self.initial_delay
+        for attempt in range(self.max_attempts):
+            yield 0.0 if attempt == 0 else delay
+            if attempt > 0:
+                delay = min(delay * self.multiplier, self.max_delay)
+
+
+class PooledConnection:
+    """One authenticated SSH client shared by every controller for the same key"""
+
+    def __init__(self, host: str, port: int, username: str, password: Optional[str],
+                 policy: ReconnectPolicy, connect_kwargs: dict):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.policy = policy
+        self.client: Optional[paramiko.SSHClient] = None
+        self.state = CLOSED
+        self.refcount = 0
+        self.generation = 0
+        self.reconnects = 0
+        self.last_error: Optional[str] = None
+        self.last_ok: Optional[float] = None
+        self._password = password
+        self._connect_kwargs = connect_kwargs
+        self.fingerprint = credential_fingerprint(password, connect_kwargs)
+        # _lock guards state and is never held across network waits or
+        # backoff; _connecting lets one caller at a time (re)connect
+        self._lock = threading.RLock()
+        self._connecting = threading.Lock()
+        self._closed = False
+        self._reconnector: Optional[threading.Thread] = None
+
+    @property
+    def key(self) -> Tuple[str, int, str, str]:
+        return (self.host, self.port, self.username, self.fingerprint)
+
+    def is_alive(self) -> bool:
+        """True if the underlying transport is active"""
+        transport = self.client.get_transport() if self.client else None
+        return transport is not None and transport.is_active()
+
+    def open(self):
+        """Connect and authenticate; raises paramiko errors on failure"""
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect(
+            hostname=self.host,
+            port=self.port,
+            username=self.username,
+            password=self._password,
+            **self._connect_kwargs
+        )
+        with self._lock:
+            if self._closed:
+                client.close()
+                raise ConnectionLostError(f"Connection to {self.host}:{self.port} is closed")
+            self.client = client
+            self.generation += 1
+            self.state = CONNECTED
+            self.last_ok = time.time()
+            self.last_error = None
+
+    def ensure(self) -> paramiko.SSHClient:
+        """Return a live client, reconnecting per the policy if needed"""
+        with self._lock:
+            if self.state == CLOSED:
+                raise ConnectionLostError(f"Connection to {self.host}:{self.port} is closed")
+            if self.is_alive():
+                return self.client
+        self._reconnect()
+        return self.client
+
+    def mark_failed(self, error: Exception):
+        """Record a failure seen by a caller; the next ensure() reconnects"""
+        with self._lock:
+            self.last_error = str(error)
+            if self.state == CONNECTED and not self.is_alive():
+                self.state = RECONNECTING
+
+    def keepalive(self):
+        """Ping the transport; if it is gone, reconnect on a thread of this connection's own"""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            try:
+                if not self.is_alive():
+                    raise EOFError("Transport closed")
+                self.client.get_transport().send_ignore()
+                self.last_ok = time.time()
+                return
+            except Exception as e:
+                self.last_error = str(e)
+            # One dead VM must not hold up the keepalive of the others
+            if self._reconnector is None or not self._reconnector.is_alive():
+                self._reconnector = threading.Thread(target=self._reconnect_quietly, daemon=True,
+                                                     name=f"reconnect-{self.host}:{self.port}")
+                self._reconnector.start()
+
+    def _reconnect_quietly(self):
+        try:
+            self._reconnect()
+        except ConnectionLostError:
+            pass
+
+    def _reconnect(self):
+        # Callers arriving while another one reconnects wait for its outcome
+        with self._connecting:
+            with self._lock:
+                if self.state == CLOSED:
+                    raise ConnectionLostError(f"Connection to {self.host}:{self.port} is closed")
+                if self.is_alive():
+                    return
+                self.state = RECONNECTING
+                if self.client:
+                    self.client.close()
+            for delay in self.policy.delays():
+                time.sleep(delay)
+                try:
+                    self.open()
+                    with self._lock:
+                        self.reconnects += 1
+                    return
+                except paramiko.AuthenticationException as e:
+                    # Retrying will not fix bad credentials
+                    self.last_error = str(e)
+                    break
+                except (paramiko.SSHException, socket.error, EOFError) as e:
+                    self.last_error = str(e)
+            with self._lock:
+                if self.state != CLOSED:
+                    self.state = DOWN
+            raise ConnectionLostError(
+                f"Could not reconnect to {self.host}:{self.port}: {self.last_error}"
+            )
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self.state = CLOSED
+            if self.client:
+                self.client.close()
+                self.client = None
+
+    def health(self) -> dict:
+        """Snapshot of this connection's state"""
+        return {
+            'host': self.host,
+            'port': self.port,
+            'username': self.username,
+            'state': self.state,
+            'alive': self.is_alive(),
+            'users': self.refcount,
+            'generation': self.generation,
+            'reconnects': self.reconnects,
+            'last_ok': self.last_ok,
+            'last_error': self.last_error,
+        }
+
+
+class ConnectionPool:
+    """
+    Pool of shared SSH connections with a background keepalive.
+
+    Controllers acquire a connection on connect() and release it on
+    disconnect(); the last release closes it.
+    """
+
+    _shared: Optional['ConnectionPool'] = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, keepalive_interval: float = 3.0,
+                 policy: Optional[ReconnectPolicy] = None):
+        self.keepalive_interval = keepalive_interval
+        self.policy = policy or ReconnectPolicy()
+        self._connections: Dict[Tuple[str, int, str, str], PooledConnection] = {}
+        self._lock = threading.Lock()
+        self._keepalive_thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def shared(cls) -> 'ConnectionPool':
+        """Process-wide default pool"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def acquire(self, host: str, port: int, username: str, password: Optional[str] = None,
+                **connect_kwargs) -> PooledConnection:
+        """
+        Get (and if needed open) the connection for (host, port, username).
+        An open connection is shared only with callers presenting the same
+        password and authentication options.
+        """
+        key = (host, port, username, credential_fingerprint(password, connect_kwargs))
+        with self._lock:
+            conn = self._connections.get(key)
+            if conn is None or conn.state == CLOSED:
+                conn = PooledConnection(host, port, username, password, self.policy, connect_kwargs)
+                self._connections[key] = conn
+            conn.refcount += 1
+
+        try:
+            with conn._connecting:
+                if not conn.is_alive():
+                    conn.open()
+        except Exception:
+            self.release(conn)
+            raise
+
+        self._start_keepalive()
+        return conn
+
+    def release(self, conn: PooledConnection):
+        """Drop one user of a connection; closes it when unused"""
+        with self._lock:
+            conn.refcount -= 1
+            if conn.refcount > 0:
+                return
+            if self._connections.get(conn.key) is conn:
+                del self._connections[conn.key]
+        conn.close()
+
+    def health(self) -> Dict[str, dict]:
+        """Health of every pooled connection, keyed by user@host:port"""
+        with self._lock:
+            conns = list(self._connections.values())
+        return {f"{c.username}@{c.host}:{c.port}": c.health() for c in conns}
+
+    def _start_keepalive(self):
+        if self.keepalive_interval <= 0:
+            return
+        with self._lock:
+            if self._keepalive_thread and self._keepalive_thread.is_alive():
+                return
+            self._keepalive_thread = threading.Thread(target=self._keepalive_loop, daemon=True)
+            self._keepalive_thread.start()
+
+    def _keepalive_loop(self):
+        while True:
+            time.sleep(self.keepalive_interval)
+            with self._lock:
+                conns = list(self._connections.values())
+            if not conns:
+                return
+            for conn in conns:
+                conn.keepalive()
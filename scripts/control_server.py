@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Control Server
+Long-lived local daemon (`windows-actuation serve`) that keeps
+authenticated VMController sessions open and serves many agent processes
+over a Unix socket or localhost TCP, so each client skips the SSH
+handshake and authentication.
+
+Requests and responses are newline-delimited JSON objects (or a msgpack
+stream, when msgpack is installed and the client's first byte is not
+JSON). Every request names an operation and may carry an id, which is
+echoed back:
+
+    {"id": 1, "op": "connect", "host": "10.0.0.5", "username": "agent", "password": "..."}
+    {"id": 2, "op": "execute", "vm": "agent@10.0.0.5:2222", "command": "500 500 left"}
+    {"id": 2, "ok": true, "result": true}
+    {"id": 3, "ok": false, "error": "ValueError: Invalid command: ...", "type": "ValueError"}
+
+`vm` may be omitted while the client has exactly one VM connected.
+
+The daemon has no authentication of its own: the Unix socket is readable
+by its owner only, and TCP is limited to loopback addresses. A client's
+`connect` must carry a password, and reuses an open session only if the
+password matches the one it was opened with, so clients never get key or
+agent authentication on the daemon user's behalf. Every other op only
+reaches sessions that the same socket connection connected.
+"""
+
+import getpass
+import hashlib
+import hmac
+import ipaddress
+import json
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+from typing import Dict, Optional, Set, Tuple, Union
+
+try:
+    import msgpack
+except ImportError:  # optional: JSON only
+    msgpack = None
+
+from windows_actuation_control import VMController
+
+Address = Union[str, Tuple[str, int]]
+
+# Localhost TCP port used when only a port is wanted
+DEFAULT_PORT = 7300
+
+
+def default_address() -> Address:
+    """Per-user Unix socket, or localhost TCP where Unix sockets are unavailable"""
+    if hasattr(socketserver, 'UnixStreamServer'):
+        return os.path.join(tempfile.gettempdir(), f"windows-actuation-{getpass.getuser()}.sock")
+    return ('127.0.0.1', DEFAULT_PORT)
+
+
+def parse_address(spec: Optional[str]) -> Address:
+    """'PORT' or 'HOST:PORT' for TCP (loopback only), anything else is a Unix socket path"""
+    if not spec:
+        return default_address()
+    host, _, port = spec.rpartition(':')
+    if port.isdigit() and os.sep not in spec:
+        address = (host or '127.0.0.1', int(port))
+        check_loopback(address)
+        return address
+    return spec
+
+
+def check_loopback(address: Address):
+    """Raise ValueError unless a TCP address is a loopback one (the daemon has no authentication)"""
+    if not isinstance(address, tuple) or address[0] == 'localhost':
+        return
+    try:
+        loopback = ipaddress.ip_address(address[0]).is_loopback
+    except ValueError:
+        loopback = False
+    if not loopback:
+        raise ValueError(f"Refusing to listen on {address[0]}: the control server has no "
+                         "authentication, so TCP is limited to loopback addresses")
+
+
+class ControlError(Exception):
+    """Error reported by the control server for a request"""
+
+    def __init__(self, message: str, kind: str = 'ControlError'):
+        super().__init__(message)
+        self.kind = kind
+
+
+class _Session:
+    """
+    One connected VM; requests to it are serialised so they keep their
+    order. `clients` are the socket connections that connected it.
+    """
+
+    def __init__(self, controller: VMController, credential: bytes):
+        self.controller = controller
+        self.credential = credential
+        self.clients: Set[object] = set()
+        self.lock = threading.Lock()
+
+
+class ControlServer:
+    """Routes requests from local clients to connected VMControllers"""
+
+    OPS = ('ping', 'connect', 'disconnect', 'list', 'health', 'execute', 'batch',
+           'type', 'stats', 'shutdown')
+
+    def __init__(self, address: Optional[Address] = None, **controller_options):
+        self.address = address or default_address()
+        check_loopback(self.address)
+        self.controller_options = controller_options
+        self.sessions: Dict[str, _Session] = {}
+        self._lock = threading.Lock()
+        # One SSH connect at a time per VM name, outside self._lock
+        self._connecting: Dict[str, threading.Lock] = {}
+        self._server: Optional[socketserver.BaseServer] = None
+        # Keys the password fingerprints kept for session reuse
+        self._secret = os.urandom(32)
+
+    # Sessions
+    def connect(self, host: str, username: str, password: str, port: int = 2222,
+                client: Optional[object] = None, **options) -> str:
+        """
+        Connect a VM (or reuse its open session) for `client`; returns its
+        name. An empty password authenticates with the daemon user's keys or
+        SSH agent. An open session is reused only with the password it was
+        opened with. A slow VM only holds up connects to that same VM.
+        """
+        name = f"{username}@{host}:{port}"
+        credential = hmac.new(self._secret, (password or '').encode('utf-8'), hashlib.sha256).digest()
+        with self._lock:
+            gate = self._connecting.setdefault(name, threading.Lock())
+        with gate:
+            with self._lock:
+                session = self.sessions.get(name)
+                if session and session.controller.connected:
+                    if not hmac.compare_digest(session.credential, credential):
+                        raise PermissionError(f"{name} is already connected with different credentials")
+                    if client is not None:
+                        session.clients.add(client)
+                    return name
+            controller = VMController(host, username, port, **{**self.controller_options, **options})
+            if not controller.connect(password):
+                raise ConnectionError(f"Could not connect to {name}")
+            session = _Session(controller, credential)
+            if client is not None:
+                session.clients.add(client)
+            with self._lock:
+                self.sessions[name] = session
+        return name
+
+    def release(self, client: object):
+        """Forget a closed client connection; the sessions it used stay open for reuse"""
+        with self._lock:
+            for session in self.sessions.values():
+                session.clients.discard(client)
+
+    def _owned(self, client: Optional[object]) -> Dict[str, _Session]:
+        """Sessions `client` may use (all of them for in-process calls)"""
+        with self._lock:
+            if client is None:
+                return dict(self.sessions)
+            return {name: s for name, s in self.sessions.items() if client in s.clients}
+
+    def _session(self, request: dict, client: Optional[object]) -> _Session:
+        owned = self._owned(client)
+        name = request.get('vm')
+        if name is None:
+            if len(owned) != 1:
+                raise ValueError("Name the VM with 'vm' (connected: "
+                                 f"{', '.join(sorted(owned)) or 'none'})")
+            return next(iter(owned.values()))
+        session = owned.get(name)
+        if session is None:
+            raise LookupError(f"VM {name} is not connected on this client connection")
+        return session
+
+    # Request dispatch
+    def dispatch(self, request: dict, client: Optional[object] = None) -> dict:
+        """
+        Handle one request from `client` (a socket connection; None for an
+        in-process caller, which may use every session); never raises
+        """
+        rid = request.get('id') if isinstance(request, dict) else None
+        try:
+            if not isinstance(request, dict) or request.get('op') not in self.OPS:
+                raise ValueError(f"Unknown op (expected one of {', '.join(self.OPS)})")
+            result = getattr(self, f"_op_{request['op']}")(request, client)
+            return {'id': rid, 'ok': True, 'result': result}
+        except Exception as e:
+            return {'id': rid, 'ok': False, 'error': f"{type(e).__name__}: {e}", 'type': type(e).__name__}
+
+    def _op_ping(self, request: dict, client: Optional[object]):
+        return 'pong'
+
+    def _op_connect(self, request: dict, client: Optional[object]):
+        # Clients must bring their own credentials; key and agent
+        # authentication is reserved for VMs the daemon was started with
+        if not request.get('password'):
+            raise PermissionError("connect needs a password")
+        options = {k: request[k] for k in ('transport', 'protocol', 'queue_window') if k in request}
+        return self.connect(request['host'], request['username'], request['password'],
+                            int(request.get('port', 2222)), client, **options)
+
+    def _op_disconnect(self, request: dict, client: Optional[object]):
+        # The VM is only disconnected once no other client connection uses it
+        session = self._session(request, client)
+        with self._lock:
+            session.clients.discard(client)
+            if session.clients:
+                return True
+            self.sessions = {k: v for k, v in self.sessions.items() if v is not session}
+        with session.lock:
+            session.controller.disconnect()
+        return True
+
+    def _op_list(self, request: dict, client: Optional[object]):
+        return [dict(s.controller.health(), vm=name) for name, s in sorted(self._owned(client).items())]
+
+    def _op_health(self, request: dict, client: Optional[object]):
+        return self._session(request, client).controller.health()
+
+    def _op_execute(self, request: dict, client: Optional[object]):
+        session = self._session(request, client)
+        with session.lock:
+            # The future carries the reason a command failed
+            return session.controller.execute_command(request['command'], wait=False).result()
+
+    def _op_batch(self, request: dict, client: Optional[object]):
+        session = self._session(request, client)
+        with session.lock:
+            return session.controller.batch_mode(request['commands'], request.get('delay'))
+
+    def _op_type(self, request: dict, client: Optional[object]):
+        session = self._session(request, client)
+        options = {k: request[k] for k in ('profile', 'chunk', 'pause', 'key_delay') if k in request}
+        with session.lock:
+            return session.controller.type_bulk(request['text'], **options)
+
+    def _op_stats(self, request: dict, client: Optional[object]):
+        return self._session(request, client).controller.stats()
+
+    def _op_shutdown(self, request: dict, client: Optional[object]):
+        threading.Thread(target=self.shutdown, daemon=True).start()
+        return True
+
+    # Listening
+    def serve_forever(self):
+        """Listen on the address and handle clients until shutdown()"""
+        self._server = self._bind()
+        try:
+            self._server.serve_forever()
+        finally:
+            self.close()
+
+    def _bind(self) -> socketserver.BaseServer:
+        if isinstance(self.address, tuple):
+            return _TCPServer(self.address, _Handler, self)
+        if os.path.exists(self.address):
+            # Refuse to steal the socket of a running daemon; clear a stale one
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.address)
+                raise OSError(f"A control server is already listening on {self.address}")
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.unlink(self.address)
+            finally:
+                probe.close()
+        old_umask = os.umask(0o177)  # Owner-only socket
+        try:
+            return _UnixServer(self.address, _Handler, self)
+        finally:
+            os.umask(old_umask)
+
+    def shutdown(self):
+        """Stop serve_forever() (from another thread)"""
+        if self._server:
+            self._server.shutdown()
+
+    def close(self):
+        """Disconnect every VM and remove the socket"""
+        if self._server:
+            self._server.server_close()
+            self._server = None
+            if isinstance(self.address, str) and os.path.exists(self.address):
+                os.unlink(self.address)
+        with self._lock:
+            sessions, self.sessions = self.sessions, {}
+        for session in sessions.values():
+            with session.lock:
+                session.controller.disconnect()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """One client connection: JSON lines, or a msgpack stream"""
+
+    def setup(self):
+        super().setup()
+        if self.request.family in (socket.AF_INET, socket.AF_INET6):
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def handle(self):
+        first = self.rfile.peek(1)[:1]
+        if not first:
+            return
+        if first in b'{[ \t\r\n' or msgpack is None:
+            self._handle_json()
+        else:
+            self._handle_msgpack()
+
+    def finish(self):
+        self.server.control.release(self)
+        super().finish()
+
+    def _handle_json(self):
+        dispatch = self.server.control.dispatch
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                response = {'id': None, 'ok': False, 'error': f"Malformed JSON: {e}", 'type': 'ValueError'}
+            else:
+                response = dispatch(request, self)
+            self.wfile.write(json.dumps(response, default=str).encode('utf-8') + b'\n')
+
+    def _handle_msgpack(self):
+        dispatch = self.server.control.dispatch
+        unpacker = msgpack.Unpacker(raw=False)
+        while True:
+            data = self.rfile.read1(65536)
+            if not data:
+                return
+            unpacker.feed(data)
+            for request in unpacker:
+                self.wfile.write(msgpack.packb(dispatch(request, self), default=str))
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, handler, control: ControlServer):
+        self.control = control
+        super().__init__(address, handler)
+
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+        def __init__(self, address, handler, control: ControlServer):
+            self.control = control
+            super().__init__(address, handler)
+
+
+class ControlClient:
+    """
+    Client for a running control server; connecting costs one local socket
+    connect instead of an SSH handshake.
+
+        with ControlClient() as client:
+            client.connect(host, username, password)
+            client.execute("500 500 left")
+    """
+
+    def __init__(self, address: Optional[Address] = None, timeout: Optional[float] = None):
+        self.address = address or default_address()
+        family = socket.AF_INET if isinstance(self.address, tuple) else socket.AF_UNIX
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(self.address)
+        if family == socket.AF_INET:
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self.sock.makefile('rb')
+        self._id = 0
+
+    def request(self, op: str, **params):
+        """Send one request and return its result; raises ControlError on failure"""
+        self._id += 1
+        params.update(id=self._id, op=op)
+        self.sock.sendall(json.dumps(params).encode('utf-8') + b'\n')
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("Control server closed the connection")
+        response = json.loads(line)
+        if not response.get('ok'):
+            raise ControlError(response.get('error', 'unknown error'), response.get('type', 'ControlError'))
+        return response.get('result')
+
+    def connect(self, host: str, username: str, password: str, port: int = 2222, **options) -> str:
+        return self.request('connect', host=host, username=username, password=password, port=port, **options)
+
+    def execute(self, command: str, vm: Optional[str] = None) -> bool:
+        return self.request('execute', command=command, **({'vm': vm} if vm else {}))
+
+    def batch(self, commands, delay: Optional[float] = None, vm: Optional[str] = None) -> dict:
+        return self.request('batch', commands=list(commands), delay=delay, **({'vm': vm} if vm else {}))
+
+    def close(self):
+        self._reader.close()
+        self.sock.close()
+
+    def __enter__(self) -> 'ControlClient':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
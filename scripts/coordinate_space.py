@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Coordinate Spaces
+Lets scripts address the VM's screen in a space of their choosing instead
+of raw pixels, so one script works across resolutions and DPI settings:
+
+    screen          physical pixels, as AutoHotkey's CoordMode "Screen" uses
+    normalized      0..1 across the monitor (0.5 0.5 is its centre)
+    logical         DPI-independent pixels (physical / (dpi / 96))
+    WxH             a reference resolution, e.g. 1920x1080, stretched to the monitor
+
+A space is relative to one monitor: `normalized@2` is the second one,
+`screen@all` the whole virtual desktop; the default is the primary
+monitor. Every space maps to screen pixels by an affine transform
+(x * ax + bx, y * ay + by), computed once per session from the display
+metrics the VM reports and applied to whole batches at once (with NumPy
+when it is installed and the batch is large), drag targets included.
+"""
+
+import base64
+import re
+import struct
+from itertools import islice
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from command_parser import MOUSE_ACTIONS
+
+SPACES = ('screen', 'normalized', 'logical')
+
+# Batches with fewer points than this are faster in plain Python
+NUMPY_MIN_POINTS = 2048
+
+_NUMBER = r'[+-]?(?:\d+(?:\.\d*)?|\.\d+)'
+
+# `x y action [x2 y2]` (targets only for drag), bare `x y` (an implicit move)
+# and `here drag x2 y2`; groups: x, y, action, x2, y2, rest (x, y and action
+# are empty for `here drag`; action and rest are None for bare `x y`)
+_POINT = re.compile(rf'\s*({_NUMBER})\s+({_NUMBER})(?:\s+({"|".join(sorted(MOUSE_ACTIONS))})'
+                    rf'(?:(?<=drag)\s+({_NUMBER})\s+({_NUMBER}))?(?!\S)(.*)|\s*)\Z', re.S)
+_HERE_DRAG = re.compile(rf'\s*here\s+drag()()()\s+({_NUMBER})\s+({_NUMBER})(?!\S)(.*)\Z', re.S)
+_RESOLUTION = re.compile(r'(\d+)x(\d+)\Z')
+
+_PAIR = struct.Struct('<2h')
+_INT16_MIN, _INT16_MAX = -0x8000, 0x7FFF
+
+# Monitor layout as the watchers see it. The process is made per-monitor
+# DPI aware first (like AutoHotkey v2), so bounds are physical pixels.
+_METRICS_SCRIPT = r'''
+Add-Type @"
+using System; using System.Collections.Generic; using System.Runtime.InteropServices;
+public static class WacDisplay {
+  [StructLayout(LayoutKind.Sequential)] public struct RECT { public int L, T, R, B; }
+  [StructLayout(LayoutKind.Sequential)] struct INFO { public int Size; public RECT Monitor, Work; public uint Flags; }
+  delegate bool Callback(IntPtr m, IntPtr dc, ref RECT r, IntPtr d);
+  [DllImport("user32.dll")] static extern bool SetProcessDpiAwarenessContext(IntPtr c);
+  [DllImport("user32.dll")] static extern bool EnumDisplayMonitors(IntPtr dc, IntPtr clip, Callback cb, IntPtr d);
+  [DllImport("user32.dll")] static extern bool GetMonitorInfo(IntPtr m, ref INFO i);
+  [DllImport("shcore.dll")] static extern int GetDpiForMonitor(IntPtr m, int type, out uint x, out uint y);
+  public static void Print() {
+    try { SetProcessDpiAwarenessContext(new IntPtr(-4)); } catch { }
+    var lines = new List<string>();
+    EnumDisplayMonitors(IntPtr.Zero, IntPtr.Zero, (IntPtr m, IntPtr dc, ref RECT r, IntPtr d) => {
+      var info = new INFO(); info.Size = Marshal.SizeOf(info); GetMonitorInfo(m, ref info);
+      uint x = 96, y = 96; try { GetDpiForMonitor(m, 0, out x, out y); } catch { }
+      lines.Add(String.Format("monitor {0} {1} {2} {3} {4} {5}", r.L, r.T, r.R - r.L, r.B - r.T, x, info.Flags & 1));
+      return true; }, IntPtr.Zero);
+    Console.WriteLine(String.Join("\n", lines));
+  }
+}
+"@
+[WacDisplay]::Print()
+'''
+
+METRICS_COMMAND = ('powershell -NoProfile -NonInteractive -EncodedCommand '
+                   + base64.b64encode(_METRICS_SCRIPT.encode('utf-16-le')).decode('ascii'))
+
+_numpy = None
+
+
+class CoordinateSpaceError(Exception):
+    """Raised for an unknown space or monitor, or display metrics that cannot be read"""
+
+
+class Monitor(NamedTuple):
+    """One display, in physical virtual-desktop pixels"""
+    x: int
+    y: int
+    width: int
+    height: int
+    dpi: int = 96
+    primary: bool = False
+
+    @property
+    def scale(self) -> float:
+        """Windows display scaling, e.g. 1.5 for 150%"""
+        return self.dpi / 96
+
+
+class DisplayMetrics:
+    """The VM's monitors; monitor numbers are 1-based in enumeration order"""
+
+    def __init__(self, monitors: Sequence[Monitor]):
+        if not monitors:
+            raise CoordinateSpaceError("No monitors")
+        self.monitors = list(monitors)
+
+    @classmethod
+    def single(cls, width: int, height: int, dpi: int = 96) -> 'DisplayMetrics':
+        """One monitor of the given size, e.g. for converting recordings offline"""
+        return cls([Monitor(0, 0, width, height, dpi, True)])
+
+    @classmethod
+    def parse(cls, output: str) -> 'DisplayMetrics':
+        """Metrics from METRICS_COMMAND's output"""
+        monitors = []
+        for line in output.splitlines():
+            fields = line.split()
+            if len(fields) == 7 and fields[0] == 'monitor':
+                try:
+                    x, y, width, height, dpi, primary = (int(f) for f in fields[1:])
+                except ValueError:
+                    continue
+                monitors.append(Monitor(x, y, width, height, dpi, bool(primary)))
+        if not monitors:
+            raise CoordinateSpaceError("Could not read the VM's display metrics")
+        return cls(monitors)
+
+    @classmethod
+    def query(cls, run_remote) -> 'DisplayMetrics':
+        """Ask the VM; `run_remote(cmd)` returns (exit status, stdout)"""
+        status, output = run_remote(METRICS_COMMAND)
+        if status != 0:
+            raise CoordinateSpaceError(f"Display metrics query failed (exit status {status})")
+        return cls.parse(output)
+
+    @property
+    def primary(self) -> Monitor:
+        return next((m for m in self.monitors if m.primary), self.monitors[0])
+
+    @property
+    def virtual(self) -> Monitor:
+        """Bounding box of all monitors, at the primary monitor's DPI"""
+        left = min(m.x for m in self.monitors)
+        top = min(m.y for m in self.monitors)
+        right = max(m.x + m.width for m in self.monitors)
+        bottom = max(m.y + m.height for m in self.monitors)
+        return Monitor(left, top, right - left, bottom - top, self.primary.dpi, True)
+
+    def monitor(self, which: Optional[str]) -> Monitor:
+        """None for the primary monitor, 'all' for the virtual desktop, or a 1-based number"""
+        if which is None:
+            return self.primary
+        if which == 'all':
+            return self.virtual
+        if which.isdecimal() and 1 <= int(which) <= len(self.monitors):
+            return self.monitors[int(which) - 1]
+        raise CoordinateSpaceError(f"No monitor '{which}' (the VM has {len(self.monitors)})")
+
+    def describe(self) -> str:
+        return ', '.join(f"{i}: {m.width}x{m.height}+{m.x}+{m.y} at {m.dpi * 100 // 96}%"
+                         f"{' (primary)' if m.primary else ''}"
+                         for i, m in enumerate(self.monitors, 1))
+
+
+class Transform(NamedTuple):
+    """Affine map from a coordinate space to screen pixels"""
+    ax: float = 1.0
+    bx: float = 0.0
+    ay: float = 1.0
+    by: float = 0.0
+
+    @property
+    def is_identity(self) -> bool:
+        return self == IDENTITY
+
+    def inverse(self) -> 'Transform':
+        """Screen pixels back to the space"""
+        return Transform(1 / self.ax, -self.bx / self.ax, 1 / self.ay, -self.by / self.ay)
+
+    def then(self, other: 'Transform') -> 'Transform':
+        """This transform followed by `other`"""
+        return Transform(self.ax * other.ax, self.bx * other.ax + other.bx,
+                         self.ay * other.ay, self.by * other.ay + other.by)
+
+    def point(self, x: float, y: float) -> Tuple[int, int]:
+        return round(x * self.ax + self.bx), round(y * self.ay + self.by)
+
+    def map_points(self, xs: Sequence[float], ys: Sequence[float]) -> Tuple[List[int], List[int]]:
+        """Whole-batch transform of coordinate lists, rounded to pixels"""
+        ax, bx, ay, by = self
+        if len(xs) >= NUMPY_MIN_POINTS and _load_numpy():
+            np = _numpy
+            xs = np.rint(np.asarray(xs, dtype=np.float64) * ax + bx).astype(np.int64)
+            ys = np.rint(np.asarray(ys, dtype=np.float64) * ay + by).astype(np.int64)
+            return xs.tolist(), ys.tolist()
+        return [round(x * ax + bx) for x in xs], [round(y * ay + by) for y in ys]
+
+    def map_packed(self, buf: bytearray, offsets: Sequence[int]) -> List[int]:
+        """
+        Transform little-endian int16 (x, y) pairs stored at `offsets` in
+        `buf`, in place. Returns the offsets whose results do not fit in
+        int16; those pairs are left unchanged.
+        """
+        ax, bx, ay, by = self
+        if len(offsets) >= NUMPY_MIN_POINTS and _load_numpy():
+            np = _numpy
+            raw = np.frombuffer(buf, dtype=np.uint8)
+            at = np.asarray(offsets, dtype=np.int64)[:, None] + np.arange(4)
+            points = np.rint(raw[at].view('<i2') * np.array([ax, ay]) + np.array([bx, by]))
+            fits = ((points >= _INT16_MIN) & (points <= _INT16_MAX)).all(axis=1)
+            raw[at[fits]] = points[fits].astype('<i2').view(np.uint8)
+            return at[~fits, 0].tolist()
+        unfit = []
+        pair = _PAIR
+        for offset in offsets:
+            x, y = pair.unpack_from(buf, offset)
+            x = round(x * ax + bx)
+            y = round(y * ay + by)
+            if _INT16_MIN <= x <= _INT16_MAX and _INT16_MIN <= y <= _INT16_MAX:
+                pair.pack_into(buf, offset, x, y)
+            else:
+                unfit.append(offset)
+        return unfit
+
+    def apply(self, lines: Iterable[str]) -> List[str]:
+        """
+        Command lines with every mouse coordinate (and drag target) mapped
+        to screen pixels. Other lines, and coordinates that are not
+        numbers, are left for the parser to judge.
+        """
+        lines = list(lines)
+        if self.is_identity:
+            return lines
+        found = []
+        xs: List[float] = []
+        ys: List[float] = []
+        point, here = _POINT.match, _HERE_DRAG.match
+        for i, line in enumerate(lines):
+            match = point(line) or here(line)
+            if match:
+                x, y, _action, x2, y2, _rest = match.groups()
+                found.append((i, match))
+                if x:
+                    xs.append(float(x))
+                    ys.append(float(y))
+                if x2 is not None:
+                    xs.append(float(x2))
+                    ys.append(float(y2))
+        if not found:
+            return lines
+        xs, ys = self.map_points(xs, ys)
+        at = 0
+        for i, match in found:
+            lines[i], at = _rewrite(match, xs, ys, at)
+        return lines
+
+    def apply_line(self, line: str) -> str:
+        """apply() for a single command"""
+        match = None if self.is_identity else _POINT.match(line) or _HERE_DRAG.match(line)
+        if not match:
+            return line
+        x, y, _action, x2, y2, _rest = match.groups()
+        points = [self.point(float(x), float(y))] if x else []
+        if x2 is not None:
+            points.append(self.point(float(x2), float(y2)))
+        return _rewrite(match, [p[0] for p in points], [p[1] for p in points], 0)[0]
+
+
+IDENTITY = Transform()
+
+
+def _load_numpy() -> bool:
+    """Import NumPy on first use (it is optional, and slow to import)"""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy is not False
+
+
+def _rewrite(match, xs: List[int], ys: List[int], at: int) -> Tuple[str, int]:
+    """The matched command with its coordinates replaced by xs[at], ys[at] (and the next pair for a drag)"""
+    _x, _y, action, x2, _y2, rest = match.groups()
+    if action is None:
+        return f"{xs[at]} {ys[at]} move", at + 1
+    if not action:
+        return f"here drag {xs[at]} {ys[at]}{rest}", at + 1
+    if x2 is None:
+        return f"{xs[at]} {ys[at]} {action}{rest}", at + 1
+    return f"{xs[at]} {ys[at]} drag {xs[at + 1]} {ys[at + 1]}{rest}", at + 2
+
+
+class CoordinateSpace(NamedTuple):
+    """
+    A named space: `kind` is 'screen', 'normalized', 'logical' or
+    'reference' (with `reference` = (width, height)); `monitor` is None
+    (primary), 'all' or a 1-based monitor number.
+    """
+    kind: str = 'screen'
+    monitor: Optional[str] = None
+    reference: Optional[Tuple[int, int]] = None
+
+    @classmethod
+    def parse(cls, spec: str) -> 'CoordinateSpace':
+        """'SPACE[@MONITOR]', e.g. 'normalized', '1920x1080@2', 'screen@all'"""
+        name, _, monitor = spec.strip().partition('@')
+        if monitor and monitor != 'all' and not (monitor.isdecimal() and int(monitor) >= 1):
+            raise CoordinateSpaceError(f"Invalid monitor '{monitor}' in '{spec}' (expected a number or 'all')")
+        resolution = _RESOLUTION.match(name)
+        if resolution:
+            width, height = int(resolution.group(1)), int(resolution.group(2))
+            if width < 2 or height < 2:
+                raise CoordinateSpaceError(f"Invalid reference resolution '{name}'")
+            return cls('reference', monitor or None, (width, height))
+        if name not in SPACES:
+            raise CoordinateSpaceError(f"Unknown coordinate space '{name}' "
+                                       f"(expected {', '.join(SPACES)} or WIDTHxHEIGHT)")
+        return cls(name, monitor or None)
+
+    @property
+    def needs_metrics(self) -> bool:
+        """False for raw screen pixels, which need no display information"""
+        return not (self.kind == 'screen' and self.monitor is None)
+
+    def transform(self, metrics: DisplayMetrics) -> Transform:
+        """The affine map to screen pixels on a VM with these metrics"""
+        m = metrics.monitor(self.monitor)
+        if self.kind == 'screen':
+            return Transform(1.0, m.x, 1.0, m.y)
+        if self.kind == 'logical':
+            return Transform(m.scale, m.x, m.scale, m.y)
+        if self.kind == 'normalized':
+            # 0 and 1 are the first and last pixel
+            return Transform(m.width - 1, m.x, m.height - 1, m.y)
+        width, height = self.reference
+        return Transform((m.width - 1) / (width - 1), m.x, (m.height - 1) / (height - 1), m.y)
+
+    def __str__(self) -> str:
+        name = f"{self.reference[0]}x{self.reference[1]}" if self.kind == 'reference' else self.kind
+        return f"{name}@{self.monitor}" if self.monitor else name
+
+
+def rescale(src: str, dst: str, source: Tuple[int, int], target: Tuple[int, int],
+            compress: Optional[bool] = None) -> int:
+    """
+    Convert a recording or text command file from one screen resolution
+    to another (single monitor). Returns the number of events or lines written.
+    """
+    transform = CoordinateSpace('reference', None, source).transform(DisplayMetrics.single(*target))
+    from trajectory import is_trajectory, transform_coordinates
+
+    if is_trajectory(src):
+        return transform_coordinates(src, dst, transform, compress)
+
+    count = 0
+    with open(src, 'r', encoding='utf-8') as f, open(dst, 'w', encoding='utf-8') as out:
+        while True:
+            chunk = [line.rstrip('\r\n') for line in islice(f, 65536)]
+            if not chunk:
+                return count
+            for line in transform.apply(chunk):
+                out.write(line + '\n')
+            count += len(chunk)
+
+
+def parse_resolution(text: str) -> Tuple[int, int]:
+    """'1920x1080' -> (1920, 1080)"""
+    match = _RESOLUTION.match(text.strip())
+    if not match or int(match.group(1)) < 2 or int(match.group(2)) < 2:
+        raise CoordinateSpaceError(f"Invalid resolution '{text}' (expected WIDTHxHEIGHT)")
+    return int(match.group(1)), int(match.group(2))
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Fleet Runner
+Runs command scripts on many VMs at once, for evaluation runs. Hosts come
+from an inventory file (INI, one section per VM; [DEFAULT] holds shared
+settings):
+
+    [DEFAULT]
+    username = AgentUser
+    script = eval.wac
+
+    [vm1]
+    host = 192.168.1.101
+
+    [vm2]
+    host = 192.168.1.102
+    port = 2223
+    script = shards/vm2.txt
+
+Keys: host (default: the section name), port, username, password,
+key_file, transport, protocol, space and script. `{name}` in a script
+path is replaced by the section name, so `script = shards/{name}.txt`
+gives each VM its own shard. Scripts are macro scripts and also get the
+variables `vm` (section name), `shard` (its position, from 0) and
+`shards` (number of VMs), so one shared script can split work itself.
+
+Each VM runs on its own worker thread, at most `parallel` at a time.
+Controllers' own output goes to a per-VM log; the console gets one line
+per VM as it starts and finishes, and periodic progress. A VM that cannot
+be reached, or runs past `host_timeout`, is reported and abandoned
+without holding up the others.
+"""
+
+import configparser
+import heapq
+import io
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Dict, List, NamedTuple, Optional
+
+from command_log import CommandLog
+from connection_pool import ConnectionPool, ReconnectPolicy
+from coordinate_space import CoordinateSpace, CoordinateSpaceError
+from macros import DEFAULT_CACHE_DIR, MacroError, compile_file, execute
+from settle_scheduler import SettleScheduler
+from windows_actuation_control import VMController
+
+INVENTORY_KEYS = ('host', 'port', 'username', 'password', 'key_file', 'transport', 'protocol',
+                  'space', 'script')
+
+# Lines of each VM's output kept for error messages when there is no log file
+TAIL_LINES = 200
+
+# Result statuses
+OK = 'ok'              # every command sent
+FAILED = 'failed'      # ran, but some commands failed or were invalid
+ERROR = 'error'        # could not connect or run the script
+TIMEOUT = 'timeout'    # abandoned after host_timeout
+
+
+class FleetError(Exception):
+    """Raised for an inventory that cannot be used"""
+
+
+class HostSpec(NamedTuple):
+    """One VM from the inventory"""
+    name: str
+    host: str
+    port: int
+    username: str
+    password: Optional[str]
+    key_file: Optional[str]
+    transport: str
+    protocol: str
+    space: Optional[CoordinateSpace]
+    script: str
+
+
+def load_inventory(path: str, script: Optional[str] = None) -> List[HostSpec]:
+    """
+    Hosts from an inventory file, in file order. `script` (e.g. from the
+    command line) is used for VMs whose section names none.
+    """
+    parser = configparser.ConfigParser(interpolation=None)
+    try:
+        with open(path, encoding='utf-8') as f:
+            parser.read_file(f)
+    except (OSError, UnicodeDecodeError, configparser.Error) as e:
+        raise FleetError(f"Could not read inventory {path}: {e}")
+
+    base = os.path.dirname(os.path.abspath(path))
+    hosts = []
+    for name in parser.sections():
+        section = parser[name]
+        unknown = set(section) - set(INVENTORY_KEYS)
+        if unknown:
+            raise FleetError(f"[{name}]: unknown key(s) {', '.join(sorted(unknown))}")
+        where = section.get('script') or script
+        if not where:
+            raise FleetError(f"[{name}]: no script (set `script` or pass one)")
+        # Inventory paths are relative to the inventory; command-line ones to the working directory
+        where = where.replace('{name}', name)
+        if section.get('script'):
+            where = os.path.join(base, os.path.expanduser(where))
+        username = section.get('username')
+        if not username:
+            raise FleetError(f"[{name}]: no username")
+        try:
+            port = int(section.get('port', '2222'))
+        except ValueError:
+            raise FleetError(f"[{name}]: invalid port '{section.get('port')}'")
+        try:
+            space = CoordinateSpace.parse(section['space']) if section.get('space') else None
+        except CoordinateSpaceError as e:
+            raise FleetError(f"[{name}]: {e}")
+        transport = section.get('transport', 'session')
+        protocol = section.get('protocol', 'queue')
+        if transport not in VMController.TRANSPORTS or protocol not in VMController.PROTOCOLS:
+            raise FleetError(f"[{name}]: unknown transport or protocol '{transport}/{protocol}'")
+        key_file = section.get('key_file')
+        hosts.append(HostSpec(name, section.get('host', name), port, username,
+                              section.get('password') or os.environ.get('WAC_PASSWORD'),
+                              os.path.expanduser(key_file) if key_file else None,
+                              transport, protocol, space, where))
+    if not hosts:
+        raise FleetError(f"{path}: no hosts (one [section] per VM)")
+    return hosts
+
+
+class _Tail(io.TextIOBase):
+    """Keeps the last lines written, and copies everything to a log file if given"""
+
+    def __init__(self, log_path: Optional[str] = None):
+        self.lines = deque(maxlen=TAIL_LINES)
+        self._partial = ''
+        self._log = open(log_path, 'w', encoding='utf-8') if log_path else None
+        self._lock = threading.Lock()
+
+    def write(self, text: str) -> int:
+        # The worker and its controller's command log writer both write here
+        with self._lock:
+            if self._log:
+                self._log.write(text)
+            parts = (self._partial + text).split('\n')
+            self._partial = parts.pop()
+            self.lines.extend(parts)
+        return len(text)
+
+    def last_error(self) -> Optional[str]:
+        for line in reversed(self.lines):
+            if line.lstrip().startswith('[✗]'):
+                return line.strip()[4:]
+        return None
+
+    def close(self):
+        if self._log:
+            self._log.close()
+        super().close()
+
+
+class _RoutedOutput(io.TextIOBase):
+    """sys.stdout stand-in that sends each worker thread's output to its own sink"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._local = threading.local()
+
+    def bind(self, sink: Optional[io.TextIOBase]):
+        self._local.sink = sink
+
+    def write(self, text: str) -> int:
+        sink = getattr(self._local, 'sink', None)
+        if sink is not None:
+            return sink.write(text)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+class _Slowest:
+    """Metrics hook keeping the `count` slowest commands (or pipelined steps)"""
+
+    def __init__(self, count: int):
+        self.count = count
+        self.heap: List[tuple] = []
+        self._seq = 0
+
+    def __call__(self, span):
+        if span.name not in ('execute', 'batch_step') or span.detail is None:
+            return
+        self._seq += 1
+        entry = (span.duration, self._seq, span.detail)
+        if len(self.heap) < self.count:
+            heapq.heappush(self.heap, entry)
+        elif entry > self.heap[0]:
+            heapq.heapreplace(self.heap, entry)
+
+    def result(self) -> List[dict]:
+        return [{'seconds': seconds, 'command': detail}
+                for seconds, _, detail in sorted(self.heap, reverse=True)]
+
+
+class _Run:
+    """One VM's run in progress"""
+
+    def __init__(self, index: int, spec: HostSpec):
+        self.index = index
+        self.spec = spec
+        self.controller: Optional[VMController] = None
+        self.started = 0.0
+        self.result: Optional[dict] = None
+        self.thread: Optional[threading.Thread] = None
+        self.lock = threading.Lock()
+
+    def commands_done(self) -> int:
+        controller = self.controller
+        if controller is None:
+            return 0
+        return int(sum(c['value'] for c in controller.metrics.snapshot()['counters']
+                       if c['name'] == 'commands_total'))
+
+
+class FleetRunner:
+    """
+    Runs each host's script with at most `parallel` VMs at a time.
+    Scripts run through batch mode exactly as `-f` does (`delay` and
+    `settle_mode` as there); `variables` are passed to every script.
+    """
+
+    def __init__(self, hosts: List[HostSpec], parallel: int = 8, host_timeout: Optional[float] = None,
+                 connect_timeout: float = 15.0, delay: Optional[float] = None,
+                 variables: Optional[Dict[str, object]] = None, settle_mode: str = 'adaptive',
+                 log_dir: Optional[str] = None, slowest: int = 3, progress_interval: float = 10.0,
+                 cache: bool = True):
+        if parallel < 1:
+            raise ValueError("parallel must be at least 1")
+        self.hosts = hosts
+        self.parallel = parallel
+        self.host_timeout = host_timeout
+        self.connect_timeout = connect_timeout
+        self.delay = delay
+        self.variables = dict(variables or {})
+        self.settle_mode = settle_mode
+        self.log_dir = log_dir
+        self.slowest = slowest
+        self.progress_interval = progress_interval
+        self.cache_dir = DEFAULT_CACHE_DIR if cache else None
+        self.pool = ConnectionPool(keepalive_interval=0, policy=ReconnectPolicy(max_attempts=3))
+        self._say_lock = threading.Lock()
+        self._stream = sys.stdout
+
+    def _say(self, text: str):
+        with self._say_lock:
+            self._stream.write(text + '\n')
+            self._stream.flush()
+
+    def run(self) -> List[dict]:
+        """Run every host; returns one result per host, in inventory order"""
+        if self.log_dir:
+            os.makedirs(self.log_dir, exist_ok=True)
+        runs = [_Run(i, spec) for i, spec in enumerate(self.hosts)]
+        pending = deque(runs)
+        active: List[_Run] = []
+        done = threading.Event()
+        router = _RoutedOutput(sys.stdout)
+        self._stream = router.stream
+        start = time.monotonic()
+        next_progress = start + self.progress_interval
+
+        sys.stdout = router
+        try:
+            while pending or active:
+                while pending and len(active) < self.parallel:
+                    run = pending.popleft()
+                    run.started = time.monotonic()
+                    active.append(run)
+                    run.thread = threading.Thread(target=self._worker, args=(run, router, done), daemon=True,
+                                                  name=f"fleet-{run.spec.name}")
+                    run.thread.start()
+
+                done.wait(0.2)
+                done.clear()
+                now = time.monotonic()
+                for run in list(active):
+                    if run.result is None and self.host_timeout and now - run.started > self.host_timeout:
+                        self._abandon(run, now)
+                    if run.result is not None:
+                        active.remove(run)
+
+                if self.progress_interval and now >= next_progress and active:
+                    next_progress = now + self.progress_interval
+                    running = ', '.join(f"{r.spec.name} {r.commands_done()}" for r in active)
+                    self._say(f"[*] {len(runs) - len(active) - len(pending)}/{len(runs)} done, "
+                              f"{now - start:.0f}s; commands so far: {running}")
+        finally:
+            # Abandoned workers keep their command log on their own _Tail; stray prints reach the terminal
+            if sys.stdout is router:
+                sys.stdout = router.stream
+        return [run.result for run in runs]
+
+    def _abandon(self, run: _Run, now: float):
+        """Give up on a VM that ran too long; its worker is left to fail on its own"""
+        with run.lock:
+            if run.result is not None:
+                return
+            run.result = self._result(run, TIMEOUT, now - run.started,
+                                      error=f"still running after {self.host_timeout:g}s")
+        self._say(f"[✗] {run.spec.name}: timed out after {self.host_timeout:g}s")
+        controller = run.controller
+        if controller is not None:
+            # Closing the connection makes a stuck command fail; it may block, so not on this thread
+            threading.Thread(target=self._quietly, args=(controller.disconnect,), daemon=True).start()
+
+    @staticmethod
+    def _quietly(fn):
+        try:
+            fn()
+        except Exception:
+            pass
+
+    def _worker(self, run: _Run, router: _RoutedOutput, done: threading.Event):
+        spec = run.spec
+        log_path = os.path.join(self.log_dir, f"{spec.name}.log") if self.log_dir else None
+        tail = _Tail(log_path)
+        router.bind(tail)
+        slowest = _Slowest(self.slowest)
+        # The command log writes from its own thread, which the stdout routing cannot place
+        log = CommandLog(stream=tail)
+        report = None
+        status, error = ERROR, None
+        try:
+            program = compile_file(spec.script, self.cache_dir)
+            controller = VMController(spec.host, spec.username, spec.port, transport=spec.transport,
+                                      protocol=spec.protocol, pool=self.pool, space=spec.space,
+                                      scheduler=SettleScheduler(self.settle_mode,
+                                                                {'ui': (VMController.UI_SETTLE_TIME,)}),
+                                      log=log)
+            controller.metrics.add_hook(slowest)
+            run.controller = controller
+            self._say(f"[*] {spec.name}: connecting to {spec.username}@{spec.host}:{spec.port}")
+            if controller.connect(spec.password, key_filename=spec.key_file, timeout=self.connect_timeout):
+                try:
+                    variables = dict(self.variables, vm=spec.name, shard=run.index, shards=len(self.hosts))
+                    report = execute(controller, program.expand(variables), self.delay)
+                finally:
+                    controller.disconnect()
+                status = OK if report['failed'] == 0 and report['invalid'] == 0 else FAILED
+            else:
+                error = tail.last_error() or "connection failed"
+        except MacroError as e:
+            error = str(e)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            log.close()
+            router.bind(None)
+            tail.close()
+
+        with run.lock:
+            if run.result is None:
+                run.result = self._result(run, status, time.monotonic() - run.started, report, error,
+                                          slowest.result(), log_path)
+                self._announce(run.result)
+        done.set()
+
+    def _result(self, run: _Run, status: str, duration: float, report: Optional[dict] = None,
+                error: Optional[str] = None, slowest: Optional[List[dict]] = None,
+                log: Optional[str] = None) -> dict:
+        report = report or {}
+        return {
+            'name': run.spec.name,
+            'host': f"{run.spec.username}@{run.spec.host}:{run.spec.port}",
+            'script': run.spec.script,
+            'status': status,
+            'error': error,
+            'duration': duration,
+            'commands': report.get('commands', run.commands_done() if status == TIMEOUT else 0),
+            'failed': report.get('failed', 0),
+            'invalid': report.get('invalid', 0),
+            'ops_per_sec': report.get('ops_per_sec', 0.0),
+            'settle': report.get('settle', {}).get('total', 0.0),
+            'slowest': slowest or [],
+            'log': log,
+        }
+
+    def _announce(self, result: dict):
+        name = result['name']
+        if result['status'] == OK:
+            self._say(f"[✓] {name}: {result['commands']} commands in {result['duration']:.1f}s "
+                      f"({result['ops_per_sec']:.1f} ops/sec)")
+        elif result['status'] == FAILED:
+            self._say(f"[!] {name}: {result['failed']} failed, {result['invalid']} invalid "
+                      f"of {result['commands'] + result['failed']} commands in {result['duration']:.1f}s")
+        else:
+            self._say(f"[✗] {name}: {result['error']}")
+
+
+def summary_table(results: List[dict]) -> str:
+    """Per-VM duration, throughput, failures and slowest command, plus totals"""
+    rows = [f"{'vm':<16} {'status':<8} {'time s':>8} {'cmds':>7} {'ops/s':>7} {'failed':>7}  slowest"]
+    for r in results:
+        slowest = r['slowest'][0] if r['slowest'] else None
+        detail = f"{slowest['seconds'] * 1000:.0f}ms {slowest['command']}" if slowest else (r['error'] or '')
+        rows.append(f"{r['name'][:16]:<16} {r['status']:<8} {r['duration']:>8.1f} {r['commands']:>7} "
+                    f"{r['ops_per_sec']:>7.1f} {r['failed'] + r['invalid']:>7}  {detail[:60]}")
+    commands = sum(r['commands'] for r in results)
+    wall = max((r['duration'] for r in results), default=0.0)
+    ok = sum(1 for r in results if r['status'] == OK)
+    rows.append(f"{ok}/{len(results)} VMs ok, {commands} commands, "
+                f"{commands / wall if wall > 0 else 0.0:.1f} ops/sec across the fleet")
+    return '\n'.join(rows)
@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+"""
+Macro Scripts
+A small script language on top of the command syntax, for batch files
+that repeat themselves. Every plain line is a command as before;
+directives start with `@` and `${expr}` substitutes a value:
+
+    @set top = 180
+    @macro field row value
+    400 ${top + row * 32} left
+    type ${value}
+    @end
+    @repeat i 0..200
+    @call field ${i} "Item ${i}"
+    @end
+    @offset 960 0
+    @include right_pane.wac
+    @end
+
+Directives:
+    @set NAME = EXPR              assign a variable
+    @repeat COUNT | @repeat VAR A..B [step S]      loop (B excluded)
+    @each VAR in EXPR, EXPR, ...  loop over values
+    @each VAR in lines PATH       loop over the lines of a file (read lazily)
+    @macro NAME [PARAMS]          define a macro (ended by @end)
+    @call NAME [ARGS]             expand a macro; args are words or "quoted"
+    @offset DX DY                 shift mouse coordinates in the block
+    @include PATH                 compile another script in place
+    @end                          close @repeat, @each, @macro or @offset
+
+Expressions use numbers, strings, variables, + - * / // % and min, max,
+abs, int, round, len, str; in directive arguments the `${}` around an
+expression is optional. In a script, `@@` at the start of a line and
+`$${` stand for a literal `@` and `${`. A file without any directive is
+an old command file: `@word` lines and `${NAME}` with NAME undefined are
+left as they are.
+
+Scripts compile once to an intermediate form (JSON) cached on disk by
+content hash, and expand lazily into command lines, so a million-step
+loop is never held in memory.
+"""
+
+import ast
+import hashlib
+import json
+import os
+import re
+import shlex
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from command_parser import default_parser, is_comment
+
+# Bump when the compiled form changes; old cache entries are then ignored
+FORMAT_VERSION = 2
+
+# Compiled scripts, keyed by content hash
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join('~', '.cache'),
+                                 'windows-actuation', 'macros')
+
+# Deepest @call/@include nesting before a script is considered recursive
+MAX_DEPTH = 64
+
+DIRECTIVES = ('set', 'repeat', 'each', 'macro', 'call', 'offset', 'include', 'end')
+
+_SUBST = re.compile(r'(?<!\$)\$\{([^{}]*)\}')
+_DIRECTIVE_LINE = re.compile(rb'^[ \t]*@(?:' + b'|'.join(d.encode() for d in DIRECTIVES) + rb')\b', re.M)
+_NAME = re.compile(r'[A-Za-z_]\w*\Z')
+_RANGE = re.compile(r'(?P<var>[A-Za-z_]\w*)\s+(?P<start>.+?)\s*\.\.\s*(?P<stop>.+?)(?:\s+step\s+(?P<step>.+))?\Z')
+
+_FUNCTIONS = {'min': min, 'max': max, 'abs': abs, 'int': int, 'round': round, 'len': len, 'str': str}
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.Name, ast.Load, ast.Call,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.USub, ast.UAdd,
+)
+
+
+class MacroError(Exception):
+    """Raised for a script that cannot be compiled or expanded"""
+
+
+def check_expression(expr: str, where: str) -> str:
+    """Validate an expression; only arithmetic, names and the helper functions are allowed"""
+    expr = expr.strip()
+    wrapped = _SUBST.fullmatch(expr)
+    if wrapped:
+        expr = wrapped.group(1).strip()  # `${...}` is optional in directive arguments
+    try:
+        tree = ast.parse(expr, mode='eval')
+    except SyntaxError:
+        raise MacroError(f"{where}: invalid expression '{expr}'")
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise MacroError(f"{where}: '{expr}' uses {type(node).__name__}, which is not allowed")
+        if isinstance(node, ast.Call) and (not isinstance(node.func, ast.Name)
+                                           or node.func.id not in _FUNCTIONS or node.keywords):
+            raise MacroError(f"{where}: only {', '.join(_FUNCTIONS)} can be called")
+    return expr
+
+
+def _format(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+# ------------------------------------------------------------------
+# Compiler
+# ------------------------------------------------------------------
+
+class _Compiler:
+    """
+    Builds the nested node lists of a program from script lines. With
+    strict=False (a file without directives) unknown `@word` lines and
+    `${...}` that is not an expression are kept as text.
+    """
+
+    def __init__(self, strict: bool = True):
+        self.strict = strict
+        self.macros: Dict[str, dict] = {}
+        self.sources: Dict[str, str] = {}
+
+    def compile_file(self, path: str, depth: int = 0) -> List[list]:
+        path = os.path.abspath(path)
+        if depth > MAX_DEPTH:
+            raise MacroError(f"{path}: includes nested more than {MAX_DEPTH} deep")
+        try:
+            with open(path, encoding='utf-8') as f:
+                text = f.read()
+        except (OSError, UnicodeDecodeError) as e:
+            raise MacroError(f"Could not read {path}: {e}")
+        self.sources[path] = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        return self.compile_text(text, path, depth)
+
+    def compile_text(self, text: str, path: str = '<script>', depth: int = 0) -> List[list]:
+        lines = text.splitlines()
+        body, index, closer = self._block(lines, 0, path, depth)
+        if closer is not None:
+            raise MacroError(f"{path}:{index}: @end without an open block")
+        return body
+
+    def _block(self, lines: List[str], index: int, path: str, depth: int,
+               opened: Optional[str] = None) -> Tuple[List[list], int, Optional[str]]:
+        """Compile lines until a matching @end; returns (nodes, next index, closer)"""
+        nodes: List[list] = []
+        while index < len(lines):
+            line = lines[index].strip()
+            index += 1
+            where = f"{path}:{index}"
+            if not line or is_comment(line):
+                continue
+            if not line.startswith('@') or not line[1:2].isalpha():
+                # `@@...` is a command starting with a literal `@`
+                nodes.append(self._template(line[1:] if self.strict and line.startswith('@@') else line, where))
+                continue
+
+            keyword, _, rest = line[1:].partition(' ')
+            rest = rest.strip()
+            if keyword == 'end':
+                if opened is None:
+                    raise MacroError(f"{where}: @end without an open block")
+                return nodes, index, 'end'
+            if keyword == 'set':
+                name, eq, expr = rest.partition('=')
+                name = name.strip()
+                if not eq or not _NAME.match(name):
+                    raise MacroError(f"{where}: expected @set NAME = EXPR")
+                nodes.append(['set', name, check_expression(expr, where)])
+            elif keyword == 'repeat':
+                nodes.append(self._repeat(rest, where) + [self._body(lines, index, path, depth, where)])
+                index = self._last_index
+            elif keyword == 'each':
+                nodes.append(self._each(rest, path, where) + [self._body(lines, index, path, depth, where)])
+                index = self._last_index
+            elif keyword == 'offset':
+                parts = rest.split()
+                if len(parts) != 2:
+                    raise MacroError(f"{where}: expected @offset DX DY")
+                dx, dy = (check_expression(p, where) for p in parts)
+                nodes.append(['offset', dx, dy, self._body(lines, index, path, depth, where)])
+                index = self._last_index
+            elif keyword == 'macro':
+                words = rest.split()
+                if not words or not all(_NAME.match(w) for w in words):
+                    raise MacroError(f"{where}: expected @macro NAME [PARAMS]")
+                body = self._body(lines, index, path, depth, where)
+                index = self._last_index
+                self.macros[words[0]] = {'params': words[1:], 'body': body}
+            elif keyword == 'call':
+                words = self._words(rest, where)
+                if not words or not _NAME.match(words[0]):
+                    raise MacroError(f"{where}: expected @call NAME [ARGS]")
+                nodes.append(['call', words[0], [self._template(w, where) for w in words[1:]], where])
+            elif keyword == 'include':
+                target = os.path.join(os.path.dirname(path), self._words(rest, where)[0]) if rest else ''
+                if not target:
+                    raise MacroError(f"{where}: expected @include PATH")
+                nodes.extend(self.compile_file(target, depth + 1))
+            elif not self.strict:
+                nodes.append(self._template(line, where))
+            else:
+                raise MacroError(f"{where}: unknown directive @{keyword} (write @@{keyword} for a literal @)")
+
+        if opened is not None:
+            raise MacroError(f"{path}: @{opened} is missing its @end")
+        return nodes, index, None
+
+    def _body(self, lines: List[str], index: int, path: str, depth: int, where: str) -> List[list]:
+        opened = lines[index - 1].strip()[1:].split(' ', 1)[0]
+        body, self._last_index, _ = self._block(lines, index, path, depth, opened)
+        return body
+
+    @staticmethod
+    def _words(text: str, where: str) -> List[str]:
+        try:
+            return shlex.split(text)
+        except ValueError as e:
+            raise MacroError(f"{where}: {e}")
+
+    def _repeat(self, rest: str, where: str) -> list:
+        match = _RANGE.match(rest)
+        if match:
+            step = match.group('step') or '1'
+            return ['repeat', match.group('var'), check_expression(match.group('start'), where),
+                    check_expression(match.group('stop'), where), check_expression(step, where)]
+        if rest:
+            return ['repeat', None, '0', check_expression(rest, where), '1']
+        raise MacroError(f"{where}: expected @repeat COUNT or @repeat VAR A..B [step S]")
+
+    def _each(self, rest: str, path: str, where: str) -> list:
+        var, _, values = rest.partition(' in ')
+        var = var.strip()
+        values = values.strip()
+        if not _NAME.match(var) or not values:
+            raise MacroError(f"{where}: expected @each VAR in VALUES or @each VAR in lines PATH")
+        if values == 'lines' or values.startswith('lines '):
+            target = self._words(values[6:], where)
+            if not target:
+                raise MacroError(f"{where}: @each {var} in lines needs a file path")
+            return ['lines', var, os.path.join(os.path.dirname(path), target[0])]
+        return ['each', var, [check_expression(v, where) for v in self._split_values(values)]]
+
+    @staticmethod
+    def _split_values(values: str) -> List[str]:
+        """Split on commas outside quotes and parentheses"""
+        parts, depth, quote, current = [], 0, None, ''
+        for ch in values:
+            if quote:
+                quote = None if ch == quote else quote
+            elif ch in '"\'':
+                quote = ch
+            elif ch == '(':
+                depth += 1
+            elif ch == ')':
+                depth -= 1
+            elif ch == ',' and depth == 0:
+                parts.append(current)
+                current = ''
+                continue
+            current += ch
+        return parts + [current]
+
+    def _template(self, text: str, where: str) -> list:
+        """['cmd', text] for a literal, ['tmpl', parts] with expressions at odd indexes"""
+        parts = _SUBST.split(text) if '${' in text else [text]
+        kept = [parts[0]]
+        for i in range(1, len(parts), 2):
+            try:
+                kept += [check_expression(parts[i], where), parts[i + 1]]
+            except MacroError:
+                if self.strict:
+                    raise
+                kept[-1] += f"${{{parts[i]}}}{parts[i + 1]}"
+        if self.strict:
+            kept[::2] = [part.replace('$${', '${') for part in kept[::2]]
+        if len(kept) == 1:
+            return ['cmd', kept[0]]
+        return ['tmpl', kept]
+
+
+def compile_text(text: str, path: str = '<script>') -> 'Program':
+    """Compile script text (includes are resolved relative to `path`)"""
+    compiler = _Compiler()
+    body = compiler.compile_text(text, os.path.abspath(path) if path != '<script>' else path)
+    return Program({'version': FORMAT_VERSION, 'sources': compiler.sources,
+                    'macros': compiler.macros, 'body': body})
+
+
+def compile_file(path: str, cache_dir: Optional[str] = DEFAULT_CACHE_DIR) -> 'Program':
+    """
+    Compile a script file, reusing the cached compiled form when the file
+    and everything it includes are unchanged. cache_dir=None disables the cache.
+    """
+    path = os.path.abspath(path)
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError as e:
+        raise MacroError(f"Could not read {path}: {e}")
+    strict = _DIRECTIVE_LINE.search(data) is not None
+    if not strict and b'${' not in data:
+        # A plain command file: nothing to compile, read it as it runs
+        return Program({'version': FORMAT_VERSION, 'sources': {}, 'macros': {}, 'body': [['file', path]]})
+
+    key = hashlib.sha256(b'%d\0%s\0' % (FORMAT_VERSION, path.encode('utf-8')) + data).hexdigest()
+    cached = os.path.join(os.path.expanduser(cache_dir), f"{key}.json") if cache_dir else None
+
+    if cached:
+        program = _load_cached(cached)
+        if program is not None:
+            return program
+
+    compiler = _Compiler(strict)
+    body = compiler.compile_file(path)
+    program = Program({'version': FORMAT_VERSION, 'sources': compiler.sources,
+                       'macros': compiler.macros, 'body': body, 'lenient': not strict})
+    if cached:
+        try:
+            os.makedirs(os.path.dirname(cached), exist_ok=True)
+            tmp = f"{cached}.{os.getpid()}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(program.data, f, separators=(',', ':'))
+            os.replace(tmp, cached)
+        except OSError:
+            pass  # The cache is an optimisation only
+    return program
+
+
+def _load_cached(cached: str) -> Optional['Program']:
+    try:
+        with open(cached, encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get('version') != FORMAT_VERSION:
+        return None
+    # Included files are part of the program but not of the cache key
+    for source, digest in data.get('sources', {}).items():
+        try:
+            with open(source, 'rb') as f:
+                if hashlib.sha256(f.read()).hexdigest() != digest:
+                    return None
+        except OSError:
+            return None
+    return Program(data)
+
+
+# ------------------------------------------------------------------
+# Expansion
+# ------------------------------------------------------------------
+
+class Program:
+    """A compiled script; expand() yields its command lines lazily"""
+
+    def __init__(self, data: dict):
+        self.data = data
+        self._code: Dict[str, object] = {}
+
+    @property
+    def macros(self) -> List[str]:
+        return sorted(self.data['macros'])
+
+    def expand(self, variables: Optional[Dict[str, object]] = None) -> Iterator[str]:
+        """Command lines, generated as they are consumed"""
+        env = dict(variables or {})
+        return self._run(self.data['body'], env, 0, 0, 0)
+
+    def _eval(self, expr: str, env: dict):
+        code = self._code.get(expr)
+        if code is None:
+            code = self._code[expr] = compile(expr, '<macro>', 'eval')
+        try:
+            return eval(code, {'__builtins__': {}, **_FUNCTIONS}, env)
+        except NameError as e:
+            raise MacroError(f"Undefined variable in '{expr}': {e}")
+        except (TypeError, ValueError, ZeroDivisionError) as e:
+            raise MacroError(f"Cannot evaluate '{expr}': {e}")
+
+    def _render(self, parts: list, env: dict) -> str:
+        return ''.join(part if i % 2 == 0 else self._value(part, env)
+                       for i, part in enumerate(parts))
+
+    def _value(self, expr: str, env: dict) -> str:
+        if self.data.get('lenient') and _NAME.match(expr) and expr not in env and expr not in _FUNCTIONS:
+            return f"${{{expr}}}"  # e.g. a shell variable typed by an old command file
+        return _format(self._eval(expr, env))
+
+    def _run(self, nodes: List[list], env: dict, dx: int, dy: int, depth: int) -> Iterator[str]:
+        for node in nodes:
+            kind = node[0]
+            if kind == 'cmd':
+                yield shift(node[1], dx, dy) if dx or dy else node[1]
+            elif kind == 'tmpl':
+                line = self._render(node[1], env)
+                yield shift(line, dx, dy) if dx or dy else line
+            elif kind == 'set':
+                env[node[1]] = self._eval(node[2], env)
+            elif kind == 'repeat':
+                _, var, start, stop, step, body = node
+                start, stop, step = (self._eval(e, env) for e in (start, stop, step))
+                if not all(isinstance(v, int) for v in (start, stop, step)) or step == 0:
+                    raise MacroError(f"@repeat needs integer bounds and a non-zero step, got {start}..{stop} step {step}")
+                for value in range(start, stop, step):
+                    if var:
+                        env[var] = value
+                    yield from self._run(body, env, dx, dy, depth)
+            elif kind == 'each':
+                _, var, values, body = node
+                for expr in values:
+                    env[var] = self._eval(expr, env)
+                    yield from self._run(body, env, dx, dy, depth)
+            elif kind == 'lines':
+                _, var, path, body = node
+                try:
+                    with open(path, encoding='utf-8') as f:
+                        for value in f:
+                            env[var] = value.rstrip('\r\n')
+                            yield from self._run(body, env, dx, dy, depth)
+                except (OSError, UnicodeDecodeError) as e:
+                    raise MacroError(f"Could not read {path}: {e}")
+            elif kind == 'file':
+                try:
+                    with open(node[1], encoding='utf-8') as f:
+                        for line in f:
+                            line = line.strip()
+                            if line and not is_comment(line):
+                                yield shift(line, dx, dy) if dx or dy else line
+                except (OSError, UnicodeDecodeError) as e:
+                    raise MacroError(f"Could not read {node[1]}: {e}")
+            elif kind == 'offset':
+                ox, oy = self._eval(node[1], env), self._eval(node[2], env)
+                yield from self._run(node[3], env, dx + int(ox), dy + int(oy), depth)
+            elif kind == 'call':
+                yield from self._call(node, env, dx, dy, depth)
+
+    def _call(self, node: list, env: dict, dx: int, dy: int, depth: int) -> Iterator[str]:
+        _, name, args, where = node
+        macro = self.data['macros'].get(name)
+        if macro is None:
+            raise MacroError(f"{where}: unknown macro '{name}'")
+        if len(args) != len(macro['params']):
+            raise MacroError(f"{where}: {name} takes {len(macro['params'])} argument(s), got {len(args)}")
+        if depth >= MAX_DEPTH:
+            raise MacroError(f"{where}: macros nested more than {MAX_DEPTH} deep")
+        local = dict(env)
+        for param, arg in zip(macro['params'], args):
+            value = arg[1] if arg[0] == 'cmd' else self._render(arg[1], env)
+            local[param] = int(value) if value.lstrip('-').isdecimal() else value
+        yield from self._run(macro['body'], local, dx, dy, depth + 1)
+
+
+def shift(line: str, dx: int, dy: int) -> str:
+    """Move the coordinates of a mouse command (and a drag's target) by (dx, dy)"""
+    command = default_parser.parse(line)
+    if command.kind != 'mouse' or command.x is None:
+        return line
+    tokens = command.processed.split()
+    tokens[0] = str(command.x + dx)
+    tokens[1] = str(command.y + dy)
+    if command.x2 is not None and command.y2 is not None:
+        tokens[3] = str(command.x2 + dx)
+        tokens[4] = str(command.y2 + dy)
+    return ' '.join(tokens)
+
+
+def parse_variables(specs: Iterable[str]) -> Dict[str, object]:
+    """['NAME=VALUE', ...] from the command line; integer-looking values become ints"""
+    variables: Dict[str, object] = {}
+    for spec in specs:
+        name, eq, value = spec.partition('=')
+        if not eq or not _NAME.match(name.strip()):
+            raise MacroError(f"Invalid variable '{spec}' (expected NAME=VALUE)")
+        value = value.strip()
+        variables[name.strip()] = int(value) if value.lstrip('-').isdecimal() else value
+    return variables
+
+
+# ------------------------------------------------------------------
+# Execution
+# ------------------------------------------------------------------
+
+def execute(controller, commands: Iterable[str], delay: Optional[float] = None,
+            chunk_size: int = 1024) -> dict:
+    """
+    Run a (possibly endless) stream of command lines as one
+    controller.batch_mode batch, read `chunk_size` lines at a time, over
+    whatever transport and protocol the controller uses. Returns its report.
+    """
+    return controller.batch_mode(iter(commands), delay, window=chunk_size)
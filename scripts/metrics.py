@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+Actuation Metrics
+Per-command timing spans broken into phases (channel open, remote write,
+exit status, settle sleeps, batch delays...), counters by action, and
+HDR-style latency histograms with percentiles. Exports JSON or
+Prometheus text and calls user hooks for every finished span.
+"""
+
+import json
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Percentiles reported by snapshots and exports
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Histogram resolution: values below 2**SUB_BITS microseconds are exact,
+# larger ones fall in buckets at most 1/2**(SUB_BITS-1) wide (~1.6%)
+SUB_BITS = 7
+_SUB_COUNT = 1 << SUB_BITS
+_HALF_COUNT = _SUB_COUNT >> 1
+
+
+def _bucket_high(index: int) -> int:
+    """Largest value that falls in a bucket"""
+    if index < _SUB_COUNT:
+        return index
+    shift, top = divmod(index - _SUB_COUNT, _HALF_COUNT)
+    shift += 1
+    return ((top + _HALF_COUNT + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """
+    Log-linear latency histogram (HDR-style): constant relative error,
+    O(1) recording, memory bounded by the range of values seen.
+    Values are recorded in seconds and stored as microseconds.
+    """
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        # Bucket index of the value in microseconds (_bucket_high is the inverse)
+        value = int(seconds * 1e6)
+        if value < _SUB_COUNT:
+            index = value if value > 0 else 0
+        else:
+            shift = value.bit_length() - SUB_BITS
+            index = _SUB_COUNT + (shift - 1) * _HALF_COUNT + (value >> shift) - _HALF_COUNT
+        counts = self.counts
+        counts[index] = counts.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other: 'LatencyHistogram'):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q: float) -> float:
+        """Value (seconds) at quantile `q`, reported as its bucket's upper bound"""
+        if not self.count:
+            return 0.0
+        rank = max(1, round(q * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(_bucket_high(index) / 1e6, self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        stats = {
+            'count': self.count,
+            'sum': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'min': self.min if self.count else 0.0,
+            'max': self.max,
+        }
+        for q in QUANTILES:
+            stats[f"p{q * 100:g}"] = self.percentile(q)
+        return stats
+
+
+class _Phase:
+    """Times one phase of a span; time spent in nested phases is excluded"""
+
+    __slots__ = ('span', 'name', 'start', 'child')
+
+    def __init__(self, span: 'Span', name: str):
+        self.span = span
+        self.name = name
+
+    def __enter__(self):
+        self.child = 0.0
+        self.span._open.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        span = self.span
+        span._open.pop()
+        phases = span.phases
+        phases[self.name] = phases.get(self.name, 0.0) + elapsed - self.child
+        if span._open:
+            span._open[-1].child += elapsed
+        return False
+
+
+class _NullContext:
+    """Stand-in for phases and spans when nothing is being measured"""
+
+    ok = True
+    error = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def phase(self, name: str) -> '_NullContext':
+        return self
+
+    def label(self, **labels):
+        pass
+
+    def describe(self, detail: str):
+        pass
+
+
+_NULL = _NullContext()
+
+
+class Span:
+    """
+    One timed operation, e.g. a single command or a batch.
+
+    `phases` maps phase name to seconds spent in it (exclusive of nested
+    phases); spans nested inside it count as a phase named after them, and
+    whatever is not covered by a phase is reported as 'other'.
+    Set `ok` to False to count the operation as failed without raising.
+    `detail` is free text for hooks and logs (e.g. the command), never a label.
+    """
+
+    __slots__ = ('metrics', 'name', 'labels', 'wall_start', 'start', 'duration',
+                 'phases', 'ok', 'error', 'detail', '_open')
+
+    def __init__(self, metrics: 'Metrics', name: str, labels: Dict[str, str]):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.phases: Dict[str, float] = {}
+        self.ok = True
+        self.error: Optional[str] = None
+        self.detail: Optional[str] = None
+        self.duration = 0.0
+        self._open: List[_Phase] = []
+
+    def phase(self, name: str) -> _Phase:
+        return _Phase(self, name)
+
+    def label(self, **labels):
+        """Add labels once they are known (e.g. the action after parsing)"""
+        self.labels.update(labels)
+
+    def describe(self, detail: str):
+        """Say what this span is doing, for hooks (not aggregated)"""
+        self.detail = detail
+
+    def __enter__(self) -> 'Span':
+        self.metrics._stack().append(self)
+        self.wall_start = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        if exc is not None:
+            self.ok = False
+            self.error = f"{exc_type.__name__}: {exc}"
+        stack = self.metrics._stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        if stack:
+            # Nested operations count as a phase of the enclosing one
+            parent = stack[-1]
+            parent.phases[self.name] = parent.phases.get(self.name, 0.0) + self.duration
+            if parent._open:
+                parent._open[-1].child += self.duration
+        self.metrics._finish(self)
+        return False
+
+    def as_dict(self) -> dict:
+        """Plain representation for tracing hooks and logs"""
+        phases = dict(self.phases)
+        other = self.duration - sum(phases.values())
+        if other > 0:
+            phases['other'] = other
+        return {
+            'span': self.name,
+            'labels': dict(self.labels),
+            'start': self.wall_start,
+            'duration': self.duration,
+            'phases': phases,
+            'ok': self.ok,
+            'error': self.error,
+            'detail': self.detail,
+        }
+
+
+class Metrics:
+    """
+    Collects spans, counters and histograms for one controller.
+
+    `span(name, **labels)` times an operation; inside it, `phase(name)`
+    (on the span, or on this object from deeper code running on the same
+    thread) attributes time to a phase. Hooks receive each finished Span.
+    """
+
+    def __init__(self, enabled: bool = True, labels: Optional[Dict[str, str]] = None):
+        self.enabled = enabled
+        self.labels = dict(labels or {})
+        self.started = time.time()
+        self.counters: Dict[Tuple[str, Tuple], float] = {}
+        self.histograms: Dict[Tuple[str, Tuple], LatencyHistogram] = {}
+        self.hooks: List[Callable[[Span], None]] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def span(self, name: str, **labels):
+        """Context manager timing one operation"""
+        if not self.enabled:
+            return _NULL
+        return Span(self, name, labels)
+
+    def phase(self, name: str):
+        """Attribute time to a phase of the innermost active span on this thread"""
+        if not self.enabled:
+            return _NULL
+        stack = getattr(self._local, 'stack', None)
+        if not stack:
+            return _NULL
+        return _Phase(stack[-1], name)
+
+    def current(self) -> Optional[Span]:
+        """Innermost active span on this thread"""
+        stack = getattr(self._local, 'stack', None)
+        return stack[-1] if stack else None
+
+    def increment(self, name: str, value: float = 1, **labels):
+        """Add to a counter"""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        """Record a latency in a histogram"""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._observe(key, seconds)
+
+    def _observe(self, key: Tuple[str, Tuple], seconds: float):
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = LatencyHistogram()
+        histogram.record(seconds)
+
+    def add_hook(self, hook: Callable[[Span], None]):
+        """Call `hook(span)` for every finished span (e.g. to forward to a tracer)"""
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook: Callable[[Span], None]):
+        self.hooks.remove(hook)
+
+    def _finish(self, span: Span):
+        labels = tuple(sorted(span.labels.items()))
+        result = 'ok' if span.ok else 'error'
+        with self._lock:
+            self._observe(('span_seconds', (('span', span.name),) + labels), span.duration)
+            key = ('spans_total', (('span', span.name),) + labels + (('result', result),))
+            self.counters[key] = self.counters.get(key, 0) + 1
+            other = span.duration
+            for phase, seconds in span.phases.items():
+                self._observe(('phase_seconds', (('phase', phase), ('span', span.name))), seconds)
+                other -= seconds
+            if span.phases and other > 0:
+                self._observe(('phase_seconds', (('phase', 'other'), ('span', span.name))), other)
+        for hook in list(self.hooks):
+            try:
+                hook(span)
+            except Exception as e:
+                print(f"[!] Metrics hook {getattr(hook, '__name__', hook)!r} failed: {e}")
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.started = time.time()
+
+    def snapshot(self) -> dict:
+        """All counters and histogram summaries as plain data"""
+        with self._lock:
+            counters = [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(self.counters.items())
+            ]
+            histograms = [
+                dict({'name': name, 'labels': dict(labels)}, **histogram.summary())
+                for (name, labels), histogram in sorted(self.histograms.items())
+            ]
+        return {
+            'labels': dict(self.labels),
+            'since': self.started,
+            'uptime': time.time() - self.started,
+            'counters': counters,
+            'histograms': histograms,
+        }
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self, prefix: str = 'wac') -> str:
+        return prometheus_text([self], prefix)
+
+
+# Help text for exported metric families
+_HELP = {
+    'span_seconds': 'Duration of timed operations',
+    'phase_seconds': 'Time spent in each phase of an operation',
+    'spans_total': 'Timed operations by result',
+    'commands_total': 'Commands sent, by device, action and result',
+    'eliminated_total': 'Commands removed by the path optimizer',
+}
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _label_text(labels: Iterable[Tuple[str, object]]) -> str:
+    return ','.join(f'{k}="{_escape(v)}"' for k, v in labels)
+
+
+def prometheus_text(collectors: Iterable[Metrics], prefix: str = 'wac') -> str:
+    """
+    Prometheus text exposition for one or more controllers' metrics;
+    each controller's own labels (e.g. vm) are added to its series.
+    Histograms are exported as summaries with p50/p95/p99 quantiles.
+    """
+    families: Dict[str, List[str]] = {}
+    kinds: Dict[str, str] = {}
+
+    for metrics in collectors:
+        base = tuple(sorted(metrics.labels.items()))
+        with metrics._lock:
+            counters = sorted(metrics.counters.items())
+            histograms = [(key, h.summary()) for key, h in sorted(metrics.histograms.items())]
+
+        for (name, labels), value in counters:
+            family = f"{prefix}_{name}"
+            kinds[family] = 'counter'
+            families.setdefault(family, []).append(
+                f"{family}{{{_label_text(base + labels)}}} "
+                f"{value if isinstance(value, int) else repr(float(value))}")
+
+        for (name, labels), stats in histograms:
+            family = f"{prefix}_{name}"
+            kinds[family] = 'summary'
+            lines = families.setdefault(family, [])
+            for q in QUANTILES:
+                quantile = base + labels + (('quantile', f"{q:g}"),)
+                lines.append(f"{family}{{{_label_text(quantile)}}} {stats[f'p{q * 100:g}']:.6f}")
+            lines.append(f"{family}_sum{{{_label_text(base + labels)}}} {stats['sum']:.6f}")
+            lines.append(f"{family}_count{{{_label_text(base + labels)}}} {stats['count']}")
+
+    out = []
+    for family in sorted(families):
+        name = family[len(prefix) + 1:]
+        out.append(f"# HELP {family} {_HELP.get(name, name)}")
+        out.append(f"# TYPE {family} {kinds[family]}")
+        out.extend(families[family])
+    return '\n'.join(out) + '\n'
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Mouse Path Optimizer
+Optional stage between command classification and sending that removes
+mouse moves which do not change the outcome of a script: `here move`
+no-ops, repeated positions, and runs of moves whose intermediate points
+do not matter. Clicks, holds, releases, drags, scrolls and keyboard
+commands are always kept exactly, in their original order.
+"""
+
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from command_parser import Action, Command, default_parser
+
+# Optimizer modes
+FINAL = 'final'   # only where a run of moves ends matters
+PATH = 'path'     # the shape of the path matters, within a tolerance
+
+Point = Tuple[int, int]
+
+# Longest run of moves held back while streaming before part of it is sent
+MAX_RUN = 4096
+
+
+def simplify_path(points: List[Point], tolerance: float) -> List[int]:
+    """
+    Ramer-Douglas-Peucker: indices of the points to keep so that no
+    dropped point is further than `tolerance` pixels from the simplified
+    path. The first and last points are always kept.
+    """
+    count = len(points)
+    if count < 3:
+        return list(range(count))
+
+    keep = [False] * count
+    keep[0] = keep[-1] = True
+    stack = [(0, count - 1)]
+    limit = tolerance * tolerance
+    while stack:
+        first, last = stack.pop()
+        x1, y1 = points[first]
+        x2, y2 = points[last]
+        dx = x2 - x1
+        dy = y2 - y1
+        length2 = dx * dx + dy * dy
+        worst = -1.0
+        worst_index = first
+        for i in range(first + 1, last):
+            px, py = points[i]
+            if length2:
+                cross = dx * (py - y1) - dy * (px - x1)
+                distance2 = cross * cross / length2
+            else:
+                distance2 = (px - x1) ** 2 + (py - y1) ** 2
+            if distance2 > worst:
+                worst = distance2
+                worst_index = i
+        if worst > limit:
+            keep[worst_index] = True
+            stack.append((first, worst_index))
+            stack.append((worst_index, last))
+
+    return [i for i in range(count) if keep[i]]
+
+
+class PathOptimizer:
+    """
+    Removes redundant mouse moves from a script.
+
+    mode = 'final': a run of `x y move` lines collapses to its last
+        position, and disappears entirely when the next mouse command
+        carries its own coordinates (the watcher moves there first).
+    mode = 'path':  runs are simplified with Ramer-Douglas-Peucker so the
+        pointer stays within `tolerance` pixels of the original path.
+
+    While a button is held (between `hold` and `release`), runs are always
+    simplified as in 'path' mode, so drag-and-drop paths keep their shape.
+    """
+
+    MODES = {FINAL, PATH}
+
+    def __init__(self, mode: str = FINAL, tolerance: float = 2.0):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown optimizer mode '{mode}' (expected one of {sorted(self.MODES)})")
+        if tolerance < 0:
+            raise ValueError("Path tolerance must not be negative")
+        self.mode = mode
+        self.tolerance = tolerance
+
+    def optimize(self, commands: List[str]) -> Tuple[List[str], dict]:
+        """
+        Optimize a script. Returns the processed command lines to send
+        (invalid lines are passed through for the caller to report) and a
+        report of what was eliminated.
+        """
+        report = self.new_report()
+        output = list(self.stream(commands, report))
+        return output, report
+
+    @staticmethod
+    def new_report() -> dict:
+        """Empty report, filled in by stream()"""
+        return {
+            'input': 0,
+            'output': 0,
+            'eliminated': 0,
+            'here_moves': 0,
+            'duplicates': 0,
+            'merged': 0,
+            'simplified': 0,
+        }
+
+    def stream(self, commands: Iterable[str], report: Optional[dict] = None) -> Iterator[str]:
+        """
+        optimize() for a stream of any length: yields each line to send once
+        it is decided, keeping the pointer position and held button across
+        the whole stream. `report` is complete when the stream is exhausted.
+        """
+        report = self.new_report() if report is None else report
+        output: List[str] = []
+        run: List[Command] = []
+        position: Optional[Point] = None
+        held = False
+
+        for raw in commands:
+            line = raw.strip()
+            if not line:
+                continue
+            report['input'] += 1
+            cmd = default_parser.parse(line)
+
+            if cmd.kind == 'mouse' and cmd.action is Action.MOVE:
+                if cmd.x is None:
+                    # `here move` does nothing
+                    report['here_moves'] += 1
+                    continue
+                run.append(cmd)
+                if len(run) >= MAX_RUN:
+                    position = self._flush(run, None, position, held, output, report)
+                    run = []
+                    yield from output
+                    output.clear()
+                continue
+
+            if run:
+                position = self._flush(run, cmd, position, held, output, report)
+                run = []
+                yield from output
+                output.clear()
+
+            report['output'] += 1
+            yield cmd.processed if cmd.kind != 'invalid' else line
+            if cmd.kind == 'mouse':
+                if cmd.x is not None:
+                    position = (cmd.x, cmd.y)
+                if cmd.action is Action.DRAG and cmd.x2 is not None:
+                    position = (cmd.x2, cmd.y2)
+                elif cmd.action is Action.HOLD:
+                    held = True
+                elif cmd.action is Action.RELEASE:
+                    held = False
+
+        if run:
+            self._flush(run, None, position, held, output, report)
+            yield from output
+        report['eliminated'] = report['input'] - report['output']
+
+    def _flush(self, run: List[Command], following: Optional[Command], position: Optional[Point],
+               held: bool, output: List[str], report: dict) -> Optional[Point]:
+        """Emit what is left of a run of moves; returns the new pointer position"""
+        moves: List[Command] = []
+        last = position
+        for cmd in run:
+            point = (cmd.x, cmd.y)
+            if point == last:
+                report['duplicates'] += 1
+                continue
+            moves.append(cmd)
+            last = point
+        if not moves:
+            return position
+
+        if self.mode == FINAL and not held:
+            if (following is not None and following.kind == 'mouse'
+                    and following.x is not None):
+                # The next command moves the pointer itself
+                report['merged'] += len(moves)
+                return last
+            report['merged'] += len(moves) - 1
+            report['output'] += 1
+            output.append(moves[-1].processed)
+            return last
+
+        # Anchor the simplification at the current position, when known,
+        # so the first move can be dropped too
+        points = [(cmd.x, cmd.y) for cmd in moves]
+        anchored = position is not None
+        if anchored:
+            points.insert(0, position)
+        kept = simplify_path(points, self.tolerance)
+        if anchored:
+            kept = [i - 1 for i in kept if i > 0]
+        report['simplified'] += len(moves) - len(kept)
+        report['output'] += len(kept)
+        output.extend(moves[i].processed for i in kept)
+        return last
+
+    def is_redundant(self, cmd: Command, position: Optional[Point]) -> bool:
+        """
+        For commands sent one at a time: True for moves that cannot change
+        anything (`here move`, or a move to where the pointer already is).
+        """
+        if cmd.kind != 'mouse' or cmd.action is not Action.MOVE:
+            return False
+        return cmd.x is None or (cmd.x, cmd.y) == position
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Release Downloads
+Fetches release archives for `update` into a local cache shared by every
+user of the machine (or a network share, with $WAC_UPDATE_CACHE), so a
+fleet of clients pulls each release once:
+
+- Downloads resume where they stopped: progress is kept next to the
+  partial file and continued with HTTP Range requests, across dropped
+  connections and across runs.
+- When the server accepts ranges, large files are fetched as several
+  ranges in parallel.
+- Archives are checked against the SHA-256 published with the release
+  before they enter the cache, and cached copies again before reuse. An
+  archive without a published checksum is never cached.
+- Only the needed file is extracted, streamed from its zip member.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+import requests
+
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join('~', '.cache'),
+                                 'windows-actuation', 'releases')
+
+# Read and write buffer (the old loop used 8 KB)
+BUFFER_SIZE = 1 << 20
+
+# Files at least this large are fetched as parallel ranges, when the server allows it
+PARALLEL_MIN_SIZE = 8 << 20
+DEFAULT_CONNECTIONS = 4
+
+# Attempts per range without progress before giving up, and the longest pause between them
+MAX_ATTEMPTS = 5
+MAX_BACKOFF = 8.0
+
+# Progress is saved after this many bytes, so a crash loses at most this much per range
+SAVE_EVERY = 2 << 20
+
+# Checksum files looked for among the release assets, besides <archive>.sha256
+CHECKSUM_ASSETS = ('SHA256SUMS', 'SHA256SUMS.txt', 'checksums.txt')
+
+
+class DownloadError(Exception):
+    """Raised when a release cannot be downloaded, verified or extracted"""
+
+
+def parse_checksums(text: str, file_name: str) -> Optional[str]:
+    """
+    SHA-256 for `file_name` from a checksum file: `sha256sum` lines
+    ("<hex>  <name>" or "<hex> *<name>"), or a lone digest.
+    """
+    lines = [line.split() for line in text.splitlines() if line.strip()]
+    for words in lines:
+        if len(words) >= 2 and os.path.basename(words[-1].lstrip('*')) == file_name:
+            return words[0].lower()
+    if len(lines) == 1 and len(lines[0]) == 1 and len(lines[0][0]) == 64:
+        return lines[0][0].lower()
+    return None
+
+
+def published_checksum(release: dict, file_name: str, timeout: float = 10.0) -> Optional[str]:
+    """
+    SHA-256 of a release asset, from GitHub's `digest` field or a checksum
+    asset of the same release. None when the release publishes none.
+    """
+    assets = {asset['name']: asset for asset in release.get('assets', [])}
+    digest = str(assets.get(file_name, {}).get('digest') or '')
+    if digest.startswith('sha256:'):
+        return digest[len('sha256:'):].lower()
+    for name in (f"{file_name}.sha256",) + CHECKSUM_ASSETS:
+        if name in assets:
+            response = requests.get(assets[name]['browser_download_url'], timeout=timeout)
+            response.raise_for_status()
+            found = parse_checksums(response.text, file_name)
+            if found:
+                return found
+    return None
+
+
+def sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(BUFFER_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@contextlib.contextmanager
+def _locked(path: str):
+    """Exclusive lock on `path` across processes, so one of them downloads and the rest reuse it"""
+    with open(path, 'a+b') as f:
+        if os.name == 'nt':
+            import msvcrt
+            while True:
+                try:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass  # LK_LOCK gives up after ten seconds; keep waiting
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class _Transfer:
+    """
+    One download into `part`, as ranges [start, end) with bytes done in
+    each. The ranges and progress are saved to `part`.json, so a later
+    run with the same file on the server continues from there.
+    """
+
+    def __init__(self, url: str, part: str, size: Optional[int], validator: Optional[str],
+                 accept_ranges: bool, connections: int, timeout: float,
+                 progress: Optional[Callable[[int, Optional[int]], None]]):
+        self.url = url
+        self.part = part
+        self.state_path = part + '.json'
+        self.size = size
+        self.validator = validator
+        self.accept_ranges = accept_ranges
+        self.timeout = timeout
+        self.progress = progress
+        self.ranges: List[List[Optional[int]]] = []
+        # Bytes of each range known to be on disk; only these are saved
+        self.saved: List[int] = []
+        self.resumed = 0
+        self._lock = threading.Lock()
+        self._failed = threading.Event()
+
+        if self._resume():
+            return
+        # Fresh start
+        count = connections if accept_ranges and size and size >= PARALLEL_MIN_SIZE else 1
+        step = -(-size // count) if size else None
+        self.ranges = [[i * step, min(size, (i + 1) * step), 0] for i in range(count)] if step else [[0, size, 0]]
+        self.saved = [0] * len(self.ranges)
+        with open(self.part, 'wb') as f:
+            if size:
+                f.truncate(size)
+        self._save()
+
+    def _resume(self) -> bool:
+        """Take up saved progress if it is for this same file; False to start over"""
+        if not self.accept_ranges or not os.path.exists(self.part):
+            return False
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if (state.get('url') != self.url or state.get('size') != self.size
+                or state.get('validator') != self.validator or not state.get('ranges')):
+            return False
+        self.ranges = state['ranges']
+        self.saved = [r[2] for r in self.ranges]
+        self.resumed = self.done()
+        return True
+
+    def _save(self):
+        ranges = [[start, end, saved] for (start, end, _), saved in zip(self.ranges, self.saved)]
+        state = {'url': self.url, 'size': self.size, 'validator': self.validator, 'ranges': ranges}
+        tmp = f"{self.state_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_path)
+
+    def _persist(self, index: int, f):
+        """Get range `index` onto disk, then save its progress up to there"""
+        written = self.ranges[index][2]
+        f.flush()
+        os.fsync(f.fileno())
+        with self._lock:
+            self.saved[index] = written
+            self._save()
+
+    def done(self) -> int:
+        return sum(r[2] for r in self.ranges)
+
+    def run(self):
+        if len(self.ranges) == 1:
+            self._fetch(0)
+            return
+        with ThreadPoolExecutor(len(self.ranges), thread_name_prefix='download') as pool:
+            futures = [pool.submit(self._fetch, i) for i in range(len(self.ranges))]
+            for future in futures:
+                future.result()
+
+    def _fetch(self, index: int):
+        """Download one range, resuming after dropped connections"""
+        span = self.ranges[index]
+        start, end, _ = span
+        attempts = 0
+        with requests.Session() as session, open(self.part, 'r+b') as f:
+            while end is None or span[2] < end - start:
+                if self._failed.is_set():
+                    return
+                position = start + span[2]
+                headers = {}
+                if position > 0 or end != self.size:
+                    if not self.accept_ranges:
+                        position = span[2] = 0
+                        f.truncate(0)
+                        self._persist(index, f)
+                    else:
+                        headers['Range'] = f"bytes={position}-{'' if end is None else end - 1}"
+                before = span[2]
+                try:
+                    with session.get(self.url, headers=headers, stream=True, timeout=self.timeout) as response:
+                        response.raise_for_status()
+                        if headers and response.status_code != 206:
+                            # Range ignored: only a whole-file single download can use the reply
+                            if len(self.ranges) > 1:
+                                raise DownloadError(f"Server stopped honouring ranges for {self.url}")
+                            position = span[2] = 0
+                            f.truncate(0)
+                            self._persist(index, f)
+                        f.seek(position)
+                        unsaved = 0
+                        for block in response.iter_content(BUFFER_SIZE):
+                            if self._failed.is_set():
+                                return
+                            f.write(block)
+                            with self._lock:
+                                span[2] += len(block)
+                            unsaved += len(block)
+                            if unsaved >= SAVE_EVERY:
+                                self._persist(index, f)
+                                unsaved = 0
+                            if self.progress:
+                                self.progress(self.done(), self.size)
+                    if end is None:
+                        break  # length unknown: a clean end of stream is the end of the file
+                except (requests.ConnectionError, requests.Timeout,
+                        requests.exceptions.ChunkedEncodingError) as e:
+                    error = e
+                except (requests.RequestException, DownloadError) as e:
+                    self._failed.set()
+                    raise DownloadError(str(e))
+                else:
+                    error = None
+                finally:
+                    self._persist(index, f)
+
+                # Dropped (or cut short without an error): back off, unless it got somewhere
+                attempts = 0 if span[2] > before else attempts + 1
+                if attempts >= MAX_ATTEMPTS:
+                    self._failed.set()
+                    raise DownloadError(f"Download keeps failing at byte {start + span[2]}: "
+                                        f"{error or 'connection closed early'}")
+                if attempts:
+                    time.sleep(min(MAX_BACKOFF, 0.5 * 2 ** (attempts - 1)))
+
+
+def probe(url: str, timeout: float = 30.0) -> Tuple[Optional[int], bool, Optional[str]]:
+    """(size, accepts ranges, validator) of a download, following redirects; unknowns are None/False"""
+    try:
+        response = requests.head(url, allow_redirects=True, timeout=timeout)
+        response.raise_for_status()
+    except requests.RequestException:
+        return None, False, None
+    length = response.headers.get('Content-Length')
+    size = int(length) if length and length.isdigit() else None
+    accept_ranges = response.headers.get('Accept-Ranges', '').lower() == 'bytes' and size is not None
+    return size, accept_ranges, response.headers.get('ETag') or response.headers.get('Last-Modified')
+
+
+def fetch(url: str, file_name: str, sha256: Optional[str] = None, cache_dir: Optional[str] = None,
+          connections: int = DEFAULT_CONNECTIONS, timeout: float = 30.0,
+          progress: Optional[Callable[[int, Optional[int]], None]] = None) -> str:
+    """
+    Path of `file_name` in the cache, downloading it from `url` first when
+    it is missing (or does not match `sha256`). Interrupted downloads
+    continue where they stopped. Raises DownloadError.
+
+    Without `sha256` nothing vouches for the file, so it never enters or
+    comes from the cache: it is downloaded into a new temporary directory,
+    which the caller removes (it is removed here if the download fails).
+    """
+    if sha256:
+        return _fetch_into(os.path.expanduser(cache_dir or DEFAULT_CACHE_DIR), url, file_name,
+                           sha256.lower(), connections, timeout, progress)
+    scratch = tempfile.mkdtemp(prefix='wac-unverified-')
+    try:
+        return _fetch_into(scratch, url, file_name, None, connections, timeout, progress)
+    except BaseException:
+        shutil.rmtree(scratch, ignore_errors=True)
+        raise
+
+
+def _fetch_into(cache_dir: str, url: str, file_name: str, sha256: Optional[str], connections: int,
+                timeout: float, progress: Optional[Callable[[int, Optional[int]], None]]) -> str:
+    os.makedirs(cache_dir, exist_ok=True)
+    final = os.path.join(cache_dir, file_name)
+    part = final + '.part'
+
+    with _locked(final + '.lock'):
+        if os.path.exists(final):
+            if sha256 is None or sha256_file(final) == sha256:
+                print(f"[✓] Using cached {file_name}")
+                return final
+            print(f"[!] Cached {file_name} does not match its checksum; downloading again")
+            os.remove(final)
+
+        size, accept_ranges, validator = probe(url, timeout)
+        transfer = _Transfer(url, part, size, validator, accept_ranges, connections, timeout, progress)
+        if transfer.resumed:
+            print(f"[*] Resuming at {transfer.resumed / 2 ** 20:.1f} MB")
+        try:
+            transfer.run()
+        except OSError as e:
+            raise DownloadError(f"Could not write {part}: {e}")
+
+        digest = sha256_file(part)
+        if sha256 and digest != sha256:
+            for path in (part, transfer.state_path):
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+            raise DownloadError(f"Checksum mismatch for {file_name}: expected {sha256}, got {digest}")
+        os.replace(part, final)
+        with contextlib.suppress(OSError):
+            os.remove(transfer.state_path)
+    return final
+
+
+def extract_member(archive: str, name: str, dest: str) -> str:
+    """
+    Stream the file called `name` (at any depth; the shallowest wins) out
+    of a zip archive to `dest`, without unpacking anything else.
+    """
+    try:
+        with zipfile.ZipFile(archive) as zf:
+            matches = [info for info in zf.infolist()
+                       if not info.is_dir() and info.filename.replace('\\', '/').rsplit('/', 1)[-1] == name]
+            if not matches:
+                raise DownloadError(f"Could not find '{name}' in {os.path.basename(archive)}")
+            member = min(matches, key=lambda info: info.filename.count('/'))
+            with zf.open(member) as src, open(dest, 'wb') as dst:
+                shutil.copyfileobj(src, dst, BUFFER_SIZE)
+    except zipfile.BadZipFile as e:
+        raise DownloadError(f"{os.path.basename(archive)} is not a valid zip archive: {e}")
+    return dest
@@ -0,0 +1,161 @@
+# Screen Capture Agent
+# Serves screenshot requests written to C:\wac_capture (see screen_capture.py).
+# Must run in the desktop session (start it at logon like the AHK watchers);
+# SSH commands run in a session that cannot see the screen.
+#
+# Usage: powershell -NoProfile -ExecutionPolicy Bypass -File screen_capture.ps1
+
+$CaptureDir = "C:\wac_capture"
+
+Add-Type -ReferencedAssemblies System.Drawing, System.Windows.Forms -TypeDefinition @"
+using System;
+using System.Drawing;
+using System.Drawing.Drawing2D;
+using System.Drawing.Imaging;
+using System.IO;
+using System.IO.Compression;
+using System.Runtime.InteropServices;
+using System.Windows.Forms;
+
+public static class WacCapture
+{
+    // Last frame sent, the base for delta frames
+    static byte[] lastPixels;
+    static uint lastId;
+    static string lastKey;
+
+    // Packed 24-bit RGB pixels of a screen region, downscaled to scale percent
+    static byte[] Grab(int x, int y, int w, int h, int scale, out int outW, out int outH)
+    {
+        outW = Math.Max(1, w * scale / 100);
+        outH = Math.Max(1, h * scale / 100);
+        using (Bitmap screen = new Bitmap(w, h, PixelFormat.Format24bppRgb))
+        {
+            using (Graphics g = Graphics.FromImage(screen))
+                g.CopyFromScreen(x, y, 0, 0, new Size(w, h));
+            Bitmap frame = screen;
+            if (scale != 100)
+            {
+                frame = new Bitmap(outW, outH, PixelFormat.Format24bppRgb);
+                using (Graphics g = Graphics.FromImage(frame))
+                {
+                    g.InterpolationMode = InterpolationMode.Bilinear;
+                    g.DrawImage(screen, 0, 0, outW, outH);
+                }
+            }
+            try
+            {
+                BitmapData data = frame.LockBits(new Rectangle(0, 0, outW, outH),
+                                                 ImageLockMode.ReadOnly, PixelFormat.Format24bppRgb);
+                byte[] pixels = new byte[outW * outH * 3];
+                for (int row = 0; row < outH; row++)
+                    Marshal.Copy(data.Scan0 + row * data.Stride, pixels, row * outW * 3, outW * 3);
+                frame.UnlockBits(data);
+                for (int i = 0; i < pixels.Length; i += 3)
+                {
+                    // GDI+ stores BGR
+                    byte b = pixels[i];
+                    pixels[i] = pixels[i + 2];
+                    pixels[i + 2] = b;
+                }
+                return pixels;
+            }
+            finally
+            {
+                if (!ReferenceEquals(frame, screen))
+                    frame.Dispose();
+            }
+        }
+    }
+
+    static bool SameTile(byte[] a, byte[] b, int width, int tx, int ty, int tw, int th)
+    {
+        for (int row = 0; row < th; row++)
+        {
+            int start = ((ty + row) * width + tx) * 3;
+            for (int i = start; i < start + tw * 3; i++)
+                if (a[i] != b[i])
+                    return false;
+        }
+        return true;
+    }
+
+    // capture <id> <x> <y> <w> <h> <scale> <tile> <base>
+    public static void Serve(string request, string dir)
+    {
+        string[] f = request.Trim().Split(' ');
+        uint id = uint.Parse(f[1]);
+        int x = int.Parse(f[2]), y = int.Parse(f[3]), w = int.Parse(f[4]), h = int.Parse(f[5]);
+        int scale = int.Parse(f[6]), tile = int.Parse(f[7]);
+        uint baseId = uint.Parse(f[8]);
+        if (w <= 0 || h <= 0)
+        {
+            Rectangle screen = SystemInformation.VirtualScreen;
+            x = screen.X; y = screen.Y; w = screen.Width; h = screen.Height;
+        }
+
+        int width, height;
+        byte[] pixels = Grab(x, y, w, h, scale, out width, out height);
+        string key = x + "," + y + "," + w + "," + h + "," + scale + "," + tile;
+        bool delta = baseId != 0 && baseId == lastId && key == lastKey;
+
+        MemoryStream output = new MemoryStream();
+        BinaryWriter writer = new BinaryWriter(output);
+        writer.Write(new byte[] { (byte)'W', (byte)'A', (byte)'C', (byte)'F', 1, (byte)(delta ? 1 : 0) });
+        writer.Write((ushort)tile);
+        writer.Write((ushort)width);
+        writer.Write((ushort)height);
+        writer.Write(id);
+        writer.Write(delta ? baseId : 0u);
+        long countAt = output.Position;
+        writer.Write(0u);
+
+        int cols = (width + tile - 1) / tile, rows = (height + tile - 1) / tile;
+        uint count = 0;
+        for (int t = 0; t < cols * rows; t++)
+        {
+            int tx = (t % cols) * tile, ty = (t / cols) * tile;
+            int tw = Math.Min(tile, width - tx), th = Math.Min(tile, height - ty);
+            if (delta && SameTile(pixels, lastPixels, width, tx, ty, tw, th))
+                continue;
+            byte[] raw = new byte[tw * th * 3];
+            for (int row = 0; row < th; row++)
+                Buffer.BlockCopy(pixels, ((ty + row) * width + tx) * 3, raw, row * tw * 3, tw * 3);
+            MemoryStream packed = new MemoryStream();
+            using (DeflateStream deflate = new DeflateStream(packed, CompressionLevel.Fastest, true))
+                deflate.Write(raw, 0, raw.Length);
+            writer.Write((uint)t);
+            writer.Write((uint)packed.Length);
+            writer.Write(packed.GetBuffer(), 0, (int)packed.Length);
+            count++;
+        }
+        writer.Flush();
+        output.Position = countAt;
+        writer.Write(count);
+        writer.Flush();
+
+        // Publish atomically: the client polls for the .frame name
+        string tmp = Path.Combine(dir, id + ".part");
+        File.WriteAllBytes(tmp, output.ToArray());
+        File.Move(tmp, Path.Combine(dir, id + ".frame"));
+        lastPixels = pixels;
+        lastId = id;
+        lastKey = key;
+    }
+}
+"@
+
+New-Item -ItemType Directory -Force -Path $CaptureDir | Out-Null
+
+# Poll for capture requests
+while ($true) {
+    foreach ($req in Get-ChildItem -Path $CaptureDir -Filter *.req | Sort-Object LastWriteTime) {
+        try {
+            [WacCapture]::Serve([IO.File]::ReadAllText($req.FullName), $CaptureDir)
+        } catch {
+            # Malformed request or capture failure: drop it, the client times out
+        }
+        Remove-Item -LiteralPath $req.FullName -ErrorAction SilentlyContinue
+    }
+    Start-Sleep -Milliseconds 10
+}
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Screen Capture
+Client side of the screenshot channel. SSH runs outside the desktop
+session, so screen_capture.ps1 (started at logon like the AHK watchers)
+does the grabbing; the client asks for a frame with one remote command
+and fetches the result over SFTP:
+
+    C:\\wac_capture\\<id>.req     capture <id> <x> <y> <w> <h> <scale> <tile> <base>
+    C:\\wac_capture\\<id>.frame   encoded frame, deleted by the client once read
+
+Frames are split into square tiles. When `base` is the id of the agent's
+previous frame (same region, scale and tile size), only tiles that
+changed since then are sent and the client patches its cached copy;
+otherwise every tile is sent. Frame file layout (little endian):
+
+    'WACF' version:u8 flags:u8 tile:u16 width:u16 height:u16 id:u32 base:u32 count:u32
+    count x (index:u32 length:u32 raw-deflate(RGB rows of the tile))
+"""
+
+import os
+import struct
+import time
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Directory on the VM used by the capture agent
+CAPTURE_ROOT = "C:\\wac_capture"
+
+# Same directory as Windows OpenSSH's sftp-server names it
+_SFTP_ROOT = "/C:/wac_capture"
+
+MAGIC = b'WACF'
+VERSION = 1
+FLAG_DELTA = 0x01
+
+_HEADER = struct.Struct('<4sBBHHHIII')
+_TILE = struct.Struct('<II')
+
+Region = Tuple[int, int, int, int]
+
+
+class CaptureError(Exception):
+    """Raised when a frame cannot be captured or decoded"""
+
+
+class Frame:
+    """
+    One captured frame: packed 24-bit RGB rows of `width` x `height`
+    pixels (after downscaling). `changed` lists the tiles that differ from
+    the previous frame of the same stream (all tiles for a full frame).
+    """
+
+    __slots__ = ('id', 'width', 'height', 'tile', 'pixels', 'changed', 'delta', 'region', 'scale',
+                 'transferred')
+
+    def __init__(self, frame_id: int, width: int, height: int, tile: int, pixels: bytearray,
+                 changed: List[int], delta: bool, region: Optional[Region] = None, scale: int = 100,
+                 transferred: int = 0):
+        self.id = frame_id
+        self.width = width
+        self.height = height
+        self.tile = tile
+        self.pixels = pixels
+        self.changed = changed
+        self.delta = delta
+        self.region = region
+        self.scale = scale
+        self.transferred = transferred
+
+    @property
+    def tiles(self) -> int:
+        return ((self.width + self.tile - 1) // self.tile) * ((self.height + self.tile - 1) // self.tile)
+
+    @property
+    def changed_ratio(self) -> float:
+        """Share of tiles that changed since the previous frame (1.0 for a full frame)"""
+        return len(self.changed) / self.tiles if self.tiles else 0.0
+
+    def pixel(self, x: int, y: int) -> Tuple[int, int, int]:
+        i = (y * self.width + x) * 3
+        return self.pixels[i], self.pixels[i + 1], self.pixels[i + 2]
+
+    def changed_boxes(self) -> List[Region]:
+        """(x, y, w, h) of every changed tile, in frame pixels"""
+        cols = (self.width + self.tile - 1) // self.tile
+        boxes = []
+        for index in self.changed:
+            x = (index % cols) * self.tile
+            y = (index // cols) * self.tile
+            boxes.append((x, y, min(self.tile, self.width - x), min(self.tile, self.height - y)))
+        return boxes
+
+    def to_png(self) -> bytes:
+        """Encode as PNG (no imaging library needed)"""
+        return png_bytes(self.width, self.height, self.pixels)
+
+    def save(self, path: str):
+        """Write the frame as a PNG file"""
+        with open(path, 'wb') as f:
+            f.write(self.to_png())
+
+
+def png_bytes(width: int, height: int, rgb) -> bytes:
+    """Minimal truecolor PNG encoder"""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    stride = width * 3
+    view = memoryview(rgb)
+    raw = b''.join(b'\x00' + view[row * stride:(row + 1) * stride].tobytes() for row in range(height))
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw, 6))
+            + chunk(b'IEND', b''))
+
+
+def decode_frame(data: bytes, previous: Optional[Frame] = None) -> Frame:
+    """
+    Decode a frame file. Delta frames are applied on top of `previous`,
+    which must be the frame they were computed against.
+    """
+    if len(data) < _HEADER.size:
+        raise CaptureError("Truncated frame header")
+    magic, version, flags, tile, width, height, frame_id, base, count = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise CaptureError("Not a capture frame (bad magic or version)")
+
+    delta = bool(flags & FLAG_DELTA)
+    if delta:
+        if (previous is None or previous.id != base or previous.width != width
+                or previous.height != height or previous.tile != tile):
+            raise CaptureError(f"Delta frame {frame_id} needs base frame {base}")
+        pixels = bytearray(previous.pixels)
+    else:
+        pixels = bytearray(width * height * 3)
+
+    cols = (width + tile - 1) // tile
+    stride = width * 3
+    changed = []
+    pos = _HEADER.size
+    for _ in range(count):
+        index, length = _TILE.unpack_from(data, pos)
+        pos += _TILE.size
+        raw = zlib.decompress(data[pos:pos + length], -15)
+        pos += length
+        x = (index % cols) * tile
+        y = (index // cols) * tile
+        row_bytes = min(tile, width - x) * 3
+        rows = min(tile, height - y)
+        if len(raw) != row_bytes * rows:
+            raise CaptureError(f"Tile {index} of frame {frame_id} has the wrong size")
+        dst = y * stride + x * 3
+        for r in range(rows):
+            pixels[dst:dst + row_bytes] = raw[r * row_bytes:(r + 1) * row_bytes]
+            dst += stride
+        changed.append(index)
+
+    return Frame(frame_id, width, height, tile, pixels, changed, delta, transferred=len(data))
+
+
+class ScreenCapture:
+    """
+    Requests frames from the VM's capture agent and keeps the last frame
+    of every (region, scale, tile) stream so later captures can be deltas.
+
+    `run_remote` runs a shell command on the VM; `open_sftp` returns an
+    SFTP client for fetching frames.
+    """
+
+    def __init__(self, run_remote: Callable[[str], Tuple[int, str]], open_sftp: Callable[[], object],
+                 timeout: float = 5.0, poll_interval: float = 0.01):
+        self.run_remote = run_remote
+        self.open_sftp = open_sftp
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._cache: Dict[Tuple, Frame] = {}
+        # Random start so several clients on one VM never share frame ids
+        self._next_id = int.from_bytes(os.urandom(4), 'little') & 0x7FFFFFFF or 1
+        self._ready = False
+
+    def capture(self, region: Optional[Region] = None, scale: float = 1.0, tile: int = 32,
+                delta: bool = True, phase=None) -> Frame:
+        """
+        Capture the screen, or a (x, y, w, h) region of it, downscaled by
+        `scale`. With delta=True only tiles changed since the previous
+        capture of the same stream are transferred.
+        """
+        percent = max(1, min(100, round(scale * 100)))
+        x, y, w, h = region or (0, 0, 0, 0)
+        key = (x, y, w, h, percent, tile)
+        previous = self._cache.get(key) if delta else None
+        frame_id = self._next_id
+        self._next_id = self._next_id % 0x7FFFFFFF + 1
+        phase = phase or _no_phase
+
+        with phase('request'):
+            name = f"{CAPTURE_ROOT}\\{frame_id}"
+            request = f"capture {frame_id} {x} {y} {w} {h} {percent} {tile} {previous.id if previous else 0}"
+            setup = "" if self._ready else f"(if not exist {CAPTURE_ROOT} mkdir {CAPTURE_ROOT})&"
+            rc, _ = self.run_remote(f"{setup}>{name}.tmp echo {request}&& move /y {name}.tmp {name}.req >nul")
+            if rc != 0:
+                raise CaptureError("Could not write the capture request")
+            self._ready = True
+
+        sftp = self.open_sftp()
+        path = f"{_SFTP_ROOT}/{frame_id}.frame"
+        with phase('wait'):
+            data = self._fetch(sftp, path)
+        with phase('decode'):
+            frame = decode_frame(data, previous)
+        frame.region = region
+        frame.scale = percent
+        self._cache[key] = frame
+        return frame
+
+    def _fetch(self, sftp, path: str) -> bytes:
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                with sftp.open(path, 'rb') as f:
+                    f.prefetch()
+                    data = f.read()
+                break
+            except IOError:
+                if time.monotonic() > deadline:
+                    raise CaptureError("Capture agent did not answer (is screen_capture.ps1 running "
+                                       "in the desktop session?)")
+                time.sleep(self.poll_interval)
+        try:
+            sftp.remove(path)
+        except IOError:
+            pass
+        return data
+
+    def reset(self):
+        """Forget cached frames; the next capture of every stream is a full frame"""
+        self._cache.clear()
+
+    def wait_until_stable(self, region: Optional[Region] = None, scale: float = 0.25,
+                          stable_for: float = 0.3, timeout: float = 5.0, tolerance: float = 0.0,
+                          change_timeout: Optional[float] = None, phase=None) -> dict:
+        """
+        Capture repeatedly until no more than `tolerance` of the tiles have
+        changed for `stable_for` seconds, or `timeout` passes. With
+        `change_timeout`, a change is expected first (a UI that is about to
+        open): quiet time before any change only counts as settled once it
+        reaches `change_timeout`. Returns a report with the last frame.
+        """
+        start = time.perf_counter()
+        captures = 0
+        quiet_since: Optional[float] = None
+        changed = False
+        stable = False
+        while True:
+            frame = self.capture(region, scale, phase=phase)
+            captures += 1
+            now = time.perf_counter()
+            if not frame.delta:
+                # First frame of the stream: nothing to compare against yet
+                quiet_since = now
+            elif frame.changed_ratio <= tolerance:
+                if quiet_since is None:
+                    quiet_since = now
+                needed = stable_for if changed or change_timeout is None else change_timeout
+                if now - quiet_since >= needed:
+                    stable = True
+                    break
+            else:
+                changed = True
+                quiet_since = None
+            if now - start >= timeout:
+                break
+        return {
+            'stable': stable,
+            'changed': changed,
+            'wait_time': time.perf_counter() - start,
+            'captures': captures,
+            'frame': frame,
+        }
+
+
+class _NoPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def _no_phase(name: str) -> _NoPhase:
+    return _NoPhase()
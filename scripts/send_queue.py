@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Asynchronous Send Queue
+Fire-and-forget execution for VMController: `execute_command(cmd, wait=False)`
+hands the command to this queue and returns a Future straight away, so the
+caller can overlap its own work (e.g. model inference) with actuation I/O.
+
+Commands wait in one FIFO lane per device and are run by a small worker
+pool. A lane is only ever worked on by one thread at a time, so mouse
+commands execute in the order they were submitted, as do keyboard
+commands; the two devices proceed independently. At most `window`
+commands are accepted but unfinished at any time; submit() blocks beyond
+that so a fast caller cannot queue unbounded work.
+"""
+
+import collections
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional, Set, Tuple
+
+
+class SendQueueClosed(Exception):
+    """Raised when submitting to a send queue that has been closed"""
+
+
+class SendQueue:
+    """
+    Per-device ordered, bounded, asynchronous command runner.
+
+    `run(command)` executes one command and returns its result or raises;
+    either ends up on the command's Future. `lane_of(command)` names the
+    lane (device) a command belongs to.
+    """
+
+    def __init__(self, run: Callable[[str], Any], lane_of: Callable[[str], str],
+                 window: int = 16, workers: int = 2, metrics=None):
+        if window < 1:
+            raise ValueError("In-flight window must be at least 1")
+        self.run = run
+        self.lane_of = lane_of
+        self.window = window
+        self.metrics = metrics
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='wac-send')
+        self._lanes: Dict[str, Deque[Tuple[str, Future, float]]] = {}
+        self._scheduled: Set[str] = set()
+        self._pending = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    @property
+    def in_flight(self) -> int:
+        """Commands accepted but not finished yet"""
+        return self._pending
+
+    def submit(self, command: str) -> Future:
+        """Queue a command; blocks while the in-flight window is full"""
+        lane = self.lane_of(command)
+        future: Future = Future()
+        with self._cond:
+            while self._pending >= self.window and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                raise SendQueueClosed("Send queue is closed")
+            self._pending += 1
+            self._lanes.setdefault(lane, collections.deque()).append(
+                (command, future, time.perf_counter()))
+            self._schedule(lane)
+        return future
+
+    def _schedule(self, lane: str):
+        # Called with the condition held
+        if lane not in self._scheduled:
+            self._scheduled.add(lane)
+            self._executor.submit(self._step, lane)
+
+    def _step(self, lane: str):
+        """Run the next command of a lane, then yield the worker to other lanes"""
+        with self._cond:
+            command, future, queued = self._lanes[lane].popleft()
+
+        if future.set_running_or_notify_cancel():
+            if self.metrics is not None:
+                self.metrics.observe('send_wait_seconds', time.perf_counter() - queued, lane=lane)
+            try:
+                future.set_result(self.run(command))
+            except Exception as e:
+                future.set_exception(e)
+
+        with self._cond:
+            self._pending -= 1
+            self._scheduled.discard(lane)
+            if self._lanes[lane]:
+                self._schedule(lane)
+            self._cond.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every accepted command has finished; False on timeout"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._pending == 0, timeout)
+
+    def close(self, cancel: bool = False):
+        """
+        Stop accepting commands and wait for the workers. With cancel=True,
+        commands that have not started are cancelled instead of run.
+        """
+        with self._cond:
+            self._closed = True
+            if cancel:
+                for lane in self._lanes.values():
+                    for _, future, _ in lane:
+                        future.cancel()
+            self._cond.notify_all()
+        self.flush()
+        self._executor.shutdown(wait=True)
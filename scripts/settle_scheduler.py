@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Adaptive Settle Scheduler
+Decides how long to pause after each command so the VM has caught up
+before the next one, per action class instead of one fixed delay:
+
+    move, type      never need a pause (the watcher runs them in order)
+    click, scroll   pause only when the VM is slow or jittery
+    key             likewise, for shortcuts that are not UI-opening
+    drag            short pause for drop animations
+    ui              UI-opening shortcuts (press #r, ...), the old 0.3s
+
+Each class starts at a base pause. In adaptive mode the scheduler also
+watches how long the VM takes to acknowledge commands of that class and
+keeps a smoothed latency and variation (as TCP does for round trips). The
+pause grows by `gain` times the latency above the fastest acknowledgement
+seen (beyond a `tolerance` share of it, which covers polling noise), so a
+loaded VM gets longer pauses and a steady one stays at the base. Every
+pause is clamped to the class's floor and ceiling. Fixed mode always uses
+the base pauses, for reproducible tests.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from command_parser import Action, Command
+
+ACTION_CLASSES = ('move', 'click', 'scroll', 'drag', 'type', 'key', 'ui')
+
+# Per class: (base seconds, floor, ceiling, gain on excess acknowledgement latency)
+DEFAULT_SETTLE: Dict[str, Tuple[float, float, float, float]] = {
+    'move': (0.0, 0.0, 0.0, 0.0),
+    'click': (0.0, 0.0, 0.5, 0.5),
+    'scroll': (0.0, 0.0, 0.5, 0.5),
+    'drag': (0.05, 0.0, 1.0, 1.0),
+    'type': (0.0, 0.0, 0.0, 0.0),
+    'key': (0.0, 0.0, 0.5, 0.5),
+    'ui': (0.3, 0.1, 2.0, 1.0),
+}
+
+# Pauses shorter than this are skipped: waiting for the ack costs more
+MIN_SETTLE = 0.01
+
+_CLASS_BY_ACTION = {
+    Action.MOVE: 'move', Action.HERE: 'move',
+    Action.LEFT: 'click', Action.RIGHT: 'click', Action.MIDDLE: 'click', Action.DOUBLE: 'click',
+    Action.HOLD: 'click', Action.RELEASE: 'click',
+    Action.SCROLL_UP: 'scroll', Action.SCROLL_DOWN: 'scroll',
+    Action.DRAG: 'drag',
+    Action.TYPE: 'type', Action.PRESS: 'key',
+}
+
+
+def classify(command: Command, ui_commands: List[str]) -> str:
+    """Action class of a parsed command"""
+    if command.action is Action.PRESS and any(ui in command.processed for ui in ui_commands):
+        return 'ui'
+    return _CLASS_BY_ACTION.get(command.action, 'move')
+
+
+def parse_override(spec: str) -> Tuple[str, Tuple[float, ...]]:
+    """'CLASS=BASE[:FLOOR:CEILING]' -> (class, values)"""
+    name, _, values = spec.partition('=')
+    name = name.strip()
+    if name not in ACTION_CLASSES:
+        raise ValueError(f"Unknown action class '{name}' (expected one of {', '.join(ACTION_CLASSES)})")
+    try:
+        numbers = tuple(float(v) for v in values.split(':'))
+    except ValueError:
+        raise ValueError(f"Invalid settle override '{spec}' (expected CLASS=BASE[:FLOOR:CEILING])")
+    if len(numbers) not in (1, 3) or min(numbers) < 0:
+        raise ValueError(f"Invalid settle override '{spec}' (expected CLASS=BASE[:FLOOR:CEILING])")
+    return name, numbers
+
+
+class _Estimate:
+    """Smoothed acknowledgement latency of one action class"""
+
+    __slots__ = ('samples', 'srtt', 'rttvar', 'best')
+
+    def __init__(self):
+        self.samples = 0
+        self.srtt = 0.0
+        self.rttvar = 0.0
+        self.best = 0.0
+
+    def update(self, latency: float, alpha: float, beta: float):
+        if self.samples == 0:
+            self.srtt = latency
+            self.rttvar = 0.0
+            self.best = latency
+        else:
+            self.rttvar += beta * (abs(self.srtt - latency) - self.rttvar)
+            self.srtt += alpha * (latency - self.srtt)
+            self.best = min(self.best, latency)
+        self.samples += 1
+
+    def excess(self, tolerance: float) -> float:
+        """Latency (with margin for jitter) above the best case the VM has shown"""
+        return max(0.0, self.srtt + 4 * self.rttvar - self.best * (1 + tolerance))
+
+
+class SettleTally:
+    """Pauses taken during one run (a batch), for its report"""
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.by_class: Dict[str, List[float]] = {}
+
+    def add(self, action_class: str, seconds: float):
+        entry = self.by_class.setdefault(action_class, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+    def report(self) -> dict:
+        return {
+            'mode': self.mode,
+            'total': sum(seconds for _, seconds in self.by_class.values()),
+            'by_class': {name: {'count': count, 'seconds': seconds}
+                         for name, (count, seconds) in sorted(self.by_class.items())},
+        }
+
+
+class SettleScheduler:
+    """
+    Per-VM settle times by action class. `settings` overrides entries of
+    DEFAULT_SETTLE with (base,) or (base, floor, ceiling[, gain]).
+    """
+
+    MODES = ('adaptive', 'fixed')
+
+    def __init__(self, mode: str = 'adaptive', settings: Optional[Dict[str, Tuple[float, ...]]] = None,
+                 alpha: float = 0.125, beta: float = 0.25, tolerance: float = 0.5, min_samples: int = 3):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown settle mode '{mode}' (expected one of {', '.join(self.MODES)})")
+        self.mode = mode
+        self.settings = dict(DEFAULT_SETTLE)
+        for name, values in (settings or {}).items():
+            if name not in self.settings:
+                raise ValueError(f"Unknown action class '{name}'")
+            self.settings[name] = tuple(values) + self.settings[name][len(values):]
+            if self.settings[name][1] > self.settings[name][2]:
+                raise ValueError(f"Settle floor of '{name}' is above its ceiling")
+        self.alpha = alpha
+        self.beta = beta
+        self.tolerance = tolerance
+        self.min_samples = min_samples
+        self._estimates = {name: _Estimate() for name in ACTION_CLASSES}
+        self._tallies: List[SettleTally] = []
+        self._lock = threading.Lock()
+
+    def settle_for(self, action_class: str) -> float:
+        """Seconds to pause after a command of this class"""
+        base, floor, ceiling, gain = self.settings[action_class]
+        settle = base
+        estimate = self._estimates[action_class]
+        if self.mode == 'adaptive' and estimate.samples >= self.min_samples:
+            settle += gain * estimate.excess(self.tolerance)
+        settle = min(max(settle, floor), ceiling)
+        return settle if settle >= MIN_SETTLE else 0.0
+
+    def observe(self, action_class: str, latency: float, count: int = 1):
+        """Acknowledgement latency of an entry carrying `count` commands of this class"""
+        with self._lock:
+            self._estimates[action_class].update(latency / max(1, count), self.alpha, self.beta)
+
+    def wait(self, action_class: str, seconds: float):
+        """Pause after a command, counting it towards every active run"""
+        time.sleep(seconds)
+        self.record(action_class, seconds)
+
+    def record(self, action_class: str, seconds: float):
+        """Count a pause taken by other means (e.g. waiting for the screen)"""
+        with self._lock:
+            for tally in self._tallies:
+                tally.add(action_class, seconds)
+
+    @contextmanager
+    def run(self) -> Iterator[SettleTally]:
+        """Collect the pauses taken inside the block"""
+        tally = SettleTally(self.mode)
+        with self._lock:
+            self._tallies.append(tally)
+        try:
+            yield tally
+        finally:
+            with self._lock:
+                self._tallies.remove(tally)
+
+    def snapshot(self) -> dict:
+        """Current settle time and latency estimate per class"""
+        with self._lock:
+            return {
+                name: {
+                    'settle': self.settle_for(name),
+                    'samples': e.samples,
+                    'ack_latency': e.srtt,
+                    'ack_jitter': e.rttvar,
+                    'ack_best': e.best,
+                }
+                for name, e in self._estimates.items()
+            }
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Persistent Shell Session Transport
+Keeps one long-lived cmd.exe channel open per controller and streams
+actuation commands into it as framed lines, acknowledged on the same channel
+"""
+
+import socket
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import paramiko
+
+# Marker echoed by the remote shell after every framed command
+ACK_MARKER = "@@WAC-ACK"
+
+
+class SessionError(Exception):
+    """Raised when the persistent shell session fails or times out"""
+
+
+class ShellSession:
+    """
+    Long-lived remote cmd.exe used instead of one exec_command per action.
+
+    Every command is sent as a single line followed by an acknowledgement
+    echo carrying a sequence number and the command's exit status:
+
+        <remote_cmd> && echo @@WAC-ACK <seq> 0 || echo @@WAC-ACK <seq> 1
+
+    so one action costs a single write plus the round trip for its ack,
+    instead of a channel open, a cmd.exe startup and an exit-status exchange.
+    """
+
+    def __init__(self, transport: paramiko.Transport,
+                 shell_command: str = "cmd.exe /Q", timeout: float = 10.0):
+        self.transport = transport
+        self.shell_command = shell_command
+        self.timeout = timeout
+        self.channel: Optional[paramiko.Channel] = None
+        self._seq = 0
+        self._acks: Dict[int, Tuple[int, str]] = {}
+        self._output: List[str] = []
+        self._buffer = b""
+        self._send_lock = threading.Lock()
+        self._recv_lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        """True while the remote shell channel is usable"""
+        return (
+            self.channel is not None
+            and not self.channel.closed
+            and not self.channel.exit_status_ready()
+        )
+
+    # Open the remote shell
+    def open(self):
+        """Start the remote shell and wait until it answers"""
+        try:
+            self.channel = self.transport.open_session(timeout=self.timeout)
+            self.channel.settimeout(self.timeout)
+            self.channel.exec_command(self.shell_command)
+        except (paramiko.SSHException, socket.error) as e:
+            raise SessionError(f"Could not open shell session: {e}")
+
+        # Switch to UTF-8 so typed text survives the pipe, then handshake
+        self._write("chcp 65001 >nul")
+        self.wait(self._submit_line(None))
+
+    # Close the remote shell
+    def close(self):
+        """Ask the shell to exit and close the channel"""
+        if self.channel is None:
+            return
+        try:
+            if not self.channel.closed:
+                self._write("exit")
+        except Exception:
+            pass
+        finally:
+            self.channel.close()
+            self.channel = None
+
+    # Run command and wait for its acknowledgement
+    def run(self, remote_cmd: str) -> Tuple[int, str]:
+        """Run one command in the shell; returns (exit status, stdout)"""
+        return self.wait(self.submit(remote_cmd))
+
+    def submit(self, remote_cmd: str) -> int:
+        """Send a command without waiting; returns its sequence number"""
+        return self._submit_line(remote_cmd)
+
+    def wait(self, seq: int) -> Tuple[int, str]:
+        """Block until the acknowledgement for `seq` arrives; returns (exit status, stdout)"""
+        with self._recv_lock:
+            while seq not in self._acks:
+                self._read_acks()
+            return self._acks.pop(seq)
+
+    def _submit_line(self, remote_cmd: Optional[str]) -> int:
+        with self._send_lock:
+            self._seq += 1
+            seq = self._seq
+            if remote_cmd is None:
+                line = f"echo {ACK_MARKER} {seq} 0"
+            else:
+                line = (
+                    f"{remote_cmd} && echo {ACK_MARKER} {seq} 0"
+                    f" || echo {ACK_MARKER} {seq} 1"
+                )
+            self._write(line)
+            return seq
+
+    def _write(self, line: str):
+        if self.channel is None:
+            raise SessionError("Session is not open")
+        try:
+            self.channel.sendall((line + "\r\n").encode("utf-8"))
+        except (paramiko.SSHException, socket.error) as e:
+            raise SessionError(f"Session write failed: {e}")
+
+    def _read_acks(self):
+        """
+        Read one chunk from the shell and record any acknowledgements.
+        Commands run in order, so output seen before an ack belongs to it.
+        """
+        if self.channel is None:
+            raise SessionError("Session is not open")
+        try:
+            data = self.channel.recv(4096)
+        except socket.timeout:
+            raise SessionError(f"No acknowledgement within {self.timeout}s")
+        except (paramiko.SSHException, socket.error) as e:
+            raise SessionError(f"Session read failed: {e}")
+
+        if not data:
+            raise SessionError("Remote shell closed the session")
+
+        self._buffer += data
+        *lines, self._buffer = self._buffer.split(b"\n")
+        for raw in lines:
+            line = raw.decode("utf-8", errors="replace").rstrip("\r")
+            # Output without a trailing newline (e.g. `type`) shares the ack's line
+            marker = line.find(ACK_MARKER)
+            parts = line[marker:].split() if marker >= 0 else []
+            if len(parts) == 3:
+                if marker > 0:
+                    self._output.append(line[:marker])
+                try:
+                    self._acks[int(parts[1])] = (int(parts[2]), "\n".join(self._output))
+                except ValueError:
+                    pass
+                self._output = []
+            else:
+                self._output.append(line)
@@ -0,0 +1,542 @@
+#!/usr/bin/env python3
+"""
+Trajectory Recording
+Compact binary log of executed commands with timestamps and results, a
+lazy reader for it, timed replay through a VMController, and conversion
+to and from the plain-text command syntax used by batch files.
+
+File layout (little-endian, optionally wrapped in gzip):
+    header:  b'WACT', version (1 byte), flags (1 byte), start time (float64)
+    records: varint body length, then the body:
+        varint     microseconds since the previous record
+        op byte    action index (low 4 bits) | OK | TEXT | COORDS | HERE
+        payload    TEXT: the processed command as UTF-8
+                   otherwise: int16 values (x, y if COORDS, then any
+                   numeric arguments such as drag target or scroll amount)
+
+Mouse commands in canonical form (`x y action [ints]`, `here action`,
+`action [ints]`) with values in int16 range take 7-11 bytes; everything
+else is stored as text.
+"""
+
+import gzip
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Generator, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from command_parser import Action, default_parser, is_comment
+
+MAGIC = b'WACT'
+VERSION = 1
+HEADER = struct.Struct('<4sBBd')
+
+# Header flags
+FLAG_COMPRESSED = 0x01
+
+# Record op byte
+_ACTION_MASK = 0x0F
+_OK = 0x10
+_TEXT = 0x20
+_COORDS = 0x40
+_HERE = 0x80
+_PLAIN_MASK = _TEXT | _COORDS | _HERE
+
+_ACTIONS = list(Action)
+_ACTION_INDEX = {action: i for i, action in enumerate(_ACTIONS)}
+_ACTION_NAMES = [action.value for action in _ACTIONS]
+_ACTION_KINDS = [
+    'keyboard' if action in (Action.TYPE, Action.PRESS)
+    else 'invalid' if action is Action.INVALID else 'mouse'
+    for action in _ACTIONS
+]
+_GZIP_MAGIC = b'\x1f\x8b'
+
+# int16 layouts by value count (a drag carries four)
+_INT16 = [struct.Struct(f'<{n}h') for n in range(5)]
+_INT16_MIN, _INT16_MAX = -0x8000, 0x7FFF
+
+# Length prefix, two-byte time delta, op and a point: most records of a session
+_COMMON = struct.Struct('<4B2h')
+
+
+class TrajectoryError(Exception):
+    """Raised for files that are not trajectories or use an unknown version"""
+
+
+class TrajectoryEvent(NamedTuple):
+    """One recorded command"""
+    offset: float   # seconds since recording started
+    kind: str       # 'mouse', 'keyboard' or 'invalid'
+    command: str    # processed command, as sent to the watcher
+    ok: bool
+
+
+def _put_varint(out: bytearray, value: int):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _get_varint(buf, pos: int) -> Tuple[int, int]:
+    """Decode a varint at `pos`; IndexError if the buffer ends first"""
+    result = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _canonical_int(token: str) -> Optional[int]:
+    if token.isdecimal() or (token[:1] == '-' and token[1:].isdecimal()):
+        value = int(token)
+        if str(value) == token:
+            return value
+    return None
+
+
+def encode_body(processed: str, ok: bool, delta_us: int) -> bytearray:
+    """Encode one record body (without its length prefix)"""
+    parsed = default_parser.parse(processed)
+    body = bytearray()
+    _put_varint(body, delta_us)
+    at = len(body)
+    body.append(0)
+    op = _ACTION_INDEX[parsed.action] | (_OK if ok else 0)
+
+    if parsed.kind == 'mouse':
+        tokens = processed.split(' ')
+        offset = parsed._offset
+        numbers = [_canonical_int(t) for t in tokens[:offset] + tokens[offset + 1:]]
+        if offset == 1:
+            # `here <action>`: the prefix is implied by the flag
+            numbers = numbers[1:]
+        if (len(numbers) < len(_INT16) and None not in numbers and '' not in tokens
+                and all(_INT16_MIN <= n <= _INT16_MAX for n in numbers)):
+            op |= _COORDS if offset == 2 else 0
+            op |= _HERE if offset == 1 else 0
+            body[at] = op
+            body += _INT16[len(numbers)].pack(*numbers)
+            return body
+
+    body[at] = op | _TEXT
+    body += processed.encode('utf-8')
+    return body
+
+
+def _decode_command(record: bytes) -> Tuple[str, str, bool]:
+    """(kind, command, ok) for a record body without its time delta"""
+    op = record[0]
+    index = op & _ACTION_MASK
+
+    if op & _TEXT:
+        command = record[1:].decode('utf-8')
+    else:
+        numbers = _INT16[(len(record) - 1) >> 1].unpack_from(record, 1)
+        name = _ACTION_NAMES[index]
+        if op & _COORDS:
+            if len(numbers) == 2:
+                command = f"{numbers[0]} {numbers[1]} {name}"
+            else:
+                command = ' '.join(map(str, numbers[:2] + (name,) + numbers[2:]))
+        elif op & _HERE:
+            command = ' '.join(('here', name) + tuple(map(str, numbers)))
+        else:
+            command = ' '.join((name,) + tuple(map(str, numbers)))
+
+    return _ACTION_KINDS[index], command, bool(op & _OK)
+
+
+def _scan(buf, pos: int, size: int, offset: float) -> Generator[TrajectoryEvent, None, Tuple[int, float]]:
+    """
+    Yield the complete records in buf[pos:size]. Returns where it stopped
+    and the running time offset, so a streaming caller can resume once
+    more data has arrived.
+    """
+    # tuple.__new__ skips the keyword handling of the NamedTuple constructor
+    new, event = tuple.__new__, TrajectoryEvent
+    names = _ACTION_NAMES
+    pair = _INT16[2]
+    common = _COMMON.unpack_from
+    last = size - _COMMON.size
+    while pos < size:
+        if pos <= last:
+            # Fast path for the bulk of any session: `x y action` with a
+            # two-byte time delta (128us to 16ms), decoded in one unpack
+            length, low, high, op, x, y = common(buf, pos)
+            if length == 7 and low > 0x7F and high < 0x80 and op & _PLAIN_MASK == _COORDS:
+                pos += 8
+                offset += ((low & 0x7F) | (high << 7)) / 1e6
+                yield new(event, (offset, 'mouse', f"{x} {y} {names[op & _ACTION_MASK]}", op & _OK != 0))
+                continue
+
+        length = buf[pos]
+        start = pos + 1
+        if length > 0x7F:
+            try:
+                length, start = _get_varint(buf, pos)
+            except IndexError:
+                break
+        end = start + length
+        if end > size:
+            break
+        pos = end
+
+        # Time deltas are mostly one or two bytes (up to 16ms); decode those inline
+        delta_us = buf[start]
+        if delta_us < 0x80:
+            start += 1
+        else:
+            high = buf[start + 1]
+            if high < 0x80:
+                delta_us = (delta_us & 0x7F) | (high << 7)
+                start += 2
+            else:
+                delta_us, start = _get_varint(buf, start)
+        offset += delta_us / 1e6
+
+        op = buf[start]
+        if op & _PLAIN_MASK == _COORDS and end - start == 5:
+            x, y = pair.unpack_from(buf, start + 1)
+            yield new(event, (offset, 'mouse', f"{x} {y} {names[op & _ACTION_MASK]}", op & _OK != 0))
+        else:
+            yield new(event, (offset, *_decode_command(buf[start:end])))
+    return pos, offset
+
+
+class TrajectoryWriter:
+    """
+    Appends events to a trajectory file.
+
+    Safe to share between threads. Records are buffered; call flush() to
+    make them visible to a concurrent reader.
+    """
+
+    def __init__(self, path: str, compress: bool = False, start_time: Optional[float] = None):
+        self.path = path
+        self.compress = compress
+        self.start_time = time.time() if start_time is None else start_time
+        self.count = 0
+        self._raw = open(path, 'wb')
+        self._out = gzip.GzipFile(fileobj=self._raw, mode='wb', compresslevel=6) if compress else self._raw
+        self._out.write(HEADER.pack(MAGIC, VERSION, FLAG_COMPRESSED if compress else 0, self.start_time))
+        self._clock = time.monotonic()
+        self._last_us = 0
+        self._lock = threading.Lock()
+
+    def record(self, command: str, ok: bool = True, offset: Optional[float] = None):
+        """
+        Record a processed command. `offset` is seconds since the start of
+        the recording; by default it is taken from the clock.
+        """
+        with self._lock:
+            if offset is None:
+                offset = time.monotonic() - self._clock
+            now_us = max(int(offset * 1e6), self._last_us)
+            body = encode_body(command, ok, now_us - self._last_us)
+            self._last_us = now_us
+            prefix = bytearray()
+            _put_varint(prefix, len(body))
+            self._out.write(prefix + body)
+            self.count += 1
+
+    def write_events(self, events: Iterable[TrajectoryEvent]):
+        """Append already-timed events, e.g. when converting"""
+        for event in events:
+            self.record(event.command, event.ok, event.offset)
+
+    def flush(self):
+        with self._lock:
+            self._out.flush()
+            if self._out is not self._raw:
+                self._raw.flush()
+
+    def close(self):
+        with self._lock:
+            if self._raw.closed:
+                return
+            if self._out is not self._raw:
+                self._out.close()
+            self._raw.close()
+
+    def __enter__(self) -> 'TrajectoryWriter':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TrajectoryReader:
+    """
+    Lazily iterates the events of a trajectory file.
+
+    Uncompressed files are memory-mapped and decoded in place; compressed
+    ones are streamed in chunks, so memory use does not grow with the
+    length of the recording. A truncated final record (e.g. from a
+    recorder that was killed) ends iteration instead of raising.
+    """
+
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            lead = f.read(2)
+        self.compressed = lead == _GZIP_MAGIC
+        with self._open() as f:
+            header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise TrajectoryError(f"{path}: not a trajectory file")
+        magic, version, _flags, self.start_time = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise TrajectoryError(f"{path}: not a trajectory file")
+        if version != VERSION:
+            raise TrajectoryError(f"{path}: unsupported trajectory version {version}")
+
+    def _open(self):
+        return gzip.open(self.path, 'rb') if self.compressed else open(self.path, 'rb')
+
+    def __iter__(self) -> Iterator[TrajectoryEvent]:
+        if self.compressed:
+            return self._iter_stream()
+        return self._iter_mapped()
+
+    def _iter_mapped(self) -> Iterator[TrajectoryEvent]:
+        size = os.path.getsize(self.path)
+        if size <= HEADER.size:
+            return
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield from _scan(mapped, HEADER.size, size, 0.0)
+
+    def _iter_stream(self) -> Iterator[TrajectoryEvent]:
+        with self._open() as f:
+            f.read(HEADER.size)
+            buf = b''
+            offset = 0.0
+            while True:
+                try:
+                    chunk = f.read1(self.CHUNK_SIZE)
+                except EOFError:
+                    chunk = b''
+                if not chunk:
+                    return
+                buf += chunk
+                pos, offset = yield from _scan(buf, 0, len(buf), offset)
+                buf = buf[pos:]
+
+
+def is_trajectory(path: str) -> bool:
+    """True if `path` looks like a trajectory file (compressed or not)"""
+    try:
+        TrajectoryReader(path)
+        return True
+    except (TrajectoryError, OSError, EOFError):
+        return False
+
+
+def read_events(path: str) -> Iterator[TrajectoryEvent]:
+    """Iterate the events of a trajectory file"""
+    return iter(TrajectoryReader(path))
+
+
+# ------------------------------------------------------------------
+# Text conversion
+# ------------------------------------------------------------------
+
+def to_text(events: Iterable[TrajectoryEvent], include_failed: bool = False) -> Iterator[str]:
+    """Processed command lines, as accepted by batch mode (`-f`)"""
+    for event in events:
+        if event.ok or include_failed:
+            yield event.command
+
+
+def from_text(lines: Iterable[str], interval: float = 0.1) -> Iterator[TrajectoryEvent]:
+    """
+    Events for a text script, spaced `interval` seconds apart (batch
+    mode's default delay). Blank and comment lines are skipped and invalid
+    lines are kept as failed events.
+    """
+    offset = 0.0
+    for line in lines:
+        line = line.strip()
+        if not line or is_comment(line):
+            continue
+        kind, processed = default_parser.classify(line)
+        yield TrajectoryEvent(offset, kind, processed, kind != 'invalid')
+        offset += interval
+
+
+def convert(src: str, dst: str, compress: bool = False, interval: float = 0.1) -> int:
+    """
+    Convert a trajectory to a text script or a text script to a
+    trajectory, depending on what `src` is. Returns the number of lines
+    or events written.
+    """
+    count = 0
+    if is_trajectory(src):
+        with open(dst, 'w', encoding='utf-8') as out:
+            for line in to_text(TrajectoryReader(src)):
+                out.write(line + '\n')
+                count += 1
+        return count
+
+    with open(src, 'r', encoding='utf-8') as f, TrajectoryWriter(dst, compress) as writer:
+        writer.write_events(from_text(f, interval))
+        count = writer.count
+    return count
+
+
+def transform_coordinates(src: str, dst: str, transform, compress: Optional[bool] = None) -> int:
+    """
+    Rewrite a trajectory with every mouse coordinate, drag targets
+    included, passed through `transform` (a coordinate_space.Transform).
+    Compact records are patched in place, all in one batch (vectorized
+    when NumPy is installed); records
+    stored as text, or whose new coordinates do not fit int16, are
+    re-encoded. Keeps the source's compression unless `compress` is
+    given. Returns the number of events.
+    """
+    reader = TrajectoryReader(src)
+    with reader._open() as f:
+        data = bytearray(f.read())
+    if compress is None:
+        compress = reader.compressed
+
+    # Locate every coordinate pair: byte offset of x (y follows), and its record
+    slots: List[int] = []
+    owners: List[int] = []
+    rebuild = set()
+    drag = _ACTION_INDEX[Action.DRAG]
+    kinds = _ACTION_KINDS
+    pos = HEADER.size
+    size = len(data)
+    count = 0
+    while pos < size:
+        length = data[pos]
+        start = pos + 1
+        if length > 0x7F:
+            try:
+                length, start = _get_varint(data, pos)
+            except IndexError:
+                break
+        end = start + length
+        if end > size:
+            break
+        while data[start] > 0x7F:
+            start += 1
+        op = data[start + 1]
+        flags = op & _PLAIN_MASK
+        if flags == _COORDS:
+            slots.append(start + 2)
+            owners.append(pos)
+            if op & _ACTION_MASK == drag and end - start >= 10:
+                slots.append(start + 6)
+                owners.append(pos)
+        elif flags == _HERE:
+            if op & _ACTION_MASK == drag and end - start >= 6:
+                slots.append(start + 2)
+                owners.append(pos)
+        elif flags == _TEXT and kinds[op & _ACTION_MASK] == 'mouse':
+            rebuild.add(pos)
+        count += 1
+        pos = end
+    del data[pos:]  # a truncated final record is dropped
+
+    original = bytes(data) if rebuild or slots else b''
+    unfit = transform.map_packed(data, slots)
+    if unfit:
+        owner_of = dict(zip(slots, owners))
+        rebuild.update(owner_of[offset] for offset in unfit)
+
+    if rebuild:
+        out = bytearray()
+        last = 0
+        for pos in sorted(rebuild):
+            out += data[last:pos]
+            length, start = _get_varint(original, pos)
+            last = start + length
+            delta_us, start = _get_varint(original, start)
+            _kind, command, ok = _decode_command(original[start:last])
+            body = encode_body(transform.apply_line(command), ok, delta_us)
+            _put_varint(out, len(body))
+            out += body
+        data = out + data[last:]
+
+    data[:HEADER.size] = HEADER.pack(MAGIC, VERSION, FLAG_COMPRESSED if compress else 0, reader.start_time)
+    with open(dst, 'wb') as raw:
+        if compress:
+            with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6) as out_file:
+                out_file.write(data)
+        else:
+            raw.write(data)
+    return count
+
+
+# ------------------------------------------------------------------
+# Replay
+# ------------------------------------------------------------------
+
+def replay(controller, events: Iterable[TrajectoryEvent], speed: Optional[float] = 1.0,
+           include_failed: bool = False, chunk_size: int = 1024) -> dict:
+    """
+    Feed recorded events to a connected VMController.
+
+    speed = 1.0 keeps the original timing, 2.0 plays twice as fast, and
+    None or 0 sends commands as fast as the controller's protocol allows
+    (through one batch_mode batch, sent `chunk_size` commands at a time). Events that failed
+    when recorded are skipped unless `include_failed` is set. Returns a
+    batch-style report; timed replays also report `max_lag`, the largest
+    delay behind schedule in seconds.
+    """
+    start = time.perf_counter()
+    sent = failed = 0
+    max_lag = 0.0
+
+    selected = (e for e in events if (e.ok or include_failed) and e.kind != 'invalid')
+
+    if not speed:
+        # One streaming batch, so the optimizer and the summary see the whole replay
+        report = controller.batch_mode((event.command for event in selected), window=chunk_size)
+        sent += report['commands']
+        failed += report['failed']
+    else:
+        for event in selected:
+            due = start + event.offset / speed
+            wait = due - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            else:
+                max_lag = max(max_lag, -wait)
+            if controller.execute_command(event.command):
+                sent += 1
+            else:
+                failed += 1
+        if controller.queues:
+            try:
+                controller.drain()
+            except Exception as e:
+                # Commands the watchers never acknowledged did not run
+                undone = sum(queue.in_flight for queue in controller.queues.values())
+                sent -= undone
+                failed += undone
+                controller.log.message('error', f"[✗] Queue did not drain: {e}")
+
+    wall_time = time.perf_counter() - start
+    report = {
+        'commands': sent,
+        'payloads': sent,
+        'failed': failed,
+        'invalid': 0,
+        'wall_time': wall_time,
+        'ops_per_sec': sent / wall_time if wall_time > 0 else 0.0,
+    }
+    if speed:
+        report['max_lag'] = max_lag
+    return report
@@ -5,74 +5,160 @@ Intelligent middleware for CUA to control Windows VM mouse and keyboard
 """
 
 import sys
-import re
 import time
 import os
 import threading
-import requests
-import platform
-import shutil
-import tempfile
-import stat
-import json
-import zipfile
-import subprocess
+import socket
 import paramiko
 import getpass
 from pathlib import Path
-from typing import Optional, Tuple
+from concurrent.futures import Future
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from shell_session import ShellSession, SessionError
+from command_parser import MOUSE_ACTIONS, KEYBOARD_ACTIONS, KEYBOARD_INDICATORS, default_parser
+from command_queue import CommandQueue, QueueError
+from batch_engine import BatchEngine
+from path_optimizer import PathOptimizer
+from metrics import Metrics
+from command_log import CommandLog, format_history
+from send_queue import SendQueue
+from settle_scheduler import SettleScheduler, classify, parse_override
+from bulk_typing import (
+    TYPING_PROFILES, BulkTypingError, Source, ensure_root, new_payload, typefile_command,
+    upload_text, wait_typed,
+)
+from screen_capture import CaptureError, Frame, Region, ScreenCapture
+from coordinate_space import IDENTITY, CoordinateSpace, CoordinateSpaceError, DisplayMetrics, Transform
+from trajectory import (
+    TrajectoryError, TrajectoryReader, TrajectoryWriter, convert, from_text, is_trajectory, replay,
+)
+from connection_pool import (
+    ConnectionPool, ConnectionLostError, PooledConnection, ReconnectPolicy,
+    CONNECTED, RECONNECTING, DOWN,
+)
 
 # Version and Repository Info
 __version__ = "1.0.1"
 REPO = "nullvoider07/windows_actuation_control"
 
+# Connection settings read from the command line, WAC_<KEY> variables or the config file
+CONFIG_KEYS = ('host', 'port', 'username', 'password', 'key_file', 'transport', 'protocol')
+DEFAULT_CONFIG = os.path.join('~', '.config', 'windows-actuation', 'config.ini')
+
 class VMController:
     """Smart CLI tool for controlling Windows VM via SSH"""
     
-    # Mouse action keywords
-    MOUSE_ACTIONS = {
-        'move', 'left', 'right', 'middle', 'double', 
-        'scroll_up', 'scroll_down', 'drag', 'here',
-        'hold', 'release'
-    }
-    
-    # Keyboard action keywords
-    KEYBOARD_ACTIONS = {'type', 'press'}
-    
-    # Special keys that indicate keyboard command
-    KEYBOARD_INDICATORS = {
-        '{Enter}', '{Esc}', '{Tab}', '{Backspace}', '{BS}',
-        '{Delete}', '{Del}', '{Space}', '{Up}', '{Down}',
-        '{Left}', '{Right}', '{Home}', '{End}', '{PgUp}',
-        '{PgDn}', '{F1}', '{F2}', '{F3}', '{F4}', '{F5}',
-        '{F6}', '{F7}', '{F8}', '{F9}', '{F10}', '{F11}', '{F12}',
-        '{LWin}', '{RWin}'
-    }
-    
-    def __init__(self, host: str, username: str, port: int = 2222):
-        """Initialize VM controller with connection details"""
+    # Command vocabulary (see command_parser.py)
+    MOUSE_ACTIONS = MOUSE_ACTIONS
+    KEYBOARD_ACTIONS = KEYBOARD_ACTIONS
+    KEYBOARD_INDICATORS = KEYBOARD_INDICATORS
+    
+    # Shortcuts that open UI elements and need time to appear (base of the 'ui' settle class)
+    UI_OPENING_COMMANDS = [
+        'press #r',
+        'press #',
+        'press !{Tab}',
+        'press ^+{Esc}',
+    ]
+    UI_SETTLE_TIME = 0.3
+    
+    # Screen-based settling: quiet time that counts as settled, and the longest wait
+    SCREEN_STABLE_TIME = 0.1
+    SCREEN_SETTLE_TIMEOUT = 5.0
+    
+    # File protocol: longest wait for a watcher to pick up its command file
+    PICKUP_TIMEOUT = 10.0
+    
+    # Supported command transports
+    TRANSPORTS = {'exec', 'session'}
+    
+    # Supported watcher protocols
+    PROTOCOLS = {'file', 'queue'}
+    
+    def __init__(self, host: str, username: str, port: int = 2222, transport: str = 'exec',
+                 protocol: str = 'file', queue_window: int = 32,
+                 pool: Optional[ConnectionPool] = None, optimizer: Optional[PathOptimizer] = None,
+                 metrics: Optional[Metrics] = None, max_in_flight: int = 16,
+                 screen_settle: bool = False, scheduler: Optional[SettleScheduler] = None,
+                 space: Optional[CoordinateSpace] = None, display: Optional[DisplayMetrics] = None,
+                 log: Optional[CommandLog] = None):
+        """
+        Initialize VM controller with connection details. With a coordinate
+        `space`, mouse coordinates are given in that space and mapped to the
+        VM's pixels using `display` (queried from the VM when not given).
+        Per-command output and history go to `log`.
+        """
+        if transport not in self.TRANSPORTS:
+            raise ValueError(f"Unknown transport '{transport}' (expected one of {sorted(self.TRANSPORTS)})")
+        if protocol not in self.PROTOCOLS:
+            raise ValueError(f"Unknown protocol '{protocol}' (expected one of {sorted(self.PROTOCOLS)})")
+        
         self.host = host
         self.username = username
         self.port = port
+        self.transport = transport
+        self.protocol = protocol
+        self.queue_window = queue_window
+        self.pool = pool or ConnectionPool.shared()
         self.ssh_client: Optional[paramiko.SSHClient] = None
+        self.session: Optional[ShellSession] = None
+        self.queues: Dict[str, CommandQueue] = {}
+        self._connection: Optional[PooledConnection] = None
+        self._generation = 0
+        self._last_device: Optional[str] = None
+        self.recorder: Optional[TrajectoryWriter] = None
+        self.optimizer = optimizer
+        self.metrics = metrics or Metrics(labels={'vm': f"{username}@{host}:{port}"})
+        self._pointer: Optional[Tuple[int, int]] = None
+        self.max_in_flight = max_in_flight
+        self._sender: Optional[SendQueue] = None
+        self._attach_lock = threading.Lock()
+        self.screen_settle = screen_settle
+        self.scheduler = scheduler or SettleScheduler(settings={'ui': (self.UI_SETTLE_TIME,)})
+        self._pickups: Set[str] = set()
+        self._screen: Optional[ScreenCapture] = None
+        self._sftp = None
+        self._sftp_generation = -1
+        self.space = space
+        self.display = display
+        self._transform: Transform = IDENTITY
+        self.log = log or CommandLog()
         self.connected = False
 
     # Establish SSH connection    
-    def connect(self, password: str) -> bool:
-        """Establish persistent SSH connection"""
+    def connect(self, password: Optional[str] = None, key_filename: Optional[str] = None,
+                timeout: Optional[float] = None) -> bool:
+        """
+        Establish persistent SSH connection (shared through the connection pool).
+        Without a password, authenticates with `key_filename`, the SSH agent
+        or the keys in ~/.ssh. `timeout` bounds the TCP connect, SSH banner
+        and authentication each (default: paramiko's).
+        """
+        key_auth = not password
+        limits = {} if timeout is None else {'timeout': timeout, 'banner_timeout': timeout,
+                                              'auth_timeout': timeout}
         try:
-            self.ssh_client = paramiko.SSHClient()
-            self.ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            
             print(f"[*] Connecting to {self.username}@{self.host}:{self.port}...")
-            self.ssh_client.connect(
-                hostname=self.host,
-                port=self.port,
-                username=self.username,
-                password=password,
-                look_for_keys=False,
-                allow_agent=False
+            self._connection = self.pool.acquire(
+                self.host, self.port, self.username, password or None,
+                key_filename=key_filename,
+                look_for_keys=key_auth and key_filename is None,
+                allow_agent=key_auth,
+                **limits
             )
+            self._attach()
+            
+            if self.protocol == 'queue':
+                for device in ('mouse', 'keyboard'):
+                    queue = CommandQueue(self._run_remote, device, window=self.queue_window,
+                                         on_ack=self._observe_ack)
+                    queue.open()
+                    self.queues[device] = queue
+            
+            if self.space:
+                self.set_space(self.space)
             
             self.connected = True
             print(f"[✓] Connected successfully!")
@@ -80,41 +166,276 @@ class VMController:
             
         except paramiko.AuthenticationException:
             print("[✗] Authentication failed. Invalid credentials.")
-            return False
         except paramiko.SSHException as e:
             print(f"[✗] SSH error: {e}")
-            return False
+        except SessionError as e:
+            print(f"[✗] Session error: {e}")
+        except CoordinateSpaceError as e:
+            print(f"[✗] Coordinate space: {e}")
         except Exception as e:
             print(f"[✗] Connection failed: {e}")
-            return False
+        
+        self._release()
+        return False
     
     # Close SSH connection
     def disconnect(self):
-        """Close SSH connection"""
-        if self.ssh_client:
-            self.ssh_client.close()
-            self.connected = False
+        """Close SSH connection (after any commands still queued with wait=False)"""
+        if self._sender:
+            self._sender.close()
+            self._sender = None
+        was_connected = self.connected
+        if was_connected and self.queues:
+            # Let the watchers finish what was queued, then remove this
+            # connection's spools; on failure they are left for the watcher
+            try:
+                self.drain()
+                for queue in self.queues.values():
+                    queue.close()
+            except (QueueError, ConnectionLostError, SessionError, paramiko.SSHException) as e:
+                print(f"[!] Queued commands did not finish before disconnect: {e}")
+        elif was_connected and self._pickups:
+            # A command file the watcher has not read yet would be lost to
+            # the next connection's first command
+            try:
+                self._await_pickup()
+            except (QueueError, ConnectionLostError, SessionError, paramiko.SSHException) as e:
+                print(f"[!] Commands were not picked up before disconnect: {e}")
+        self.connected = False
+        self.queues = {}
+        self._last_device = None
+        self._pickups = set()
+        self._screen = None
+        self._release()
+        self.log.flush()
+        if was_connected:
             print("[*] Disconnected from VM")
     
+    def _release(self):
+        if self._sftp:
+            self._sftp.close()
+            self._sftp = None
+        if self.session:
+            self.session.close()
+            self.session = None
+        if self._connection:
+            self.pool.release(self._connection)
+            self._connection = None
+        self.ssh_client = None
+    
+    # Bind to the pooled connection's current client
+    def _attach(self):
+        """Pick up the (possibly reconnected) client and reopen the shell session"""
+        with self._attach_lock:
+            self.ssh_client = self._connection.ensure()
+            if self._generation == self._connection.generation and (
+                    self.transport != 'session' or (self.session and self.session.is_open)):
+                return
+            
+            if self.session:
+                self.session.close()
+                self.session = None
+            if self.transport == 'session':
+                session = ShellSession(self.ssh_client.get_transport())
+                session.open()
+                self.session = session
+            self._generation = self._connection.generation
+    
+    # Connection health
+    def health(self) -> dict:
+        """Health state of this controller's pooled connection"""
+        if self._connection is None:
+            return {'host': self.host, 'port': self.port, 'username': self.username, 'state': 'closed'}
+        return self._connection.health()
+    
+    # Latency and throughput statistics
+    def stats(self) -> dict:
+        """Counters and latency percentiles for everything this controller has executed"""
+        return dict(self.metrics.snapshot(), settle=self.scheduler.snapshot())
+    
+    def export_stats(self, fmt: str = 'json') -> str:
+        """Statistics as JSON or Prometheus text ('json' or 'prometheus')"""
+        if fmt == 'prometheus':
+            return self.metrics.to_prometheus()
+        if fmt == 'json':
+            return self.metrics.to_json()
+        raise ValueError(f"Unknown stats format '{fmt}' (expected 'json' or 'prometheus')")
+    
+    def show_stats(self):
+        """Print latency percentiles per action and where the time went"""
+        histograms = self.stats()['histograms']
+        spans = [h for h in histograms if h['name'] == 'span_seconds']
+        phases = [h for h in histograms if h['name'] == 'phase_seconds']
+        if not spans:
+            print("[*] No commands executed yet")
+            return
+        
+        print(f"\n{'operation':<28} {'count':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for h in spans:
+            labels = h['labels']
+            name = labels.get('span', '?')
+            detail = labels.get('action') or labels.get('device') or labels.get('mode')
+            label = f"{name} {detail}" if detail else name
+            print(f"{label:<28} {h['count']:>7} {h['p50'] * 1000:>8.1f} {h['p95'] * 1000:>8.1f} "
+                  f"{h['p99'] * 1000:>8.1f} {h['max'] * 1000:>8.1f}")
+        
+        print(f"\n{'phase':<28} {'total s':>8} {'share':>7} {'p50 ms':>8} {'p99 ms':>8}")
+        total = sum(h['sum'] for h in phases) or 1.0
+        for h in sorted(phases, key=lambda h: -h['sum']):
+            label = f"{h['labels']['span']}.{h['labels']['phase']}"
+            print(f"{label:<28} {h['sum']:>8.2f} {h['sum'] / total:>7.1%} "
+                  f"{h['p50'] * 1000:>8.1f} {h['p99'] * 1000:>8.1f}")
+        
+        print(f"\n{'settle class':<28} {'settle ms':>9} {'acks':>7} {'ack ms':>8} {'jitter':>8}")
+        for name, e in self.scheduler.snapshot().items():
+            print(f"{name:<28} {e['settle'] * 1000:>9.0f} {e['samples']:>7} "
+                  f"{e['ack_latency'] * 1000:>8.1f} {e['ack_jitter'] * 1000:>8.1f}")
+    
     # Monitor connection health
     def _monitor_connection(self):
-        """Background thread to monitor SSH connection health"""
+        """Background thread reporting connection loss and recovery (the pool reconnects)"""
+        last_state = CONNECTED
         while self.connected:
+            state = self.health()['state']
+            if state != last_state:
+                if state == RECONNECTING:
+                    print("\n[!] Connection to VM lost. Reconnecting...")
+                elif state == DOWN:
+                    print("\n[!] Could not reconnect to VM. Commands will retry the connection.")
+                elif state == CONNECTED:
+                    print("\n[✓] Reconnected to VM.")
+                last_state = state
+            time.sleep(0.5)
+    
+    # Run a raw command on the VM
+    def _run_remote(self, remote_cmd: str) -> Tuple[int, str]:
+        """
+        Run a shell command on the VM over the configured transport; returns (exit status, stdout).
+        If the connection drops mid-command it is re-established, and the command is
+        replayed once or failed with ConnectionLostError depending on the pool's policy.
+        """
+        if self._connection is None:
+            raise ConnectionLostError("Not connected to VM")
+        
+        attempts = 2 if self.pool.policy.replay else 1
+        phase = self.metrics.phase
+        for attempt in range(attempts):
+            with phase('attach'):
+                self._attach()
             try:
-                if self.ssh_client:
-                    transport = self.ssh_client.get_transport()
-                    if transport is None or not transport.is_active():
-                        raise Exception("Transport closed")    
-                    transport.send_ignore()
-                time.sleep(3)
+                session = self.session
+                if session is not None:
+                    with phase('remote_write'):
+                        return session.run(remote_cmd)
                 
-            except Exception:
-                if self.connected:
-                    print("\n\n[!] Connection to VM lost unexpectedly.")
-                    print("[*] Shutting down...")
-                    self.connected = False
-                    os._exit(1)
-                break
+                with phase('channel_open'):
+                    stdin, stdout, stderr = self.ssh_client.exec_command(remote_cmd)
+                with phase('remote_write'):
+                    output = stdout.read().decode('utf-8', errors='replace')
+                with phase('exit_status'):
+                    return stdout.channel.recv_exit_status(), output  # Wait for completion
+            
+            except (SessionError, paramiko.SSHException, EOFError, socket.error) as e:
+                self._connection.mark_failed(e)
+                if isinstance(e, SessionError) and self.session:
+                    # Shell state is unknown after a failure; start a fresh one
+                    self.session.close()
+                    self.session = None
+                elif self._connection.is_alive():
+                    raise
+                if attempt + 1 >= attempts:
+                    raise ConnectionLostError(f"Connection lost during command: {e}")
+    
+    # Queue command on the sequenced spool
+    def _submit_queued(self, cmd_type: str, lines: List[str], switch: bool = True,
+                       action_class: Optional[str] = None) -> int:
+        """Write commands to their device queue, keeping mouse/keyboard order intact"""
+        # Mouse and keyboard are separate watchers; let the other device
+        # finish its queued work before switching so actions stay in order
+        if switch:
+            if self._last_device and self._last_device != cmd_type:
+                with self.metrics.phase('device_switch'):
+                    self.queues[self._last_device].drain()
+            self._last_device = cmd_type
+        
+        return self.queues[cmd_type].submit(lines, tag=action_class)
+    
+    # Wait for queued commands to execute
+    def drain(self):
+        """Block until the VM has consumed every queued command"""
+        for queue in self.queues.values():
+            queue.drain()
+    
+    # Pause needed after a command
+    def action_class(self, processed_cmd: str) -> str:
+        """Settle class of a command (see settle_scheduler.py)"""
+        return classify(default_parser.parse(processed_cmd), self.UI_OPENING_COMMANDS)
+    
+    def settle_time(self, processed_cmd: str) -> float:
+        """Seconds to wait after a command before sending the next one"""
+        return self.scheduler.settle_for(self.action_class(processed_cmd))
+    
+    def _observe_ack(self, action_class: Optional[str], latency: float, count: int):
+        if action_class:
+            self.scheduler.observe(action_class, latency, count)
+    
+    # Wait for the file protocol's watchers
+    def _await_pickup(self, device: Optional[str] = None):
+        """
+        Block until the watchers (or just `device`'s) have read the command
+        files written so far. The legacy watcher deletes its file on reading
+        it, which is the file protocol's only acknowledgement; it says nothing
+        about when the command finished, so it paces but is not learned from.
+        """
+        for cmd_type in [device] if device else list(self._pickups):
+            if cmd_type not in self._pickups:
+                continue
+            path = f"C:\\{cmd_type}_cmd.txt"
+            deadline = time.monotonic() + self.PICKUP_TIMEOUT
+            while 'busy' in self._run_remote(f'(if exist {path} echo busy)')[1]:
+                if time.monotonic() > deadline:
+                    raise QueueError(f"{cmd_type} watcher did not pick up {path}")
+                time.sleep(0.02)
+            self._pickups.discard(cmd_type)
+    
+    # Coordinate spaces
+    def set_space(self, space: Optional[CoordinateSpace], refresh: bool = False):
+        """
+        Give mouse coordinates in `space` from now on (None for raw pixels).
+        The transform is computed once from the display metrics, which are
+        queried on first use or with refresh=True (after a resolution change).
+        """
+        self.space = space
+        if space is None or not space.needs_metrics:
+            self._transform = IDENTITY
+            return
+        if self.display is None or refresh:
+            self.display = DisplayMetrics.query(self._run_remote)
+            print(f"[*] Displays: {self.display.describe()}")
+        self._transform = space.transform(self.display)
+        print(f"[*] Coordinate space: {space}")
+    
+    def to_screen(self, commands: List[str]) -> List[str]:
+        """Commands with their coordinates mapped from the current space to VM pixels"""
+        return self._transform.apply(commands)
+    
+    # Trajectory recording
+    def start_recording(self, path: str, compress: bool = False):
+        """Record every executed command, with timing and result, to a trajectory file"""
+        self.stop_recording()
+        self.recorder = TrajectoryWriter(path, compress=compress)
+        print(f"[*] Recording trajectory to {path}")
+    
+    def stop_recording(self):
+        """Finish the current trajectory file, if any"""
+        if self.recorder:
+            self.recorder.close()
+            print(f"[✓] Recorded {self.recorder.count} commands to {self.recorder.path}")
+            self.recorder = None
+    
+    def _record(self, processed_cmd: str, ok: bool):
+        if self.recorder:
+            self.recorder.record(processed_cmd, ok)
     
     # Smart command type detection
     def detect_command_type(self, command: str) -> Tuple[str, str]:
@@ -122,127 +443,425 @@ class VMController:
         Smart detection of command type (mouse/keyboard)
         Returns: (type, command)
         """
-        tokens = command.strip().split()
-        
-        if not tokens:
-            return 'invalid', command
-        
-        # Check if starts with coordinates (numbers)
-        if len(tokens) >= 2:
-            try:
-                int(tokens[0])
-                int(tokens[1])
-                # Has coordinates - likely mouse command
-                if len(tokens) >= 3 and tokens[2] in self.MOUSE_ACTIONS:
-                    return 'mouse', command
-                elif len(tokens) == 2:
-                    # Just coordinates, assume move
-                    return 'mouse', f"{command} move"
-            except ValueError:
-                pass
-        
-        # Check for "here" keyword (mouse)
-        if tokens[0] == 'here':
-            if len(tokens) >= 2 and tokens[1] in self.MOUSE_ACTIONS:
-                return 'mouse', command
-            else:
-                return 'invalid', command
-        
-        # Check for explicit keyboard actions
-        if tokens[0] in self.KEYBOARD_ACTIONS:
-            return 'keyboard', command
-        
-        # Check for modifier keys at start (e.g., ^, +, !, #)
-        modifier_pattern = r'^[\^+!#]'
-        if re.match(modifier_pattern, command):
-            return 'keyboard', f"press {command}"
-        
-        # Check for keyboard indicators (special keys) - but not if already has 'press'
-        if any(indicator in command for indicator in self.KEYBOARD_INDICATORS):
-            if not command.startswith('press '):
-                return 'keyboard', f"press {command}"
-            return 'keyboard', command
-        
-        # If none of the above, check if first token is mouse action
-        if tokens[0] in self.MOUSE_ACTIONS:
-            return 'mouse', command
-        
-        # Default: assume it's text to type
-        return 'keyboard', f"type {command}"
+        return default_parser.classify(command)
     
     # Execute command on VM
-    def execute_command(self, command: str) -> bool:
-        """Execute command on VM"""
+    def execute_command(self, command: str, wait: bool = True) -> Union[bool, Future]:
+        """
+        Execute command on VM. With wait=False the command is queued and a
+        Future is returned at once; it resolves to True or raises the failure.
+        Mouse commands keep their order, as do keyboard commands, but the
+        two devices run independently: wait on a click's future before
+        typing into what it focuses. Coordinates are in the controller's space.
+        """
+        command = self._transform.apply_line(command)
+        if not wait:
+            return self._send_queue().submit(command)
+        return self._execute_now(command)
+    
+    def _execute_now(self, command: str, position: Optional[Tuple[int, int]] = None) -> bool:
+        """execute_command for a command already in VM pixels"""
+        self.flush()
+        with self.metrics.span('execute') as span:
+            ok = self._execute_command(command, span, position=position)
+            span.ok = ok
+        return ok
+    
+    # Asynchronous execution
+    def _send_queue(self) -> SendQueue:
+        if self._sender is None:
+            self._sender = SendQueue(self._execute_async, self._lane_of,
+                                     window=self.max_in_flight, metrics=self.metrics)
+        return self._sender
+    
+    def _lane_of(self, command: str) -> str:
+        return self.detect_command_type(command)[0]
+    
+    def _execute_async(self, command: str) -> bool:
+        with self.metrics.span('execute') as span:
+            ok = self._execute_command(command, span, lane=True)
+            span.ok = ok
+        return ok
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every command queued with wait=False has finished"""
+        if self._sender is None:
+            return True
+        return self._sender.flush(timeout)
+    
+    def _execute_command(self, command: str, span, lane: bool = False,
+                         position: Optional[Tuple[int, int]] = None) -> bool:
+        # lane=True when running on a send queue worker: failures are raised
+        # for the command's Future, and each device's queue is left to its lane.
+        # position is (i, n) within a sequential batch, for the log
+        start = time.perf_counter()
         if not self.connected or self.ssh_client is None:
-            print("[✗] Not connected to VM")
+            self.log.command(None, command, 'error', 0.0, "Not connected to VM", position)
+            if lane:
+                raise ConnectionLostError("Not connected to VM")
             return False
         
         # Detect command type
-        cmd_type, processed_cmd = self.detect_command_type(command)
+        with span.phase('parse'):
+            cmd_type, processed_cmd = self.detect_command_type(command)
+            parsed = default_parser.parse(processed_cmd)
+        span.label(device=cmd_type, action=parsed.action.value)
+        span.describe(processed_cmd)
+        action_class = classify(parsed, self.UI_OPENING_COMMANDS)
         
         if cmd_type == 'invalid':
-            print(f"[✗] Invalid command: {command}")
+            self.log.command(cmd_type, command, 'invalid', time.perf_counter() - start, position=position)
+            self._record(processed_cmd, False)
+            self._count(parsed, 'invalid')
+            if lane:
+                raise ValueError(f"Invalid command: {command}")
             return False
         
+        # Skip moves that cannot change anything
+        if self.optimizer and self.optimizer.is_redundant(parsed, self._pointer):
+            self.log.command(cmd_type, processed_cmd, 'skipped', time.perf_counter() - start, position=position)
+            self.metrics.increment('eliminated_total')
+            return True
+        
         # Build the SSH command
         if cmd_type == 'mouse':
             remote_cmd = f'echo {processed_cmd} > C:\\mouse_cmd.txt'
-            prefix = "[MOUSE]"
         else:
             escaped_cmd = processed_cmd.replace('^', '^^')
             remote_cmd = f'echo {escaped_cmd} > C:\\keyboard_cmd.txt'
-            prefix = "[KEYBOARD]"
         
         try:
             # Execute command
-            stdin, stdout, stderr = self.ssh_client.exec_command(remote_cmd)
-            stdout.channel.recv_exit_status()  # Wait for completion
-            
-            # Enhanced feedback for drag operations
-            if 'drag' in processed_cmd:
-                parts = processed_cmd.split()
-                if len(parts) >= 5:
-                    print(f"{prefix} Drag: ({parts[0]},{parts[1]}) → ({parts[3]},{parts[4]})")
-                else:
-                    print(f"{prefix} Executed: {processed_cmd}")
+            seq = None
+            if self.protocol == 'queue':
+                with span.phase('queue'):
+                    seq = self._submit_queued(cmd_type, [processed_cmd], switch=not lane,
+                                              action_class=action_class)
             else:
-                print(f"{prefix} Executed: {processed_cmd}")
-                
-            ui_opening_commands = [
-                'press #r',
-                'press #',
-                'press !{Tab}',
-                'press ^+{Esc}',
-            ]
+                if cmd_type in self._pickups:
+                    # Never overwrite a command file the watcher has not read yet
+                    with span.phase('ack_wait'):
+                        self._await_pickup(cmd_type)
+                self._run_remote(remote_cmd)
+                self._pickups.add(cmd_type)
             
-            # Check if this command opens a UI element
-            for ui_cmd in ui_opening_commands:
-                if ui_cmd in processed_cmd:
-                    time.sleep(0.3)
-                    break
+            # Give the VM time to react (UI elements opening, drops, ...)
+            settle = self.scheduler.settle_for(action_class)
+            if settle:
+                # The reaction only starts once the watcher runs the command
+                with span.phase('ack_wait'):
+                    if seq is not None:
+                        self.queues[cmd_type].wait_for(seq)
+                    else:
+                        self._await_pickup(cmd_type)
+                with span.phase('settle'):
+                    if self.screen_settle and action_class == 'ui':
+                        # Wait for the UI to stop changing instead of a fixed pause
+                        report = self._screen_capture().wait_until_stable(
+                            stable_for=self.SCREEN_STABLE_TIME, timeout=self.SCREEN_SETTLE_TIMEOUT,
+                            change_timeout=settle)
+                        self.scheduler.record(action_class, report['wait_time'])
+                    else:
+                        self.scheduler.wait(action_class, settle)
             
+            # Track the pointer so redundant moves can be skipped
+            if parsed.x is not None:
+                self._pointer = (parsed.x2, parsed.y2) if parsed.x2 is not None else (parsed.x, parsed.y)
+            
+            self.log.command(cmd_type, processed_cmd, 'ok', time.perf_counter() - start, position=position)
+            self._record(processed_cmd, True)
+            self._count(parsed, 'ok')
             return True
             
         except Exception as e:
-            print(f"[✗] Execution failed: {e}")
+            self.log.command(cmd_type, processed_cmd, 'error', time.perf_counter() - start,
+                             f"Execution failed: {e}", position)
+            self._record(processed_cmd, False)
+            self._count(parsed, 'error')
+            if lane:
+                raise
             return False
     
+    # Bulk typing
+    def type_bulk(self, source: Source, profile: str = 'balanced', chunk: Optional[int] = None,
+                  pause: Optional[int] = None, key_delay: Optional[int] = None,
+                  timeout: Optional[float] = None) -> dict:
+        """
+        Type arbitrarily large text (a string, text file object or iterable of
+        strings) by uploading it over SFTP and letting the keyboard watcher
+        type the file. `profile` picks chunk size, pause between chunks and
+        key delay (see TYPING_PROFILES); explicit values override it.
+        Blocks until the text has been typed; returns a throughput report.
+        """
+        if profile not in TYPING_PROFILES:
+            raise ValueError(f"Unknown typing profile '{profile}' (expected one of {sorted(TYPING_PROFILES)})")
+        default_chunk, default_pause, default_delay = TYPING_PROFILES[profile]
+        chunk = default_chunk if chunk is None else chunk
+        pause = default_pause if pause is None else pause
+        key_delay = default_delay if key_delay is None else key_delay
+        if chunk < 1:
+            raise ValueError("Chunk size must be at least 1 character")
+        if not self.connected or self.ssh_client is None:
+            raise ConnectionLostError("Not connected to VM")
+        
+        self.flush()
+        start = time.perf_counter()
+        with self.metrics.span('type_bulk', profile=profile) as span:
+            with span.phase('attach'):
+                self._attach()
+                sftp = self.ssh_client.open_sftp()
+            sftp_path, windows_path = new_payload()
+            try:
+                with span.phase('upload'):
+                    ensure_root(sftp)
+                    chars, size = upload_text(sftp, source, sftp_path)
+                upload_time = time.perf_counter() - start
+                print(f"[KEYBOARD] Uploaded {chars} chars ({size / 1024:.0f} KB) in {upload_time:.2f}s")
+                
+                line = typefile_command(windows_path, chunk, pause, key_delay)
+                with span.phase('queue'):
+                    if self.protocol == 'queue':
+                        self._submit_queued('keyboard', [line])
+                    else:
+                        self._run_remote(f'echo {line} > C:\\keyboard_cmd.txt')
+                with span.phase('typing'):
+                    typing_time = wait_typed(sftp, sftp_path, timeout=timeout)
+            except Exception:
+                # Whatever went wrong (a dropped connection, a queue that
+                # stopped acknowledging, ...), do not leave a payload behind
+                # for the watcher to type later
+                for path in (sftp_path, sftp_path + '.typing'):
+                    try:
+                        sftp.remove(path)
+                    except Exception:
+                        pass
+                raise
+            finally:
+                sftp.close()
+        
+        wall_time = time.perf_counter() - start
+        self.metrics.increment('typed_chars_total', chars)
+        report = {
+            'chars': chars,
+            'bytes': size,
+            'upload_time': upload_time,
+            'typing_time': typing_time,
+            'wall_time': wall_time,
+            'chars_per_sec': chars / wall_time if wall_time > 0 else 0.0,
+        }
+        print(f"[✓] Typed {chars} chars in {wall_time:.2f}s ({report['chars_per_sec']:.0f} chars/sec)")
+        return report
+    
+    # Screen capture
+    def capture_screen(self, region: Optional[Region] = None, scale: float = 1.0,
+                       delta: bool = True, tile: int = 32) -> Frame:
+        """
+        Screenshot of the VM's desktop, or of a (x, y, w, h) region of it,
+        downscaled by `scale`. With delta=True only tiles that changed since
+        the previous capture of the same region and scale are transferred;
+        frame.changed lists them. Needs screen_capture.ps1 running on the VM.
+        """
+        if not self.connected or self.ssh_client is None:
+            raise ConnectionLostError("Not connected to VM")
+        with self.metrics.span('capture', mode='delta' if delta else 'full') as span:
+            frame = self._screen_capture().capture(region, scale, tile, delta, phase=span.phase)
+        self.metrics.increment('capture_bytes_total', frame.transferred)
+        return frame
+    
+    def wait_until_screen_stable(self, region: Optional[Region] = None, scale: float = 0.25,
+                                 stable_for: float = 0.3, timeout: float = 5.0,
+                                 tolerance: float = 0.0) -> dict:
+        """
+        Block until the screen (or region) has not changed for `stable_for`
+        seconds, comparing small delta frames. `tolerance` is the share of
+        tiles allowed to change (e.g. a blinking caret). Returns a report:
+        stable, wait_time, captures and the last frame.
+        """
+        if not self.connected or self.ssh_client is None:
+            raise ConnectionLostError("Not connected to VM")
+        with self.metrics.span('screen_stable') as span:
+            return self._screen_capture().wait_until_stable(region, scale, stable_for, timeout, tolerance,
+                                                            phase=span.phase)
+    
+    def _screen_capture(self) -> ScreenCapture:
+        if self._screen is None:
+            self._screen = ScreenCapture(self._run_remote, self._open_sftp)
+        return self._screen
+    
+    def _open_sftp(self):
+        """SFTP client on the current connection, reused until it reconnects"""
+        self._attach()
+        if self._sftp is None or self._sftp_generation != self._generation:
+            if self._sftp:
+                self._sftp.close()
+            self._sftp = self.ssh_client.open_sftp()
+            self._sftp_generation = self._generation
+        return self._sftp
+    
+    def _count(self, parsed, result: str, count: int = 1):
+        self.metrics.increment('commands_total', count, device=parsed.kind,
+                               action=parsed.action.value, result=result)
+    
     # Batch mode execution
-    def batch_mode(self, commands: list, delay: float = 0.1):
-        """Execute a batch of commands with optional delays"""
-        print(f"\n[*] Batch mode: Executing {len(commands)} commands...")
+    def batch_mode(self, commands: Iterable[str], delay: Optional[float] = None,
+                   window: int = 1024) -> dict:
+        """
+        Execute a batch of commands with optional delays; returns a timing report.
+        Anything but a list or tuple is read as a stream (e.g. an expanded
+        macro) and sent `window` lines at a time, still as one batch.
+        """
+        self.flush()
+        self.log.flush()
+        streaming = not isinstance(commands, (list, tuple))
+        if streaming:
+            print("\n[*] Batch mode: Executing command stream...")
+        else:
+            print(f"\n[*] Batch mode: Executing {len(commands)} commands...")
         
+        pipelined = self.protocol == 'queue' and delay is None
+        with self.metrics.span('batch', mode='pipelined' if pipelined else 'sequential') as span:
+            with self.scheduler.run() as tally:
+                if streaming:
+                    report = self._stream_batch(commands, delay, pipelined, span, window)
+                else:
+                    report = self._batch(commands, delay, pipelined, span)
+            report['settle'] = tally.report()
+            span.ok = report['failed'] == 0
+        
+        # Per-command lines first, then the summary
+        self.log.flush()
+        print(f"\n[✓] Batch execution complete! {report['commands']} commands in "
+              f"{report['wall_time']:.2f}s ({report['ops_per_sec']:.1f} ops/sec)")
+        settle = report['settle']
+        if settle['by_class']:
+            detail = ', '.join(f"{name} {c['count']}x{c['seconds'] / c['count']:.2f}s"
+                               for name, c in settle['by_class'].items())
+            print(f"[*] Settle time: {settle['total']:.2f}s ({detail}; {settle['mode']})")
+        return report
+    
+    def _batch(self, commands: list, delay: Optional[float], pipelined: bool, span) -> dict:
+        if not self._transform.is_identity:
+            with span.phase('transform'):
+                commands = self._transform.apply(commands)
+        
+        eliminated = 0
+        if self.optimizer:
+            with span.phase('optimize'):
+                commands, stats = self.optimizer.optimize(commands)
+            eliminated = self._optimized(stats)
+        
+        # The queue protocol loses nothing when commands arrive back to back,
+        # so the whole script is pipelined unless a delay is explicitly requested
+        if pipelined:
+            report = BatchEngine(self).run(commands)
+        else:
+            report = self._sequential_batch(commands, delay)
+        report['eliminated'] = eliminated
+        # Position after a batch is not tracked command by command
+        self._pointer = None
+        return report
+    
+    def _stream_batch(self, commands: Iterable[str], delay: Optional[float], pipelined: bool,
+                      span, window: int) -> dict:
+        """_batch for a stream: transformed and optimized as it is read, sent `window` lines at a time"""
+        start = time.perf_counter()
+        lines = iter(commands)
+        if not self._transform.is_identity:
+            lines = self._transformed(lines, window)
+        stats = None
+        if self.optimizer:
+            stats = self.optimizer.new_report()
+            lines = self.optimizer.stream(lines, stats)
+        
+        report = {'commands': 0, 'payloads': 0, 'failed': 0, 'invalid': 0}
+        first = True
+        while True:
+            with span.phase('prepare'):
+                part = list(islice(lines, window))
+            if not part:
+                break
+            if delay and not first:
+                with self.metrics.phase('delay'):
+                    time.sleep(delay)
+            first = False
+            done = BatchEngine(self).run(part) if pipelined else self._sequential_batch(part, delay)
+            for key in report:
+                report[key] += done[key]
+        
+        wall_time = time.perf_counter() - start
+        report['wall_time'] = wall_time
+        report['ops_per_sec'] = report['commands'] / wall_time if wall_time > 0 else 0.0
+        report['eliminated'] = self._optimized(stats) if stats else 0
+        self._pointer = None
+        return report
+    
+    def _transformed(self, lines: Iterator[str], window: int) -> Iterator[str]:
+        """Map a stream of commands to VM pixels, `window` lines at a time"""
+        while True:
+            part = list(islice(lines, window))
+            if not part:
+                return
+            yield from self._transform.apply(part)
+    
+    def _optimized(self, stats: dict) -> int:
+        """Record and print a path optimizer report; returns how many commands it eliminated"""
+        eliminated = stats['eliminated']
+        self.metrics.increment('eliminated_total', eliminated)
+        print(f"[*] Path optimizer: {stats['input']} → {stats['output']} commands "
+              f"({eliminated} eliminated: {stats['here_moves']} here-moves, "
+              f"{stats['duplicates']} duplicates, {stats['merged']} merged, "
+              f"{stats['simplified']} simplified)")
+        return eliminated
+    
+    # One command at a time
+    def _sequential_batch(self, commands: list, delay: Optional[float]) -> dict:
+        """
+        Execute commands one by one, sleeping `delay` between them. Without a
+        delay each command waits until the watcher has picked up the previous
+        one (so none is overwritten), plus its class's settle time.
+        """
+        start = time.perf_counter()
+        sent = 0
+        failed = 0
         for i, command in enumerate(commands, 1):
             if not command.strip():
                 continue
             
-            print(f"\n[{i}/{len(commands)}] ", end="")
-            self.execute_command(command.strip())
+            if self._execute_now(command.strip(), (i, len(commands))):
+                sent += 1
+            else:
+                failed += 1
             
-            if i < len(commands):
-                time.sleep(delay)
+            if i < len(commands) and delay:
+                with self.metrics.phase('delay'):
+                    time.sleep(delay)
+            elif delay is None and self._pickups:
+                with self.metrics.phase('ack_wait'):
+                    try:
+                        self._await_pickup()
+                    except (QueueError, ConnectionLostError) as e:
+                        self.log.message('error', f"[✗] {e}")
+        
+        if self.queues:
+            try:
+                with self.metrics.phase('drain'):
+                    self.drain()
+            except Exception as e:
+                # Commands the watchers never acknowledged did not run
+                undone = sum(queue.in_flight for queue in self.queues.values())
+                sent -= undone
+                failed += undone
+                self.log.message('error', f"[✗] Queue did not drain: {e}")
         
-        print("\n[✓] Batch execution complete!")
+        wall_time = time.perf_counter() - start
+        return {
+            'commands': sent,
+            'payloads': sent,
+            'failed': failed,
+            'invalid': 0,
+            'wall_time': wall_time,
+            'ops_per_sec': sent / wall_time if wall_time > 0 else 0.0,
+        }
     
     # Interactive mode
     def interactive_mode(self):
@@ -256,6 +875,9 @@ class VMController:
         print("  Keyboard: press <keys>      (e.g., press ^c)")
         print("  Special:  exit, quit        (disconnect)")
         print("  Special:  help              (show this help)")
+        print("  Special:  status            (connection health)")
+        print("  Special:  stats             (latency percentiles and phases)")
+        print("  Special:  history [N]       (last N commands; history dump FILE saves all kept)")
         print("="*60 + "\n")
         
         monitor_thread = threading.Thread(target=self._monitor_connection, daemon=True)
@@ -277,8 +899,24 @@ class VMController:
                     self.show_help()
                     continue
                 
+                if user_input.lower() == 'stats':
+                    self.show_stats()
+                    continue
+                
+                if user_input.split()[0].lower() == 'history':
+                    self.show_history(user_input.split()[1:])
+                    continue
+                
+                if user_input.lower() == 'status':
+                    health = self.health()
+                    print(f"[*] {health['state']}: {self.username}@{self.host}:{self.port}"
+                          f" (reconnects: {health.get('reconnects', 0)},"
+                          f" last error: {health.get('last_error') or 'none'})")
+                    continue
+                
                 # Execute user command
                 self.execute_command(user_input)
+                self.log.flush()
                 
             except KeyboardInterrupt:
                 print("\n[*] Interrupted. Type 'exit' to disconnect.")
@@ -288,6 +926,31 @@ class VMController:
         
         self.disconnect()
     
+    # Show recent commands
+    def show_history(self, args: List[str]):
+        """`history [N]` prints the last N commands (default 20); `history dump FILE` saves all kept"""
+        if args and args[0].lower() == 'dump':
+            if len(args) != 2:
+                print("[✗] Usage: history dump FILE")
+                return
+            try:
+                count = self.log.dump(args[1])
+            except OSError as e:
+                print(f"[✗] Could not write {args[1]}: {e}")
+                return
+            print(f"[✓] Wrote {count} commands to {args[1]}")
+            return
+        try:
+            count = int(args[0]) if args else 20
+        except ValueError:
+            print("[✗] Usage: history [N] | history dump FILE")
+            return
+        entries = self.log.recent(count)
+        if not entries:
+            print("[*] No commands yet")
+            return
+        print(format_history(entries))
+    
     # Show help information
     def show_help(self):
         """Display help information"""
@@ -336,16 +999,32 @@ def show_version():
     print("=" * 50)
     print(f"Windows Actuation Control v{__version__}")
     print("=" * 50)
+    import platform
+    
     print(f"  * OS: {platform.system()} {platform.release()}")
     print(f"  * Architecture: {platform.machine()}")
     print("=" * 50)
 
 # Update mechanism
-def update_tool(check_only: bool = False):
-    """Check for updates and install the latest version"""
+def update_tool(check_only: bool = False, cache_dir: Optional[str] = None,
+                allow_unverified: bool = False):
+    """
+    Check for updates and install the latest version. Release archives
+    are kept in `cache_dir` (default: the per-user cache), so every client
+    sharing it downloads each release once. A release without a published
+    SHA-256 is only installed with allow_unverified, and is not cached.
+    """
+    # Update-only dependencies; importing them here keeps command startup fast
+    import platform
+    import shutil
+    import tempfile
+    import requests
+    from release_download import DownloadError, extract_member, fetch, published_checksum
+    
     print("[*] Checking for updates...")
     print(f"    Current version: v{__version__}")
     
+    unverified = None
     try:
         # 1. Get latest release from GitHub
         release_url = f"https://api.github.com/repos/{REPO}/releases/latest"
@@ -381,37 +1060,39 @@ def update_tool(check_only: bool = False):
         file_name = f"windows-actuation-{latest_version}-win-{arch}.zip"
         
         download_url = f"https://github.com/{REPO}/releases/download/{latest_tag}/{file_name}"
+        sha256 = published_checksum(latest_release, file_name)
+        if not sha256:
+            if not allow_unverified:
+                print("[✗] This release publishes no SHA-256 checksum, so the download cannot be verified.")
+                print("    Run 'windows-actuation update --allow-unverified' to install it anyway.")
+                return
+            print("[!] This release publishes no SHA-256 checksum; installing it unverified (not cached)")
         print(f"\n[*] Downloading {file_name}...")
 
-        # Download
-        download_response = requests.get(download_url, stream=True, timeout=30)
-        download_response.raise_for_status()
+        # Download (resumable, into the shared release cache)
+        shown = [0.0]
         
-        temp_dir = tempfile.mkdtemp()
-        temp_file = os.path.join(temp_dir, file_name)
+        def show_progress(done: int, total: Optional[int]):
+            now = time.monotonic()
+            if now - shown[0] >= 0.5 or done == total:
+                shown[0] = now
+                of = f" / {total / 2 ** 20:.1f}" if total else ''
+                print(f"\r    {done / 2 ** 20:.1f}{of} MB", end='', flush=True)
         
-        with open(temp_file, 'wb') as f:
-            for chunk in download_response.iter_content(chunk_size=8192):
-                f.write(chunk)
+        archive = fetch(download_url, file_name, sha256, cache_dir, progress=show_progress)
+        if shown[0]:
+            print()
+        if sha256:
+            print("[✓] Checksum verified")
+        else:
+            # fetch() put the unverified archive in a directory of its own
+            unverified = os.path.dirname(archive)
                 
-        # Extract
+        # Extract just the binary
         print("[*] Installing update...")
-        with zipfile.ZipFile(temp_file, 'r') as zf:
-            zf.extractall(temp_dir)
-
-        # Replace Binary
         binary_name = 'windows-actuation.exe'
-        extracted_bin = os.path.join(temp_dir, binary_name)
-        
-        if not os.path.exists(extracted_bin):
-            # Check subfolders
-            found = list(Path(temp_dir).rglob(binary_name))
-            if found:
-                extracted_bin = str(found[0])
-            else:
-                print(f"[✗] Error: Could not find '{binary_name}' in archive.")
-                shutil.rmtree(temp_dir)
-                return
+        temp_dir = tempfile.mkdtemp()
+        extracted_bin = extract_member(archive, binary_name, os.path.join(temp_dir, binary_name))
 
         current_exe = sys.executable if getattr(sys, 'frozen', False) else __file__
         current_exe_path = Path(current_exe).resolve()
@@ -438,12 +1119,20 @@ def update_tool(check_only: bool = False):
         finally:
             shutil.rmtree(temp_dir)
 
+    except DownloadError as e:
+        print(f"\n[✗] Update failed: {e}")
+        print("[*] Run 'windows-actuation update' again to resume the download.")
     except Exception as e:
         print(f"[✗] Update failed: {e}")
+    finally:
+        if unverified:
+            shutil.rmtree(unverified, ignore_errors=True)
 
 # Uninstallation mechanism
 def uninstall_tool():
     """Uninstall the tool from the system"""
+    import subprocess
+    
     print("=" * 50)
     print("Windows Actuation Control - Uninstall")
     print("=" * 50)
@@ -487,6 +1176,294 @@ def uninstall_tool():
         print(f"[✗] Uninstall failed: {e}")
         print(f"    Please delete '{target_path.name}' manually.")
 
+# Replay a trajectory file
+def replay_trajectory(controller: VMController, path: str, speed: float = 1.0) -> Optional[dict]:
+    """Replay a trajectory or text command file through a connected controller; None if it failed"""
+    try:
+        if is_trajectory(path):
+            events = TrajectoryReader(path)
+        else:
+            with open(path, 'r', encoding='utf-8') as f:
+                events = list(from_text(f))
+        
+        timing = f"{speed}x timing" if speed else "as fast as possible"
+        print(f"[*] Replaying {path} ({timing})...")
+        report = replay(controller, events, speed=speed)
+    except (OSError, UnicodeDecodeError, TrajectoryError, QueueError, ConnectionLostError,
+            SessionError, paramiko.SSHException) as e:
+        controller.log.flush()
+        print(f"[✗] Replay failed: {e}")
+        return None
+    controller.log.flush()
+    print(f"\n[✓] Replay complete! {report['commands']} commands in "
+          f"{report['wall_time']:.2f}s ({report['failed']} failed)")
+    return report
+
+# Bulk type a text file
+def type_file(controller: VMController, path: str, profile: str = 'balanced',
+              chunk: Optional[int] = None, key_delay: Optional[int] = None) -> Optional[dict]:
+    """Bulk type a text file ('-' for stdin) on the VM"""
+    try:
+        if path == '-':
+            return controller.type_bulk(sys.stdin, profile=profile, chunk=chunk, key_delay=key_delay)
+        with open(path, encoding='utf-8') as f:
+            return controller.type_bulk(f, profile=profile, chunk=chunk, key_delay=key_delay)
+    except (OSError, UnicodeDecodeError, BulkTypingError, ConnectionLostError) as e:
+        print(f"[✗] Bulk typing failed: {e}")
+        return None
+
+# Save a screenshot
+def save_screenshot(controller: VMController, path: str, region: Optional[str] = None,
+                    scale: float = 1.0) -> bool:
+    """Capture the VM screen (region as 'X,Y,W,H') and save it as PNG"""
+    try:
+        box = tuple(int(v) for v in region.split(',')) if region else None
+        if box is not None and len(box) != 4:
+            raise ValueError("Region must be X,Y,W,H")
+        frame = controller.capture_screen(box, scale, delta=False)
+        frame.save(path)
+    except (OSError, ValueError, CaptureError, ConnectionLostError) as e:
+        print(f"[✗] Screenshot failed: {e}")
+        return False
+    print(f"[✓] Screenshot {frame.width}x{frame.height} saved to {path}")
+    return True
+
+# Write statistics to a file
+def write_stats(controller: VMController, path: str):
+    """Save the controller's statistics as Prometheus text (*.prom) or JSON"""
+    fmt = 'prometheus' if path.endswith('.prom') else 'json'
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(controller.export_stats(fmt))
+        print(f"[✓] Stats written to {path}")
+    except OSError as e:
+        print(f"[✗] Could not write stats: {e}")
+
+# Conversion between trajectories and text command files
+def convert_trajectory(argv: List[str]):
+    """windows-actuation convert <src> <dst> [--compress] [--interval S]"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(
+        prog='windows-actuation convert',
+        description='Convert a trajectory to a text command file, or a text command file to a trajectory')
+    parser.add_argument('src', help='Trajectory or text command file')
+    parser.add_argument('dst', help='Output file')
+    parser.add_argument('--compress', action='store_true', help='Gzip the output trajectory')
+    parser.add_argument('--interval', type=float, default=0.1,
+                        help='Seconds between commands when converting text (default: 0.1)')
+    args = parser.parse_args(argv)
+    
+    try:
+        count = convert(args.src, args.dst, compress=args.compress, interval=args.interval)
+    except (OSError, UnicodeDecodeError, TrajectoryError) as e:
+        print(f"[✗] Conversion failed: {e}")
+        sys.exit(1)
+    print(f"[✓] Wrote {count} commands to {args.dst}")
+
+# Rescale recordings between screen resolutions
+def rescale_recording(argv: List[str]):
+    """windows-actuation rescale <src> <dst> --from WxH --to WxH [--compress]"""
+    import argparse
+    from coordinate_space import parse_resolution, rescale
+    
+    parser = argparse.ArgumentParser(
+        prog='windows-actuation rescale',
+        description='Map the mouse coordinates of a trajectory or text command file to another screen resolution')
+    parser.add_argument('src', help='Trajectory or text command file')
+    parser.add_argument('dst', help='Output file (same format as src)')
+    parser.add_argument('--from', dest='source', required=True, metavar='WxH', help='Resolution it was recorded at')
+    parser.add_argument('--to', dest='target', required=True, metavar='WxH', help='Resolution to map to')
+    parser.add_argument('--compress', action='store_true', help='Gzip the output trajectory')
+    args = parser.parse_args(argv)
+    
+    try:
+        count = rescale(args.src, args.dst, parse_resolution(args.source), parse_resolution(args.target),
+                        compress=True if args.compress else None)
+    except (OSError, UnicodeDecodeError, TrajectoryError, CoordinateSpaceError) as e:
+        print(f"[✗] Rescaling failed: {e}")
+        sys.exit(1)
+    print(f"[✓] Wrote {count} commands to {args.dst} ({args.source} → {args.target})")
+
+# Connection settings
+def load_config(path: Optional[str] = None) -> dict:
+    """Connection defaults from the [default] section of the config file, if it exists"""
+    path = os.path.expanduser(path or DEFAULT_CONFIG)
+    if not os.path.exists(path):
+        return {}
+    import configparser
+    
+    parser = configparser.ConfigParser(interpolation=None)
+    parser.read(path, encoding='utf-8')
+    if not parser.has_section('default'):
+        return {}
+    return {key: value for key, value in parser.items('default') if key in CONFIG_KEYS}
+
+def resolve_settings(args) -> dict:
+    """Each connection setting from the command line, else $WAC_<KEY>, else the config file"""
+    config = load_config(args.config or os.environ.get('WAC_CONFIG'))
+    settings = {}
+    for key in CONFIG_KEYS:
+        value = getattr(args, key, None)
+        if value is None:
+            value = os.environ.get(f"WAC_{key.upper()}")
+        if value is None:
+            value = config.get(key)
+        settings[key] = value
+    if settings['key_file']:
+        # paramiko takes the path as is
+        settings['key_file'] = os.path.expanduser(settings['key_file'])
+    for key, choices in (('transport', VMController.TRANSPORTS), ('protocol', VMController.PROTOCOLS)):
+        if settings[key] is not None and settings[key] not in choices:
+            print(f"[✗] Unknown {key} '{settings[key]}' (expected one of {sorted(choices)})")
+            sys.exit(1)
+    return settings
+
+# Run a command file
+def run_command_file(controller: VMController, path: str, delay: Optional[float] = None,
+                     variables: Optional[dict] = None, cache: bool = True) -> bool:
+    """
+    Batch-execute a command file, skipping blank and '# ' comment lines.
+    Macro directives (@repeat, @set, ${...}, ...) are compiled once, cached,
+    and expanded as the batch runs.
+    """
+    from macros import DEFAULT_CACHE_DIR, MacroError, compile_file, execute
+    
+    try:
+        program = compile_file(path, DEFAULT_CACHE_DIR if cache else None)
+        report = execute(controller, program.expand(variables), delay)
+    except MacroError as e:
+        print(f"[✗] {e}")
+        return False
+    return report['failed'] == 0 and report['invalid'] == 0
+
+# Expand a macro script into a plain command file
+def expand_script(argv: List[str]):
+    """windows-actuation expand <script> [-o OUT] [--var NAME=VALUE ...]"""
+    import argparse
+    from macros import DEFAULT_CACHE_DIR, MacroError, compile_file, parse_variables
+    
+    parser = argparse.ArgumentParser(
+        prog='windows-actuation expand',
+        description='Expand a macro script into the plain commands it would run')
+    parser.add_argument('script', help='Command file with macro directives')
+    parser.add_argument('-o', '--output', help='Output file (default: stdout)')
+    parser.add_argument('--var', action='append', default=[], metavar='NAME=VALUE',
+                        help='Set a script variable; repeatable')
+    parser.add_argument('--no-cache', action='store_true', help='Compile without the on-disk cache')
+    args = parser.parse_args(argv)
+    
+    count = 0
+    try:
+        program = compile_file(args.script, None if args.no_cache else DEFAULT_CACHE_DIR)
+        out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+        try:
+            for line in program.expand(parse_variables(args.var)):
+                out.write(line + '\n')
+                count += 1
+        finally:
+            if args.output:
+                out.close()
+    except (OSError, MacroError) as e:
+        print(f"[✗] Expansion failed: {e}", file=sys.stderr)
+        sys.exit(1)
+    if args.output:
+        print(f"[✓] Wrote {count} commands to {args.output}")
+
+# Run scripts on many VMs in parallel
+def run_fleet(argv: List[str]):
+    """windows-actuation fleet <inventory> [-f SCRIPT] [--parallel N] [--timeout S] [--json OUT]"""
+    import argparse
+    import json
+    from fleet import FleetError, FleetRunner, load_inventory, summary_table
+    from macros import MacroError, parse_variables
+
+    parser = argparse.ArgumentParser(
+        prog='windows-actuation fleet',
+        description='Run command scripts on every VM of an inventory in parallel, with a summary per VM')
+    parser.add_argument('inventory', help='INI file with one [section] per VM')
+    parser.add_argument('-f', '--file', help='Script for VMs whose section sets none')
+    parser.add_argument('--parallel', type=int, default=8, help='VMs running at once (default: 8)')
+    parser.add_argument('--timeout', type=float, help='Abandon a VM still running after this many seconds')
+    parser.add_argument('--connect-timeout', type=float, default=15.0,
+                        help='Seconds to wait for each VM to connect (default: 15)')
+    parser.add_argument('-d', '--delay', type=float, help='Delay between commands (default: adaptive)')
+    parser.add_argument('--settle-mode', choices=SettleScheduler.MODES, default='adaptive',
+                        help='Settle delays after commands (default: adaptive)')
+    parser.add_argument('--var', action='append', default=[], metavar='NAME=VALUE',
+                        help='Set a script variable on every VM; repeatable')
+    parser.add_argument('--log-dir', help='Write each VM\'s output to DIR/<name>.log')
+    parser.add_argument('--json', metavar='OUT', help='Write per-VM results as JSON')
+    parser.add_argument('--progress', type=float, default=10.0, metavar='S',
+                        help='Seconds between progress lines; 0 disables (default: 10)')
+    parser.add_argument('--no-macro-cache', action='store_true', help='Compile scripts without the on-disk cache')
+    args = parser.parse_args(argv)
+
+    try:
+        hosts = load_inventory(args.inventory, args.file)
+        runner = FleetRunner(hosts, args.parallel, args.timeout, args.connect_timeout, args.delay,
+                             parse_variables(args.var), args.settle_mode, args.log_dir,
+                             progress_interval=args.progress, cache=not args.no_macro_cache)
+    except (FleetError, MacroError, ValueError) as e:
+        print(f"[✗] {e}")
+        sys.exit(1)
+
+    print(f"[*] Running {len(hosts)} VMs, {min(args.parallel, len(hosts))} at a time")
+    results = runner.run()
+    print()
+    print(summary_table(results))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"[✓] Results written to {args.json}")
+    if any(result['status'] != 'ok' for result in results):
+        sys.exit(1)
+
+# Run the multiplexed control daemon
+def serve_control(argv: List[str]):
+    """windows-actuation serve [--listen ADDR] [--connect USER@HOST[:PORT] ...]"""
+    import argparse
+    from control_server import ControlServer, parse_address
+    
+    parser = argparse.ArgumentParser(
+        prog='windows-actuation serve',
+        description='Keep VM sessions open and serve agent processes over a local socket (NDJSON or msgpack)')
+    parser.add_argument('--listen', metavar='ADDR',
+                        help='Unix socket path, PORT or HOST:PORT for loopback TCP (default: per-user socket in the temp dir)')
+    parser.add_argument('--connect', metavar='USER@HOST[:PORT]', action='append', default=[],
+                        help='Connect a VM at startup; repeatable (password prompted, or $WAC_PASSWORD)')
+    parser.add_argument('--transport', choices=sorted(VMController.TRANSPORTS), default='session',
+                        help='Transport for VM sessions (default: session)')
+    parser.add_argument('--protocol', choices=sorted(VMController.PROTOCOLS), default='queue',
+                        help='Watcher protocol for VM sessions (default: queue)')
+    args = parser.parse_args(argv)
+    
+    try:
+        server = ControlServer(parse_address(args.listen), transport=args.transport, protocol=args.protocol)
+    except ValueError as e:
+        print(f"[✗] {e}")
+        sys.exit(1)
+    for spec in args.connect:
+        username, _, target = spec.rpartition('@')
+        host, _, port = target.partition(':')
+        if not username or not host:
+            print(f"[✗] Expected USER@HOST[:PORT], got '{spec}'")
+            sys.exit(1)
+        password = os.environ.get('WAC_PASSWORD') or getpass.getpass(f"Password for {spec}: ")
+        try:
+            server.connect(host, username, password, int(port or 2222))
+        except (ConnectionError, ValueError) as e:
+            print(f"[✗] {e}")
+            sys.exit(1)
+    
+    print(f"[*] Control server listening on {server.address} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except OSError as e:
+        print(f"[✗] {e}")
+        sys.exit(1)
+    print("[*] Control server stopped")
+
 # Main entry point
 def main():
     """Main entry point"""
@@ -498,46 +1475,231 @@ def main():
             sys.exit(0)
         elif sys.argv[1] == 'update':
             check_only = '--check-only' in sys.argv
-            update_tool(check_only=check_only)
+            update_tool(check_only=check_only, cache_dir=os.environ.get('WAC_UPDATE_CACHE'),
+                        allow_unverified='--allow-unverified' in sys.argv)
             sys.exit(0)
         elif sys.argv[1] == 'uninstall':
             uninstall_tool()
             sys.exit(0)
+        elif sys.argv[1] == 'convert':
+            convert_trajectory(sys.argv[2:])
+            sys.exit(0)
+        elif sys.argv[1] == 'serve':
+            serve_control(sys.argv[2:])
+            sys.exit(0)
+        elif sys.argv[1] == 'expand':
+            expand_script(sys.argv[2:])
+            sys.exit(0)
+        elif sys.argv[1] == 'rescale':
+            rescale_recording(sys.argv[2:])
+            sys.exit(0)
+        elif sys.argv[1] == 'fleet':
+            run_fleet(sys.argv[2:])
+            sys.exit(0)
     
     parser = argparse.ArgumentParser(description='Windows VM Control CLI')
     parser.add_argument('-f', '--file', help='Execute commands from file (batch mode)')
     parser.add_argument('-c', '--command', help='Execute single command and exit')
-    parser.add_argument('-d', '--delay', type=float, default=0.1, help='Delay between batch commands (seconds)')
-    parser.add_argument('--host', default='localhost', help='Host (default: localhost)')
+    parser.add_argument('--var', action='append', default=[], metavar='NAME=VALUE',
+                        help='Set a macro variable for -f scripts; repeatable')
+    parser.add_argument('--no-macro-cache', action='store_true',
+                        help='Compile -f scripts without the on-disk cache')
+    parser.add_argument('-d', '--delay', type=float, default=None,
+                        help='Fixed delay between batch commands in seconds (default: adaptive settle times)')
+    parser.add_argument('--settle-mode', choices=SettleScheduler.MODES, default='adaptive',
+                        help='adaptive learns settle times from acknowledgement latency, '
+                             'fixed always uses the base times (default: adaptive)')
+    parser.add_argument('--settle', action='append', default=[], metavar='CLASS=BASE[:FLOOR:CEILING]',
+                        help='Settle time in seconds for an action class '
+                             '(move, click, scroll, drag, type, key, ui); repeatable')
+    parser.add_argument('--host', help='Host (default: localhost)')
     parser.add_argument('--username', help='Username for SSH connection')
-    parser.add_argument('--password', help='Password (not recommended, use prompt instead)')
-    parser.add_argument('--port', type=int, default=2222, help='SSH port (default: 2222)')
+    parser.add_argument('--password', help='Password (not recommended; use $WAC_PASSWORD, a key or the prompt)')
+    parser.add_argument('--port', type=int, help='SSH port (default: 2222)')
+    parser.add_argument('--key-file', help='Private key for SSH authentication (default: SSH agent, then ~/.ssh)')
+    parser.add_argument('--config', metavar='PATH',
+                        help=f'Config file with connection defaults (default: $WAC_CONFIG or {DEFAULT_CONFIG})')
+    parser.add_argument('--transport', choices=sorted(VMController.TRANSPORTS),
+                        help='exec: one SSH channel per action, session: one persistent shell (default: exec)')
+    parser.add_argument('--protocol', choices=sorted(VMController.PROTOCOLS),
+                        help='file: single command file per device, queue: sequenced spool with acks (default: file)')
+    parser.add_argument('--queue-window', type=int, default=32,
+                        help='Max unacknowledged commands per device with --protocol queue (default: 32)')
+    parser.add_argument('--keepalive', type=float, default=3.0,
+                        help='Seconds between connection keepalives, 0 to disable (default: 3)')
+    parser.add_argument('--reconnect-attempts', type=int, default=5,
+                        help='Reconnect attempts with backoff before giving up (default: 5)')
+    parser.add_argument('--no-replay', action='store_true',
+                        help='Fail commands interrupted by a connection loss instead of replaying them')
+    parser.add_argument('--coalesce-moves', choices=sorted(PathOptimizer.MODES),
+                        help='Drop redundant mouse moves: final keeps where each run of moves ends, '
+                             'path keeps the path shape within --path-tolerance')
+    parser.add_argument('--path-tolerance', type=float, default=2.0,
+                        help='Max pixels a simplified path may deviate from the original (default: 2)')
+    parser.add_argument('--stats-out', metavar='PATH',
+                        help='Write latency/throughput stats on exit (Prometheus text if PATH ends in .prom, else JSON)')
+    parser.add_argument('--record', metavar='PATH',
+                        help='Record executed commands with timing to a trajectory file')
+    parser.add_argument('--record-compress', action='store_true',
+                        help='Gzip the recorded trajectory')
+    parser.add_argument('--replay', metavar='PATH',
+                        help='Replay a recorded trajectory (or a text command file) and exit')
+    parser.add_argument('--replay-speed', type=float, default=1.0,
+                        help='Replay timing multiplier, 0 for as fast as possible (default: 1)')
+    parser.add_argument('--type-file', metavar='PATH',
+                        help="Type the contents of a text file ('-' for stdin) via SFTP upload and exit")
+    parser.add_argument('--typing-profile', choices=sorted(TYPING_PROFILES), default='balanced',
+                        help='Bulk typing speed preset (default: balanced)')
+    parser.add_argument('--type-chunk', type=int,
+                        help='Characters the watcher sends per chunk (overrides the profile)')
+    parser.add_argument('--key-delay', type=int,
+                        help='Bulk typing key delay in ms, -1 for SendInput (overrides the profile)')
+    parser.add_argument('--screenshot', metavar='PATH',
+                        help='Save a PNG screenshot of the VM and exit (needs screen_capture.ps1 on the VM)')
+    parser.add_argument('--screenshot-region', metavar='X,Y,W,H',
+                        help='Capture only this screen region')
+    parser.add_argument('--screenshot-scale', type=float, default=1.0,
+                        help='Downscale factor for --screenshot, e.g. 0.5 (default: 1)')
+    parser.add_argument('--space', metavar='SPACE[@MONITOR]',
+                        help='Coordinate space of mouse commands: screen, normalized (0-1), logical '
+                             '(DPI-independent) or WIDTHxHEIGHT; @N for monitor N, @all for the whole desktop '
+                             '(default: screen pixels)')
+    parser.add_argument('--screen-settle', action='store_true',
+                        help='After UI-opening shortcuts, wait for the screen to stop changing '
+                             'instead of a fixed pause')
+    parser.add_argument('--log-level', choices=('debug', 'info', 'warning', 'error'), default='info',
+                        help='Per-command output: info shows every command, warning only failures (default: info)')
+    parser.add_argument('-q', '--quiet', action='store_true', help='Same as --log-level warning')
+    parser.add_argument('--log-format', choices=('text', 'jsonl'), default='text',
+                        help='Per-command output as text lines or one JSON object per line (default: text)')
+    parser.add_argument('--log-file', metavar='PATH', help='Append per-command output to PATH instead of stdout')
+    parser.add_argument('--history', type=int, default=1000, metavar='N',
+                        help='Commands kept for the history command and --history-dump (default: 1000)')
+    parser.add_argument('--history-dump', metavar='PATH',
+                        help='If the run fails, write the kept command history to PATH as JSONL')
     
     args = parser.parse_args()
+    headless = bool(args.command or args.file or args.replay or args.type_file or args.screenshot)
+    prompt = sys.stdin.isatty()
+    settings = resolve_settings(args)
     
-    print("╔══════════════════════════════════════════════════════════╗")
-    print("║         Windows VM Control CLI - CUA Integration        ║")
-    print("╚══════════════════════════════════════════════════════════╝\n")
+    if not headless:
+        print("╔══════════════════════════════════════════════════════════╗")
+        print("║         Windows VM Control CLI - CUA Integration        ║")
+        print("╚══════════════════════════════════════════════════════════╝\n")
     
-    # Get connection details
-    host = input("Host (default: localhost): ").strip() or "localhost"
-    username = input("Username: ").strip()
+    # Get connection details; only prompt for what no flag, variable or config supplied
+    host = settings['host']
+    if not host and not headless and prompt:
+        host = input("Host (default: localhost): ").strip()
+    host = host or 'localhost'
     
+    username = settings['username']
+    if not username and not headless and prompt:
+        username = input("Username: ").strip()
     if not username:
-        print("[✗] Username is required")
+        print("[✗] Username is required (--username, $WAC_USERNAME or the config file)")
+        sys.exit(1)
+    
+    # Without a password, keys and the SSH agent are tried; interactive
+    # sessions still ask (an empty answer means key authentication)
+    password = settings['password']
+    if password is None and not settings['key_file'] and not headless and prompt:
+        password = getpass.getpass("Password: ")
+    
+    try:
+        port = int(settings['port'] or 2222)
+    except ValueError:
+        print(f"[✗] Invalid port: {settings['port']}")
         sys.exit(1)
     
-    password = getpass.getpass("Password: ")
+    try:
+        overrides = dict(parse_override(spec) for spec in args.settle)
+        overrides.setdefault('ui', (VMController.UI_SETTLE_TIME,))
+        scheduler = SettleScheduler(args.settle_mode, overrides)
+    except ValueError as e:
+        print(f"[✗] {e}")
+        sys.exit(1)
+    
+    space = None
+    if args.space:
+        try:
+            space = CoordinateSpace.parse(args.space)
+        except CoordinateSpaceError as e:
+            print(f"[✗] {e}")
+            sys.exit(1)
+    
+    variables = None
+    if args.var:
+        from macros import MacroError, parse_variables
+        try:
+            variables = parse_variables(args.var)
+        except MacroError as e:
+            print(f"[✗] {e}")
+            sys.exit(1)
+    
+    try:
+        log = CommandLog('warning' if args.quiet else args.log_level, args.log_format,
+                         path=args.log_file, capacity=args.history)
+    except ValueError as e:
+        print(f"[✗] {e}")
+        sys.exit(1)
     
     # Create controller
-    controller = VMController(host=host, username=username, port=2222)
+    controller = VMController(host=host, username=username, port=port,
+                              transport=settings['transport'] or 'exec',
+                              protocol=settings['protocol'] or 'file', queue_window=args.queue_window,
+                              optimizer=(PathOptimizer(args.coalesce_moves, args.path_tolerance)
+                                         if args.coalesce_moves else None),
+                              pool=ConnectionPool(
+                                  keepalive_interval=0 if headless else args.keepalive,
+                                  policy=ReconnectPolicy(max_attempts=args.reconnect_attempts,
+                                                         replay=not args.no_replay)),
+                              screen_settle=args.screen_settle, scheduler=scheduler, space=space,
+                              log=log)
     
     # Connect
-    if not controller.connect(password):
+    if not controller.connect(password, key_filename=settings['key_file']):
         sys.exit(1)
     
-    # Enter interactive mode
-    controller.interactive_mode()
+    if args.record:
+        controller.start_recording(args.record, compress=args.record_compress)
+    
+    ok = True
+    try:
+        if args.command:
+            # Single command, then exit
+            ok = controller.execute_command(args.command)
+        elif args.file:
+            # Batch file, then exit
+            ok = run_command_file(controller, args.file, args.delay, variables,
+                                  cache=not args.no_macro_cache)
+        elif args.replay:
+            # Replay a trajectory, then exit
+            report = replay_trajectory(controller, args.replay, args.replay_speed)
+            ok = report is not None and report['failed'] == 0
+        elif args.type_file:
+            # Bulk type a file, then exit
+            ok = type_file(controller, args.type_file, args.typing_profile,
+                           args.type_chunk, args.key_delay) is not None
+        elif args.screenshot:
+            # Save a screenshot, then exit
+            ok = save_screenshot(controller, args.screenshot, args.screenshot_region, args.screenshot_scale)
+        else:
+            # Enter interactive mode
+            controller.interactive_mode()
+    finally:
+        controller.disconnect()
+        controller.stop_recording()
+        if args.stats_out:
+            write_stats(controller, args.stats_out)
+        log.close()
+        if not ok and args.history_dump:
+            count = log.dump(args.history_dump)
+            print(f"[*] Wrote the last {count} commands to {args.history_dump}")
+    
+    if not ok:
+        sys.exit(1)
 
 # Main entry point
 if __name__ == "__main__":